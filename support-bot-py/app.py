@@ -1,7 +1,9 @@
 import asyncio
 import html
 import re
+import time
 from contextlib import asynccontextmanager
+from functools import partial
 
 import httpx
 
@@ -11,16 +13,25 @@ from openai import AsyncOpenAI
 from youtube_transcript_api import NoTranscriptFound
 
 from ban_bot.ban_bot import router as ban_bot_router
+from commands import CommandRouter
+from dedup import update_dedup
+from dispatcher import JobDispatcher, QueueFull, current_job_class
+from memory import ConversationMemory
 from news_scheduler import NewsScheduler
 from repository import Message, MessageRepository
+from result_cache import ResultCache
+from retrieval import ConversationIndex
 from schemas import TelegramMessage, TelegramRequest
 from settings import Settings
+from single_flight import SingleFlight
 from summarizer import summary_url
-from telegram import TelegramBot
+from telegram import create_telegram_bot
+from telegraph import telegraph
+from translation_memory import translation_memory
 from tts_client import synthesize_segments
-from utils import create_verify_token_function, filter_context_size
+from utils import count_tokens, create_verify_token_function, filter_context_size
 from video_translator import translate_media
-from youtube import get_transcript_summary
+from youtube import get_transcript_summary, get_youtube_id
 from youtube_diarize import process_youtube_diarize
 from youtube_transcript import process_youtube_transcript
 
@@ -31,6 +42,7 @@ settings = Settings()
 async def lifespan(_: FastAPI):
     """Manage application lifespan - startup and shutdown events"""
     # Startup
+    await telegram_bot.start()
     logger.info("Starting news scheduler...")
     await news_scheduler.start()
     
@@ -39,6 +51,11 @@ async def lifespan(_: FastAPI):
     # Shutdown
     logger.info("Stopping news scheduler...")
     await news_scheduler.stop()
+    await dispatcher.stop()
+    await message_repository.close()
+    await telegram_bot.close()
+    await telegraph.close()
+    update_dedup.save()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -47,24 +64,72 @@ app.include_router(ban_bot_router)
 
 
 
-telegram_bot = TelegramBot(
-    settings.telegram_token,
-    local_api_url=settings.telegram_local_api_url,
-)
+telegram_bot = create_telegram_bot(settings)
 
-message_repository = MessageRepository()
+message_repository = MessageRepository(
+    cache_max_chats=settings.history_cache_chats,
+    cache_max_bytes=settings.history_cache_mb * 1024 * 1024,
+    flush_interval=settings.history_flush_interval,
+    flush_batch=settings.history_flush_batch,
+    max_pending=settings.history_max_pending,
+    max_backoff=settings.history_flush_max_backoff,
+    token_model=settings.model,
+    store_tokens=settings.history_store_tokens,
+    page_size=settings.history_page_size,
+)
 
 openai = AsyncOpenAI(api_key=settings.openai_api_key)
 
+conversation_memory = ConversationMemory(
+    message_repository,
+    openai,
+    settings.model_summarizer,
+    threshold=settings.memory_threshold,
+    keep_recent=settings.memory_keep_recent,
+    max_tokens=settings.memory_summary_max_tokens,
+    max_chats=settings.history_cache_chats,
+)
+
+conversation_index = ConversationIndex(
+    openai,
+    settings.model_embedding,
+    dimensions=settings.retrieval_dimensions,
+    path=settings.retrieval_index_path,
+    top_k=settings.retrieval_top_k,
+    min_score=settings.retrieval_min_score,
+    max_turns=settings.retrieval_max_turns,
+)
+
 news_scheduler = NewsScheduler(telegram_bot, settings)
 
+dispatcher = JobDispatcher(
+    workers={
+        "chat": settings.jobs_chat_workers,
+        "transcript": settings.jobs_transcript_workers,
+        "diarize": settings.jobs_diarize_workers,
+        "media": settings.jobs_media_workers,
+        "join": settings.jobs_join_workers,
+    },
+    max_queued=settings.jobs_max_queued,
+)
+
+# Identical YouTube jobs already running (same video, mode, speaker count) are
+# joined instead of started again.
+youtube_jobs = SingleFlight()
+
+youtube_results = ResultCache(
+    settings.result_cache_path,
+    ttl=settings.result_cache_ttl,
+    max_bytes=settings.result_cache_max_mb * 1024 * 1024,
+)
+
 
 async def handle_echo(chat_id, matched):
     logger.info(f"Received /echo command with message: {matched}")
     await telegram_bot.send_message(chat_id, f"Received your message: {matched}")
 
 
-async def handle_start(chat_id):
+async def handle_start(chat_id, _matched=None):
     logger.info("Received /start command")
     message = (
         "echo - Echo your message\n"
@@ -75,6 +140,7 @@ async def handle_start(chat_id):
         "youtube_transcript - Get transcript with Telegraph pages\n"
         "yt - Get transcript with Telegraph pages (shortcut)\n"
         "yd - Speaker-diarized transcript (add a number to force the speaker count, e.g. /yd <url> 2)\n"
+        "  add --refresh to /yt or /yd to rebuild a cached result\n"
         "prompt - Direct OpenAI prompt\n"
         "\n"
         "Forward any video, voice message, or round video-note to me "
@@ -120,9 +186,12 @@ async def handle_youtube_transcript(chat_id, matched):
     try:
         url = re.search(r"(https?://[^\s]+)", matched).group(0)
 
-        await telegram_bot.send_message(chat_id, "🎬 Processing YouTube video...")
-
-        result = await process_youtube_transcript(url)
+        result, cached = await _run_youtube_job(
+            chat_id, matched, False, lambda: process_youtube_transcript(url),
+            "🎬 Processing YouTube video...",
+        )
+        if result is None:
+            return
 
         # Format response
         video_id = result['video_id']
@@ -132,6 +201,8 @@ async def handle_youtube_transcript(chat_id, matched):
             f"🔗 <a href=\"{youtube_url}\">YouTube Link</a>",
             f"Original Language: {result['original_language']}"
         ]
+        if cached:
+            message_parts.append(_CACHED_NOTE)
 
         transcript_urls = result.get('transcript_urls', [])
         if len(transcript_urls) == 1:
@@ -171,16 +242,95 @@ def _speaker_count(text: str) -> int:
     return -1
 
 
+def _youtube_job_key(matched: str, diarize: bool) -> tuple | None:
+    """Single-flight key (video_id, mode, num_speakers) for a YouTube command."""
+    url = re.search(r"(https?://[^\s]+)", matched)
+    video_id = get_youtube_id(url.group(0)) if url else None
+    if not video_id:
+        return None
+    if diarize:
+        return (video_id, "diarize", _speaker_count(matched))
+    return (video_id, "transcript", -1)
+
+
+def _wants_refresh(text: str) -> bool:
+    """'/yt <url> --refresh' bypasses the result cache and rebuilds."""
+    return "--refresh" in text.split()
+
+
+_CACHED_NOTE = "♻️ Cached result (add --refresh to rebuild)"
+
+
+async def _run_youtube_job(
+    chat_id, matched: str, diarize: bool, run, progress: str
+) -> tuple[dict | None, bool]:
+    """Result for a YouTube command and whether it came from the result cache.
+
+    A cache hit replies straight away. Otherwise the progress message is sent
+    and the pipeline runs once for all concurrent identical requests, with the
+    result stored for next time.
+
+    A request running as a chat job was found in the cache before it was queued
+    (see dispatch_message); one running as a join job was classed to join a run
+    in flight (see _youtube_job_class). Neither runs the pipeline: should there
+    be no cached result (chat) or no run to join (join) by now, the request is
+    classed again and resubmitted, and (None, False) is returned."""
+    key = _youtube_job_key(matched, diarize)
+    if key is not None and not _wants_refresh(matched):
+        cached = await youtube_results.get(key)
+        if cached is not None:
+            return cached, True
+
+    job_class = current_job_class.get()
+    if key is not None and job_class in ("chat", "join"):
+        joined = None
+        if job_class == "join":
+            try:
+                joined = youtube_jobs.join(key)
+            except LookupError:
+                pass
+        if joined is None:
+            job_class = _youtube_job_class(matched, diarize)
+            handler = handle_youtube_diarize if diarize else handle_youtube_transcript
+            logger.info(f"{key} is not cached or running any more; requeueing the request as a {job_class} job")
+            _submit(job_class, chat_id, partial(handler, chat_id, matched))
+            return None, False
+        await telegram_bot.send_message(chat_id, progress)
+        return await joined, False
+
+    await telegram_bot.send_message(chat_id, progress)
+    if key is None:
+        return await run(), False
+
+    async def run_and_store():
+        result = await run()
+        await youtube_results.put(key, result)
+        return result
+
+    return await youtube_jobs.do(key, run_and_store), False
+
+
+def _youtube_job_class(matched: str, diarize: bool) -> str:
+    # A request that will join an in-flight run only waits for its result, so it
+    # shouldn't hold one of the scarce transcript/diarize worker slots, nor its
+    # chat's lane for plain messages.
+    if youtube_jobs.in_flight(_youtube_job_key(matched, diarize)):
+        return "join"
+    return "diarize" if diarize else "transcript"
+
+
 async def handle_youtube_diarize(chat_id, matched):
     """Handler for the diarized (speaker-labeled) YouTube transcript path."""
     logger.info(f"Received diarized youtube request: {matched}")
     try:
         url = re.search(r"(https?://[^\s]+)", matched).group(0)
         num_speakers = _speaker_count(matched)
-        await telegram_bot.send_message(
-            chat_id, "🎬🗣️ Diarizing video (downloading audio + detecting speakers, this can take a few minutes)..."
+        result, cached = await _run_youtube_job(
+            chat_id, matched, True, lambda: process_youtube_diarize(url, num_speakers=num_speakers),
+            "🎬🗣️ Diarizing video (downloading audio + detecting speakers, this can take a few minutes)...",
         )
-        result = await process_youtube_diarize(url, num_speakers=num_speakers)
+        if result is None:
+            return
 
         video_id = result["video_id"]
         youtube_url = f"https://www.youtube.com/watch?v={video_id}"
@@ -189,6 +339,8 @@ async def handle_youtube_diarize(chat_id, matched):
             f"🔗 <a href=\"{youtube_url}\">YouTube Link</a>",
             f"🗣️ Speakers: {result['num_speakers']} · Language: {result['original_language']} · Source: {result['source']}",
         ]
+        if cached:
+            message_parts.append(_CACHED_NOTE)
         transcript_urls = result.get("transcript_urls", [])
         if len(transcript_urls) == 1:
             message_parts.append(f"📄 <a href=\"{transcript_urls[0]}\">Diarized Transcript</a>")
@@ -222,47 +374,169 @@ async def handle_youtube_diarize(chat_id, matched):
         await telegram_bot.send_message(chat_id, f"❌ Error: {str(e) or type(e).__name__}")
 
 
+# Telegram rejects messages longer than this many characters.
+_TELEGRAM_TEXT_LIMIT = 4096
+
+
+_NO_ANSWER = "⚠️ Sorry, I couldn't get an answer. Please try again."
+
+
+async def _show_latest(chat_id, placeholder: asyncio.Task, text: dict, changed: asyncio.Event):
+    """Edit the placeholder to text["latest"] whenever it changes. Runs beside
+    the stream so a throttled edit (groups allow 20 a minute) never holds up
+    reading it, and edits that queue up collapse into one with the newest text."""
+    # Shielded: cancelling the editor must not cancel the placeholder send.
+    message_id = await asyncio.shield(placeholder)
+    if message_id is None:
+        return
+    while True:
+        await changed.wait()
+        changed.clear()
+        latest = text["latest"]
+        if await telegram_bot.edit_message_text(chat_id, message_id, latest):
+            text["shown"] = latest
+
+
+async def reply_with_completion(chat_id, messages: list[dict]) -> str:
+    """Answer `messages` with settings.model and send the answer to the chat.
+
+    With stream_replies on, a placeholder is posted straight away and edited with
+    the text streamed so far (throttled to stream_edit_interval seconds or
+    stream_edit_tokens tokens), so the first words appear long before the
+    completion finishes. Returns the full answer text either way; "" when there
+    is none (the chat is told so). A failed completion replaces the
+    placeholder (or the partial answer) with a notice before the error
+    propagates."""
+    if not settings.stream_replies:
+        response = await openai.chat.completions.create(model=settings.model, messages=messages)
+        logger.info(f"Response: {response}")
+        answer = response.choices[0].message.content or ""
+        await telegram_bot.send_message(chat_id, answer or _NO_ANSWER)
+        return answer
+
+    placeholder = asyncio.create_task(telegram_bot.send_message(chat_id, "…"))
+    text = {"latest": "", "shown": ""}
+    changed = asyncio.Event()
+    editor = asyncio.create_task(_show_latest(chat_id, placeholder, text, changed))
+    answer = ""
+    failed = False
+    try:
+        stream = await openai.chat.completions.create(
+            model=settings.model, messages=messages, stream=True
+        )
+        tokens_since_edit = 0
+        last_edit = time.monotonic()
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            answer += delta
+            tokens_since_edit += 1
+            if (
+                time.monotonic() - last_edit >= settings.stream_edit_interval
+                or tokens_since_edit >= settings.stream_edit_tokens
+            ):
+                text["latest"] = answer[:_TELEGRAM_TEXT_LIMIT]
+                changed.set()
+                last_edit = time.monotonic()
+                tokens_since_edit = 0
+    except Exception:
+        failed = True
+        raise
+    finally:
+        # An intermediate edit still in flight must not land after the final one.
+        editor.cancel()
+        await asyncio.gather(editor, return_exceptions=True)
+        message_id = await placeholder
+        if (failed or not answer) and message_id is not None:
+            # Don't leave "…" or a cut-off answer standing as the reply.
+            await telegram_bot.edit_message_text(chat_id, message_id, _NO_ANSWER)
+
+    logger.info(f"Streamed response: {len(answer)} chars")
+    parts = [answer[i:i + _TELEGRAM_TEXT_LIMIT] for i in range(0, len(answer), _TELEGRAM_TEXT_LIMIT)]
+    if not parts:
+        if message_id is None:
+            await telegram_bot.send_message(chat_id, _NO_ANSWER)
+        return answer
+    if message_id is None:
+        await telegram_bot.send_message(chat_id, parts[0])
+    elif parts[0] != text["shown"]:
+        await telegram_bot.edit_message_text(chat_id, message_id, parts[0])
+    for part in parts[1:]:
+        await telegram_bot.send_message(chat_id, part)
+    return answer
+
+
 async def handle_default(msg: TelegramMessage):
     logger.info(f"Received default message: {msg.text}")
     chat_id = msg.chat.id
-    messages = await message_repository.get_messages(chat_id)
-
-    new_message = Message(**{"content": msg.text, "user": "user"})
+    messages = await message_repository.get_messages(
+        chat_id, token_budget=settings.context_size
+    )
+    summary = None
+    if settings.memory_enabled:
+        summary = await conversation_memory.get(chat_id)
+        messages = conversation_memory.recent(summary, messages)
+
+    # History messages already carry their token counts; only the new one is encoded.
+    new_message = Message(
+        content=msg.text, user="user", tokens=count_tokens(msg.text, settings.model)
+    )
     messages.append(new_message)
 
+    budget = settings.context_size - (summary.tokens if summary else 0)
+    query = await _embed_query(msg.text) if settings.retrieval_enabled else None
+    if query is not None:
+        budget -= settings.retrieval_budget
     messages_to_send = filter_context_size(
         [{"role": m.user, "content": m.content} for m in messages],
-        settings.context_size,
+        budget,
         settings.model,
+        token_counts=[m.tokens for m in messages],
     )
+    if query is not None:
+        # Only turns older than the recent window are candidates.
+        window_start = messages[-len(messages_to_send)].created_at
+        try:
+            retrieved = await conversation_index.search(
+                chat_id, query, before=window_start, token_budget=settings.retrieval_budget
+            )
+        except Exception as e:
+            logger.warning(f"retrieval: search failed for chat {chat_id}, answering without it: {e}")
+            retrieved = []
+        if retrieved:
+            messages_to_send.insert(0, conversation_index.prompt(retrieved))
+    if summary:
+        messages_to_send.insert(0, conversation_memory.prompt(summary))
+
+    answer = await reply_with_completion(chat_id, messages_to_send)
+    if not answer:
+        # Nothing to remember; the user gets to ask again.
+        return
 
-    response = await openai.chat.completions.create(
-        model=settings.model, messages=messages_to_send
-    )
-    logger.info(f"Response: {response}")
-    answer = response.choices[0].message.content
-
-    logger.info(f"Responding with: {response}")
-
-    await telegram_bot.send_message(chat_id, answer)
-
-    logger.info("Adding messages to repository")
-
-    await message_repository.add_messages(
-        chat_id,
-        [
-            {"content": msg.text, "user": "user"},
-        ],
-    )
-
-    await message_repository.add_messages(
+    # Queued for the repository's next bulk insert; no DB round trip here.
+    stored = await message_repository.add_messages(
         chat_id,
         [
+            new_message.model_dump(),
             {"content": answer, "user": "assistant"},
         ],
     )
+    if settings.memory_enabled:
+        conversation_memory.schedule_fold(chat_id, summary, messages[:-1] + stored)
+    if settings.retrieval_enabled:
+        conversation_index.schedule_add(chat_id, stored, {0: query} if query is not None else None)
+
 
-    logger.info("Added messages to repository")
+async def _embed_query(text: str):
+    """The message's embedding for retrieval, or None when embedding fails or
+    is slow: retrieval is an extra, the reply goes out without it."""
+    try:
+        vectors = await asyncio.wait_for(conversation_index.embed([text]), settings.retrieval_timeout)
+    except Exception as e:
+        logger.warning(f"retrieval: embedding the query failed, answering without it: {e!r}")
+        return None
+    return vectors[0]
 
 
 async def handle_no_such_command(chat_id, matched):
@@ -272,17 +546,15 @@ async def handle_no_such_command(chat_id, matched):
 
 async def handle_summary(chat_id, matched):
     logger.info(f"Received /summary command with text: {matched}")
-    response = await openai.chat.completions.create(
-        model=settings.model,
-        messages=[
+    await reply_with_completion(
+        chat_id,
+        [
             {
                 "role": "user",
                 "content": f"Make a summary of the following text:\n\n{matched}\n\n",
             }
         ],
     )
-    summary = response.choices[0].message.content
-    await telegram_bot.send_message(chat_id, summary)
 
 
 async def handle_summary_url(chat_id, matched):
@@ -294,12 +566,7 @@ async def handle_summary_url(chat_id, matched):
 
 async def handle_prompt(chat_id, matched):
     logger.info(f"Received /prompt command with text: {matched}")
-    response = await openai.chat.completions.create(
-        model=settings.model, messages=[{"role": "user", "content": matched}]
-    )
-    logger.info(f"Prompt response: {response}")
-    prompt_response = response.choices[0].message.content
-    await telegram_bot.send_message(chat_id, prompt_response)
+    await reply_with_completion(chat_id, [{"role": "user", "content": matched}])
 
 
 _SPEAKER_LABEL_RE = re.compile(r"(?m)^Speaker\s+(\d+):")
@@ -344,9 +611,9 @@ async def handle_translate_video(msg: TelegramMessage):
     await telegram_bot.send_message(chat_id, "🎧 Translating to English...")
     try:
         file_info = await telegram_bot.get_file(media.file_id)
-        file_bytes = await telegram_bot.download_file(file_info["file_path"])
         filename = file_info["file_path"].rsplit("/", 1)[-1]
-        result = await translate_media(file_bytes, filename, openai, settings)
+        async with telegram_bot.downloaded_file(file_info["file_path"]) as file_path:
+            result = await translate_media(file_path, filename, openai, settings)
     except Exception as e:
         logger.exception("translate_video failed")
         await telegram_bot.send_message(chat_id, f"❌ Error: {e}")
@@ -371,6 +638,40 @@ async def handle_translate_video(msg: TelegramMessage):
     await telegram_bot.send_message(chat_id, f"{header}\n\n{body}", parse_mode="HTML")
 
 
+async def handle_youtube(chat_id, matched):
+    """/youtube_transcript and /yt: plain transcript, or diarized when the
+    arguments ask for speakers."""
+    if _wants_speakers(matched):
+        await handle_youtube_diarize(chat_id, matched)
+    else:
+        await handle_youtube_transcript(chat_id, matched)
+
+
+command_router = CommandRouter(unknown=handle_no_such_command)
+command_router.add("/echo", handle_echo, usage="/echo <text>")
+command_router.add("/start", handle_start, requires_args=False)
+command_router.add("/summary", handle_summary, usage="/summary <text>")
+command_router.add(
+    "/summary_url", handle_summary_url, job_class="transcript", usage="/summary_url <url>"
+)
+command_router.add(
+    "/summary_youtube", handle_summary_youtube, aliases=("/sy",),
+    job_class="transcript", usage="/sy <youtube url>",
+)
+command_router.add(
+    "/youtube_transcript", handle_youtube, aliases=("/yt",),
+    job_class=lambda args: _youtube_job_class(args, diarize=_wants_speakers(args)),
+    usage="/yt <youtube url> [speakers]",
+)
+# Direct diarization shortcut: '/yd <url> [N]' (no 'speakers' keyword needed; a
+# trailing number forces the exact speaker count).
+command_router.add(
+    "/yd", handle_youtube_diarize,
+    job_class=lambda args: _youtube_job_class(args, diarize=True), usage="/yd <youtube url> [N]",
+)
+command_router.add("/prompt", handle_prompt, usage="/prompt <text>")
+
+
 async def handle_message(request: TelegramRequest):
     msg = request.message
     chat_id = msg.chat.id
@@ -384,48 +685,16 @@ async def handle_message(request: TelegramRequest):
     if text is None:
         return
 
-    if text.startswith("/echo"):
-        matched = re.match(r"/echo (.+)", text).group(1)
-        await handle_echo(chat_id, matched)
-    elif text == "/start":
-        await handle_start(chat_id)
-    elif text.startswith("/summary_url"):
-        matched = re.match(r"/summary_url (.+)", text).group(1)
-        await handle_summary_url(chat_id, matched)
-    elif text.startswith("/yd"):
-        # Direct diarization shortcut: '/yd <url> [N]' (no 'speakers' keyword
-        # needed; a trailing number forces the exact speaker count).
-        matched = re.match(r"/yd (.+)", text).group(1)
-        await handle_youtube_diarize(chat_id, matched)
-    elif text.startswith("/yt"):
-        matched = re.match(r"/yt (.+)", text).group(1)
-        if _wants_speakers(matched):
-            await handle_youtube_diarize(chat_id, matched)
-        else:
-            await handle_youtube_transcript(chat_id, matched)
-    elif text.startswith("/youtube_transcript"):
-        matched = re.match(r"/youtube_transcript (.+)", text).group(1)
-        if _wants_speakers(matched):
-            await handle_youtube_diarize(chat_id, matched)
-        else:
-            await handle_youtube_transcript(chat_id, matched)
-    elif text.startswith("/sy"):
-        matched = re.match(r"/sy (.+)", text).group(1)
-        await handle_summary_youtube(chat_id, matched)
-    elif text.startswith("/summary_youtube"):
-        matched = re.match(r"/summary_youtube (.+)", text).group(1)
-        await handle_summary_youtube(chat_id, matched)
-    elif text.startswith("/summary"):
-        matched = re.match(r"/summary (.+)", text).group(1)
-        await handle_summary(chat_id, matched)
-    elif text.startswith("/prompt"):
-        matched = re.match(r"/prompt (.+)", text).group(1)
-        await handle_prompt(chat_id, matched)
-    elif text.startswith("/"):
-        matched = re.match(r"/(.+)", text).group(1)
-        await handle_no_such_command(chat_id, matched)
-    else:
+    resolved = command_router.resolve(text)
+    if resolved is None:
         await handle_default(msg)
+        return
+
+    route, args = resolved
+    if route.requires_args and not args:
+        await telegram_bot.send_message(chat_id, f"Usage: {route.usage or route.name}")
+        return
+    await command_router.dispatch(chat_id, route, args)
 
 
 verify_token = create_verify_token_function(settings.x_telegram_bot_header)
@@ -436,9 +705,73 @@ else:
     dependencies = []
 
 
+def _job_class(msg: TelegramMessage) -> str:
+    """Which dispatcher worker pool an update runs in."""
+    if msg.video or msg.video_note or msg.voice:
+        return "media"
+    resolved = command_router.resolve(msg.text or "")
+    if resolved is None:
+        return "chat"
+    route, args = resolved
+    return route.job_class_for(args)
+
+
+async def dispatch_message(request: TelegramRequest):
+    chat_id = request.message.chat.id
+    job_class = _job_class(request.message)
+    if job_class in ("transcript", "diarize") and await _youtube_result_cached(request.message):
+        # Replies in milliseconds; don't queue it behind a running pipeline.
+        job_class = "chat"
+    _submit(job_class, chat_id, partial(handle_message, request))
+
+
+async def _youtube_result_cached(msg: TelegramMessage) -> bool:
+    """Whether a /yt or /yd command will be answered from the result cache."""
+    resolved = command_router.resolve(msg.text or "")
+    if resolved is None:
+        return False
+    route, args = resolved
+    if route.handler is handle_youtube_diarize:
+        diarize = True
+    elif route.handler is handle_youtube:
+        diarize = _wants_speakers(args)
+    else:
+        return False
+    key = _youtube_job_key(args, diarize)
+    if key is None or _wants_refresh(args):
+        return False
+    return await youtube_results.get(key) is not None
+
+
+_notices: set[asyncio.Task] = set()
+
+
+def _notify(chat_id, text: str):
+    """Send a notice in the background: sends are paced (and back off on 429s),
+    which mustn't hold up the webhook response."""
+    task = asyncio.create_task(telegram_bot.send_message(chat_id, text))
+    _notices.add(task)
+    task.add_done_callback(_notices.discard)
+
+
+def _submit(job_class: str, chat_id, job):
+    """Queue a job, telling the chat when it is turned away or has to wait."""
+    try:
+        position = dispatcher.submit(job_class, chat_id, job)
+    except QueueFull:
+        logger.warning(f"{job_class} queue full, rejecting a job for chat {chat_id}")
+        _notify(chat_id, "🚦 The bot is busy right now, please try again in a few minutes.")
+        return
+    # Chat jobs are short; only the slow pipelines announce their queue position.
+    if position and job_class != "chat":
+        logger.info(f"{job_class} job for chat {chat_id} queued at position {position}")
+        _notify(chat_id, f"⏳ Queued, position {position}")
+
+
 @app.post("/webhook", dependencies=dependencies)
 async def webhook(request: TelegramRequest):
-    asyncio.create_task(handle_message(request))
+    if not update_dedup.seen("support_bot", request.update_id):
+        await dispatch_message(request)
     return {"status": "ok"}
 
 
@@ -450,3 +783,12 @@ async def health():
 @app.get("/api/health")
 async def ping():
     return await message_repository.ping()
+
+
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "commands": command_router.metrics(),
+        "jobs": dispatcher.stats(),
+        "translation_memory": translation_memory.stats(),
+    }
@@ -6,6 +6,7 @@ from httpx import AsyncClient
 from loguru import logger
 
 from ban_bot.gpt import check_spam
+from dedup import update_dedup
 from schemas import TelegramRequest
 from settings import Settings
 from utils import create_verify_token_function
@@ -87,6 +88,9 @@ async def handle_message(r: Request):
 @router.post("/webhook", dependencies=dependencies)
 async def webhook(request: Request):
     r = await request.json()
+    update_id = r.get("update_id")
+    if update_id is not None and update_dedup.seen("ban_bot", update_id):
+        return {"status": "ok"}
     try:
         await handle_message(r)
     except Exception as e:
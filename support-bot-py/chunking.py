@@ -0,0 +1,143 @@
+"""Token-budgeted text chunking for LLM calls.
+
+Long transcripts are translated and summarized in chunks. Sizing those chunks
+in characters maps badly to tokens (Cyrillic or CJK text has far fewer
+characters per token than English), so chunks were either well under budget
+(more calls than needed) or overflowed. Here chunks are filled up to a token
+budget, counted with the target model's tiktoken encoding, and only broken
+between units — paragraphs ("\n\n") or speaker lines ("\n"). A unit bigger
+than the budget on its own is split at the coarsest boundary it has: lines,
+then sentences, then words (then, for a single enormous "word", tokens).
+
+Chunker is incremental so text that arrives in parts (e.g. translated chunks
+streaming into the summarizer) can be chunked as it comes; feeding the parts
+yields the same chunks as chunking the joined text at once. It also records
+what joins each chunk to the next in the text (Chunker.joiners), so pieces of
+a split unit can be put back together the way they were split.
+"""
+import re
+from typing import AsyncIterator
+
+from utils import get_encoding
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…。！？])\s+")
+
+# Finer and finer ways to split an oversized unit: (split, joiner)
+_LEVELS = (
+    (lambda text: text.split("\n"), "\n"),
+    (_SENTENCE_END.split, " "),
+    (lambda text: text.split(" "), " "),
+)
+
+
+class Chunker:
+    def __init__(self, max_tokens: int, model: str, separator: str = "\n\n"):
+        self.max_tokens = max(1, max_tokens)
+        self.separator = separator
+        self.encoding = get_encoding(model)
+        joiners = [separator, *(joiner for _, joiner in _LEVELS), ""]
+        self._joiner_tokens = dict(zip(joiners, self._count(joiners)))
+        self._separator_tokens = self._joiner_tokens[separator]
+        # What follows each chunk returned so far in the text: the separator,
+        # or the finer joiner a unit was split on ("" for the last chunk)
+        self.joiners: list[str] = []
+        self._chunk: str | None = None
+        self._tokens = 0
+
+    def _count(self, texts: list[str]) -> list[int]:
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+    def feed(self, text: str) -> list[str]:
+        """Add the next part of the text (parts are joined by `separator`);
+        returns the chunks this completes."""
+        done = []
+        units = text.split(self.separator)
+        for unit, n in zip(units, self._count(units)):
+            pieces = [(unit, n, "")] if n <= self.max_tokens else self._split(unit, 0)
+            # Units are joined by the separator, pieces of a split unit by the
+            # joiner they were split on
+            befores = [self.separator] + [before for _, _, before in pieces[1:]]
+            afters = befores[1:] + [self.separator]
+            for (piece, m, _), before, after in zip(pieces, befores, afters):
+                cost = m + (self._joiner_tokens[before] if self._chunk is not None else 0)
+                if self._chunk is not None and self._tokens + cost > self.max_tokens:
+                    done.append(self._emit(before))
+                    cost = m
+                self._chunk = piece if self._chunk is None else self._chunk + before + piece
+                self._tokens += cost
+                if self._tokens >= self.max_tokens and self._separator_tokens:
+                    # Nothing more fits; don't hold a full chunk back until the next part.
+                    done.append(self._emit(after))
+        return done
+
+    def finish(self) -> list[str]:
+        """The last, partly filled chunk (if there is any text in it)."""
+        if not self._chunk:
+            self._chunk, self._tokens = None, 0
+            return []
+        return [self._emit("")]
+
+    def _emit(self, joiner: str) -> str:
+        chunk = self._chunk
+        self.joiners.append(joiner)
+        self._chunk, self._tokens = None, 0
+        return chunk
+
+    def _split(self, text: str, level: int) -> list[tuple[str, int, str]]:
+        """Pieces of `text` within the budget, with their token counts and the
+        joiner between each piece and the one before it ("" for the first),
+        split at the coarsest boundary (from `level` on) that the text has."""
+        while level < len(_LEVELS):
+            split, joiner = _LEVELS[level]
+            parts = split(text)
+            level += 1
+            if len(parts) > 1:
+                break
+        else:
+            tokens = self.encoding.encode_ordinary(text)
+            return [
+                (self.encoding.decode(tokens[i:i + self.max_tokens]), len(tokens[i:i + self.max_tokens]), "")
+                for i in range(0, len(tokens), self.max_tokens)
+            ]
+
+        pieces = []
+        current, used, first = None, 0, ""
+        for k, (part, n) in enumerate(zip(parts, self._count(parts))):
+            subpieces = [(part, n, "")] if n <= self.max_tokens else self._split(part, level)
+            for s, (piece, m, before) in enumerate(subpieces):
+                if s == 0:
+                    before = joiner if k else ""
+                cost = m + (self._joiner_tokens[before] if current is not None else 0)
+                if current is not None and used + cost > self.max_tokens:
+                    pieces.append((current, used, first))
+                    current, used = None, 0
+                    cost = m
+                if current is None:
+                    current, first = piece, before
+                else:
+                    current += before + piece
+                used += cost
+        if current is not None:
+            pieces.append((current, used, first))
+        return pieces
+
+
+def chunk_text(text: str, max_tokens: int, model: str, separator: str = "\n\n") -> list[str]:
+    """Split text into chunks of at most max_tokens tokens on `separator`
+    boundaries; separator.join(chunks) restores the text unless a unit had to
+    be split (Chunker.joiners has what joins those pieces)."""
+    chunker = Chunker(max_tokens, model, separator)
+    return chunker.feed(text) + chunker.finish()
+
+
+async def chunk_stream(
+    parts: AsyncIterator[str], max_tokens: int, model: str, separator: str = "\n\n"
+) -> AsyncIterator[str]:
+    """chunk_text over separator.join(parts), yielding each chunk as soon as
+    the parts received so far complete it."""
+    chunker = Chunker(max_tokens, model, separator)
+    async for part in parts:
+        for chunk in chunker.feed(part):
+            yield chunk
+    for chunk in chunker.finish():
+        yield chunk
@@ -0,0 +1,111 @@
+"""Table-driven bot command router.
+
+The command token is parsed once ("/yt@bot <url> 2" -> "/yt", "<url> 2") and
+looked up in a dict, so dispatch cost doesn't depend on how many commands exist
+or the order they were registered in (no more "/sy must come before /summary").
+Aliases point at the same Route, and every route keeps a call count and a
+latency histogram so it's visible which commands dominate load.
+"""
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+Handler = Callable[[int, str], Awaitable[None]]
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+@dataclass
+class Route:
+    name: str
+    handler: Handler
+    # Dispatcher job class, or a function of the command arguments returning one.
+    job_class: str | Callable[[str], str] = "chat"
+    requires_args: bool = True
+    usage: str | None = None
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def job_class_for(self, args: str) -> str:
+        return self.job_class(args) if callable(self.job_class) else self.job_class
+
+    def observe(self, seconds: float, failed: bool):
+        self.calls += 1
+        self.errors += failed
+        self.total_seconds += seconds
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def metrics(self) -> dict:
+        bounds = [str(b) for b in LATENCY_BUCKETS] + ["+Inf"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 3),
+            "latency_buckets": dict(zip(bounds, self.buckets)),
+        }
+
+
+def parse_command(text: str) -> tuple[str, str] | None:
+    """Split "/cmd@botname args" into ("/cmd", "args"); None if not a command."""
+    if not text.startswith("/"):
+        return None
+    command, *rest = text.strip().split(maxsplit=1)
+    return command.split("@", 1)[0].lower(), rest[0] if rest else ""
+
+
+class CommandRouter:
+    def __init__(self, unknown: Handler):
+        self._routes: dict[str, Route] = {}
+        self._unknown = Route("<unknown>", unknown, requires_args=False)
+
+    def add(
+        self,
+        name: str,
+        handler: Handler,
+        aliases: tuple[str, ...] = (),
+        job_class: str | Callable[[str], str] = "chat",
+        requires_args: bool = True,
+        usage: str | None = None,
+    ) -> Route:
+        route = Route(name, handler, job_class=job_class, requires_args=requires_args, usage=usage)
+        for command in (name, *aliases):
+            if command in self._routes:
+                raise ValueError(f"command {command} is already registered")
+            self._routes[command] = route
+        return route
+
+    def resolve(self, text: str) -> tuple[Route, str] | None:
+        """The route for a command message and its argument string.
+
+        Unregistered commands resolve to the unknown-command route with the raw
+        text (minus the leading slash) as the argument; non-commands give None."""
+        parsed = parse_command(text)
+        if parsed is None:
+            return None
+        command, args = parsed
+        route = self._routes.get(command)
+        if route is None:
+            return self._unknown, text[1:]
+        return route, args
+
+    async def dispatch(self, chat_id: int, route: Route, args: str):
+        start = time.perf_counter()
+        failed = True
+        try:
+            await route.handler(chat_id, args)
+            failed = False
+        finally:
+            elapsed = time.perf_counter() - start
+            route.observe(elapsed, failed)
+            logger.info(f"command {route.name} handled in {elapsed:.3f}s")
+
+    def metrics(self) -> dict[str, dict]:
+        routes = {route.name: route for route in self._routes.values()}
+        routes[self._unknown.name] = self._unknown
+        return {name: route.metrics() for name, route in sorted(routes.items())}
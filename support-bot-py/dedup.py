@@ -0,0 +1,100 @@
+"""Webhook update deduplication.
+
+Telegram redelivers an update when the webhook answers slowly or the container
+restarts mid-deploy; without this a redelivered /yd would start a second
+diarization. Seen update ids live in a bounded LRU with a TTL and can be
+persisted to a JSON file (loaded on startup, written periodically and on
+shutdown) so they survive deploy restarts.
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+from settings import Settings
+
+settings = Settings()
+
+
+class UpdateDeduplicator:
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: float = 24 * 3600,
+        path: str | None = None,
+        save_interval: float = 30.0,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.save_interval = save_interval
+        # key -> first-seen unix time, oldest first
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._dirty = False
+        self._last_save = time.time()
+        if path:
+            self._load()
+
+    def seen(self, namespace: str, update_id: int) -> bool:
+        """Record an update; True if it was already recorded (a redelivery).
+
+        Namespaced because each bot has its own update_id sequence."""
+        key = f"{namespace}:{update_id}"
+        now = time.time()
+        self._expire(now)
+        if key in self._seen:
+            logger.info(f"Duplicate update {key}, skipping")
+            return True
+        self._seen[key] = now
+        while len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+        self._dirty = True
+        if self.path and now - self._last_save >= self.save_interval:
+            self.save()
+        return False
+
+    def _expire(self, now: float):
+        while self._seen:
+            key, ts = next(iter(self._seen.items()))
+            if now - ts < self.ttl:
+                break
+            self._seen.popitem(last=False)
+            self._dirty = True
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                items = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load seen updates from {self.path}: {e}")
+            return
+        for key, ts in sorted(items.items(), key=lambda kv: kv[1]):
+            self._seen[key] = ts
+        self._expire(time.time())
+        logger.info(f"Loaded {len(self._seen)} seen update ids from {self.path}")
+
+    def save(self):
+        """Write the seen ids to `path` (atomically) if anything changed."""
+        self._last_save = time.time()
+        if not self.path or not self._dirty:
+            return
+        tmp = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self._seen, f)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Could not save seen updates to {self.path}: {e}")
+
+
+update_dedup = UpdateDeduplicator(
+    maxsize=settings.update_dedup_maxsize,
+    ttl=settings.update_dedup_ttl,
+    path=settings.update_dedup_path,
+)
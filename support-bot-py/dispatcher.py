@@ -0,0 +1,132 @@
+"""In-process job dispatcher for webhook updates.
+
+Replaces fire-and-forget asyncio.create_task: every job belongs to a job class
+(chat, transcript, diarize, media, join) with its own worker limit, so a burst
+of /yd requests can't start ten yt-dlp/ffmpeg/diarize pipelines on the Pi at
+once. "join" jobs only wait on a YouTube run already in flight; they get a
+class of their own so the wait holds neither a pipeline slot nor a chat lane.
+
+Within a class, jobs from the same chat form a lane and run strictly FIFO, one
+at a time (two quick messages can't race on the chat's Supabase history). Lanes
+from different chats take turns for the class's worker slots, so one chat can't
+starve the others. Lanes are classed separately on purpose: a chat message isn't
+held behind that chat's own ten-minute diarization.
+
+No long-lived worker tasks: a task is spawned per job and the lane is re-queued
+when it finishes, so nothing is left running once the queues are empty.
+"""
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+Job = Callable[[], Awaitable[None]]
+
+# The class of the job running in the current task (None outside a job).
+current_job_class: ContextVar[str | None] = ContextVar("current_job_class", default=None)
+
+
+class QueueFull(Exception):
+    """Raised by submit() when a job class already has max_queued jobs waiting."""
+
+
+class JobDispatcher:
+    def __init__(self, workers: dict[str, int], max_queued: int):
+        self.workers = dict(workers)
+        self.max_queued = max_queued
+        self._lanes: dict[tuple[str, int], deque[Job]] = {}
+        self._ready: dict[str, deque[tuple[str, int]]] = {c: deque() for c in self.workers}
+        self._running: dict[str, int] = {c: 0 for c in self.workers}
+        self._queued: dict[str, int] = {c: 0 for c in self.workers}
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, job_class: str, chat_id: int, job: Job) -> int:
+        """Enqueue `job` and return its position among the class's waiting jobs
+        (0 = started right away).
+
+        Raises QueueFull when the class backlog is at max_queued, and KeyError for
+        an unknown job class."""
+        if self._queued[job_class] >= self.max_queued:
+            raise QueueFull(job_class)
+
+        key = (job_class, chat_id)
+        lane = self._lanes.get(key)
+        if lane is None:
+            self._lanes[key] = lane = deque()
+            self._ready[job_class].append(key)
+        lane.append(job)
+        self._queued[job_class] += 1
+
+        self._pump(job_class)
+        return self._position(job_class, key) if job in lane else 0
+
+    def _position(self, job_class: str, key: tuple[str, int]) -> int:
+        """1-based place of the last job in `key`'s lane among the class's queued
+        jobs, in the order they will start: lanes take turns, one job each, and
+        a lane whose job is running rejoins the turns behind the waiting ones."""
+        ready = self._ready[job_class]
+        order = list(ready) + [
+            k for k, lane in self._lanes.items()
+            if k[0] == job_class and lane and k not in ready and k != key
+        ]
+        if key not in ready:
+            order.append(key)
+        k = len(self._lanes[key]) - 1  # jobs ahead of it in its own lane
+        mine = order.index(key)
+        ahead = k
+        for i, other in enumerate(order):
+            if other != key:
+                # Lanes before ours get one more turn in before its job.
+                ahead += min(len(self._lanes[other]), k + 1 if i < mine else k)
+        return ahead + 1
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            c: {"running": self._running[c], "queued": self._queued[c], "workers": n}
+            for c, n in self.workers.items()
+        }
+
+    async def stop(self):
+        """Cancel running jobs and drop everything still queued (app shutdown)."""
+        for lane in self._lanes.values():
+            lane.clear()
+        tasks = list(self._tasks)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._lanes.clear()
+        for c in self.workers:
+            self._ready[c].clear()
+            self._queued[c] = 0
+
+    def _pump(self, job_class: str):
+        ready = self._ready[job_class]
+        while ready and self._running[job_class] < self.workers[job_class]:
+            key = ready.popleft()
+            job = self._lanes[key].popleft()
+            self._queued[job_class] -= 1
+            self._running[job_class] += 1
+            task = asyncio.create_task(self._run(key, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: tuple[str, int], job: Job):
+        job_class, chat_id = key
+        current_job_class.set(job_class)
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"{job_class} job failed for chat {chat_id}")
+        finally:
+            self._running[job_class] -= 1
+            lane = self._lanes.get(key)
+            if lane:
+                # Back of the line, so other chats waiting on this class get a turn.
+                self._ready[job_class].append(key)
+            else:
+                self._lanes.pop(key, None)
+            self._pump(job_class)
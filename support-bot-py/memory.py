@@ -0,0 +1,147 @@
+"""Rolling per-chat conversation summaries ("memory mode").
+
+Without it handle_default resends up to context_size tokens of raw turns on
+every message, so long chats cost the most and answer the slowest. With memory
+enabled, once the turns after a chat's summary pass `threshold` tokens the older
+ones are folded into the summary by a background task; the prompt is then the
+summary plus the recent turns, which keeps its size roughly flat.
+
+Summaries are stored in Supabase, one row per chat:
+
+    create table chat_summary (
+        chat_id bigint primary key,
+        summary text not null,
+        until timestamptz not null,  -- created_at of the last folded message
+        tokens integer not null
+    );
+"""
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from itertools import accumulate
+
+from loguru import logger
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+
+from repository import Message, MessageRepository
+from utils import count_tokens
+
+_SYSTEM_PROMPT = (
+    "You maintain the running memory of a chat between a user and an assistant. "
+    "Merge the previous summary and the new turns into one concise summary that "
+    "keeps facts about the user, decisions, open questions and anything the "
+    "assistant promised. Write it in the language of the conversation."
+)
+
+
+class ChatSummary(BaseModel):
+    summary: str
+    until: datetime
+    tokens: int
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        repository: MessageRepository,
+        openai_client: AsyncOpenAI,
+        model: str,
+        threshold: int = 3000,
+        keep_recent: int = 1000,
+        max_tokens: int = 600,
+        max_chats: int = 256,
+    ):
+        """Fold once the unsummarized turns pass `threshold` tokens, leaving the
+        newest `keep_recent` tokens of turns as they are."""
+        self.repository = repository
+        self.openai = openai_client
+        self.model = model
+        self.threshold = threshold
+        self.keep_recent = keep_recent
+        self.max_tokens = max_tokens
+        self.max_chats = max_chats
+        # chat_id -> summary (None: the chat has none yet), least recently used first
+        self._summaries: OrderedDict[int, ChatSummary | None] = OrderedDict()
+        self._folding: dict[int, asyncio.Task] = {}
+
+    async def get(self, chat_id: int) -> ChatSummary | None:
+        if chat_id in self._summaries:
+            self._summaries.move_to_end(chat_id)
+            return self._summaries[chat_id]
+        try:
+            row = await self.repository.get_summary(chat_id)
+        except Exception as e:
+            logger.error(f"memory: could not load summary for chat {chat_id}: {e}")
+            return None
+        summary = ChatSummary(**row) if row else None
+        self._remember(chat_id, summary)
+        return summary
+
+    def _remember(self, chat_id: int, summary: ChatSummary | None):
+        self._summaries[chat_id] = summary
+        self._summaries.move_to_end(chat_id)
+        while len(self._summaries) > self.max_chats:
+            self._summaries.popitem(last=False)
+
+    @staticmethod
+    def recent(summary: ChatSummary | None, messages: list[Message]) -> list[Message]:
+        """The messages not yet folded into `summary`."""
+        if summary is None:
+            return messages
+        return [m for m in messages if m.created_at is None or m.created_at > summary.until]
+
+    @staticmethod
+    def prompt(summary: ChatSummary) -> dict:
+        return {
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{summary.summary}",
+        }
+
+    def schedule_fold(self, chat_id: int, summary: ChatSummary | None, recent: list[Message]):
+        """Start folding the older of `recent` into the summary in the background,
+        if they have grown past the threshold and no fold is running for the chat."""
+        if chat_id in self._folding:
+            return
+        # A fold that finished since the caller read the summary wins.
+        summary = self._summaries.get(chat_id, summary)
+        recent = self.recent(summary, recent)
+        if sum(m.tokens or 0 for m in recent) <= self.threshold:
+            return
+        # totals[k] = tokens in the k + 1 newest messages
+        totals = list(accumulate(reversed([m.tokens or 0 for m in recent])))
+        keep = sum(1 for t in totals if t <= self.keep_recent)
+        folded = recent[:len(recent) - keep]
+        if not folded or folded[-1].created_at is None:
+            return
+        task = asyncio.create_task(self._fold(chat_id, summary, folded))
+        self._folding[chat_id] = task
+        task.add_done_callback(lambda _: self._folding.pop(chat_id, None))
+
+    async def _fold(self, chat_id: int, summary: ChatSummary | None, folded: list[Message]):
+        turns = "\n\n".join(f"{m.user}: {m.content}" for m in folded)
+        previous = summary.summary if summary else "(none)"
+        try:
+            response = await self.openai.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Previous summary:\n{previous}\n\nNew turns:\n{turns}"},
+                ],
+                max_tokens=self.max_tokens,
+            )
+            text = response.choices[0].message.content
+            if not text:
+                logger.warning(f"memory: empty summary for chat {chat_id}, keeping the old one")
+                return
+            new = ChatSummary(
+                summary=text,
+                until=folded[-1].created_at,
+                tokens=await asyncio.to_thread(count_tokens, text, self.model),
+            )
+            await self.repository.save_summary(chat_id, new.model_dump(mode="json"))
+        except Exception as e:
+            logger.error(f"memory: failed to fold {len(folded)} turns for chat {chat_id}: {e}")
+            return
+        self._remember(chat_id, new)
+        logger.info(f"memory: folded {len(folded)} turns for chat {chat_id} ({new.tokens} tokens)")
@@ -122,7 +122,8 @@ class NewsScheduler:
             # Create newsletter messages (header + one per sender)
             messages = await self.gmail_service.create_news_summary(sender_emails)
 
-            # Send each message separately (Telegram HTML)
+            # Send each message separately (Telegram HTML). TelegramBot paces these
+            # to the channel's rate limit and retries on 429, so nothing is dropped.
             for message in messages:
                 # Split individual message into chunks if it exceeds Telegram limit
                 if len(message) > 4000:
@@ -166,7 +167,7 @@ async def main():
     
     # Import settings and create telegram bot
     from settings import Settings
-    from telegram import TelegramBot
+    from telegram import create_telegram_bot
     
     settings = Settings()
     
@@ -184,10 +185,7 @@ async def main():
         return
     
     # Create components
-    telegram_bot = TelegramBot(
-        settings.telegram_token,
-        local_api_url=settings.telegram_local_api_url,
-    )
+    telegram_bot = create_telegram_bot(settings)
     scheduler = NewsScheduler(telegram_bot, settings)
     
     print(f"📰 Testing newsletter submission to channel: {settings.news_channel_id}")
@@ -212,6 +210,8 @@ async def main():
         print("1. Bot is added to the channel as admin")
         print("2. Gmail token is configured (GMAIL_TOKEN_BASE64 or token.pickle)")
         print("3. Channel ID is correct")
+    finally:
+        await telegram_bot.close()
 
 
 if __name__ == "__main__":
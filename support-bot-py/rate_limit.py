@@ -0,0 +1,31 @@
+"""Reservation-based token buckets for pacing outbound Telegram sends.
+
+Implemented as GCRA (generic cell rate algorithm): each bucket only stores the
+theoretical arrival time of the next token, so reserve() is O(1), needs no lock
+or background refill task, and hands out slots in call order. Callers sleep for
+the returned delay instead of polling.
+"""
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """`rate` tokens per second, bursts of up to `capacity` tokens."""
+        self.interval = 1.0 / rate
+        self.tolerance = (max(capacity, 1.0) - 1.0) * self.interval
+        self._tat = 0.0  # theoretical arrival time of the next token (monotonic clock)
+
+    def reserve(self) -> float:
+        """Take one token; return how many seconds to wait before using it."""
+        now = time.monotonic()
+        tat = max(self._tat, now)
+        self._tat = tat + self.interval
+        return max(0.0, tat - self.tolerance - now)
+
+    def pause(self, seconds: float):
+        """Hold back new tokens for `seconds` (e.g. after a 429 retry_after)."""
+        self._tat = max(self._tat, time.monotonic() + seconds + self.tolerance)
+
+    def idle(self) -> bool:
+        """True when the bucket is full again and can be dropped without effect."""
+        return self._tat <= time.monotonic()
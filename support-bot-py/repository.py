@@ -1,48 +1,337 @@
 import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from typing import Literal
 
+from httpx import AsyncClient, HTTPStatusError
+from loguru import logger
 from pydantic import BaseModel
 
-from storage import client
+from storage import create_rest_client
+from utils import count_tokens
 
 
 class Message(BaseModel):
     content: str
     user: Literal["user"] | Literal["assistant"]
+    # Token count of `content`, computed once per message and kept with it
+    tokens: int | None = None
+    created_at: datetime | None = None
+
+
+def _rejected(e: Exception) -> bool:
+    """Whether a failed insert was refused for its content (4xx), so retrying
+    the same rows can't succeed. Timeouts and rate limits are worth a retry."""
+    return (
+        isinstance(e, HTTPStatusError)
+        and e.response.is_client_error
+        and e.response.status_code not in (408, 429)
+    )
+
+
+def _covers(messages: list[Message], token_budget: int | None) -> bool:
+    return token_budget is not None and sum(m.tokens or 0 for m in messages) >= token_budget
+
+
+class ConversationCache:
+    """LRU of recent per-chat history, bounded by chat count and content bytes.
+
+    Holds at most `history_limit` newest messages per chat, oldest first — the
+    same window get_messages reads from Supabase. An entry filled by a
+    token-budgeted read may hold fewer; it is then marked partial."""
+
+    def __init__(self, max_chats: int, max_bytes: int, history_limit: int = 100):
+        self.max_chats = max_chats
+        self.max_bytes = max_bytes
+        self.history_limit = history_limit
+        self._chats: OrderedDict[int, list[Message]] = OrderedDict()
+        self._sizes: dict[int, int] = {}
+        self._partial: set[int] = set()
+        self.size = 0
+
+    def get(self, chat_id: int) -> list[Message] | None:
+        messages = self._chats.get(chat_id)
+        if messages is None:
+            return None
+        self._chats.move_to_end(chat_id)
+        return list(messages)
+
+    def set(self, chat_id: int, messages: list[Message], complete: bool = True):
+        """Cache a chat's history; complete=False if older messages were left out."""
+        self._store(chat_id, messages[-self.history_limit:])
+        if complete:
+            self._partial.discard(chat_id)
+        elif chat_id in self._chats:
+            self._partial.add(chat_id)
+
+    def is_complete(self, chat_id: int) -> bool:
+        return chat_id in self._chats and chat_id not in self._partial
+
+    def extend(self, chat_id: int, messages: list[Message]):
+        """Append to a cached chat; a chat that isn't cached stays uncached (it is
+        filled from Supabase on its next read)."""
+        current = self._chats.get(chat_id)
+        if current is not None:
+            self._store(chat_id, (current + messages)[-self.history_limit:])
+
+    def _store(self, chat_id: int, messages: list[Message]):
+        partial = chat_id in self._partial
+        self._drop(chat_id)
+        if partial:
+            self._partial.add(chat_id)
+        size = sum(len(m.content.encode("utf-8")) for m in messages)
+        self._chats[chat_id] = messages
+        self._sizes[chat_id] = size
+        self.size += size
+        while self._chats and (len(self._chats) > self.max_chats or self.size > self.max_bytes):
+            self._drop(next(iter(self._chats)))
+        if chat_id not in self._chats:
+            self._partial.discard(chat_id)
+
+    def _drop(self, chat_id: int):
+        if self._chats.pop(chat_id, None) is not None:
+            self.size -= self._sizes.pop(chat_id)
+            self._partial.discard(chat_id)
 
 
 class MessageRepository:
-    def __init__(self) -> None:
-        self.client = client
-
-    async def get_messages(self, chat_id: int, limit: int = 100) -> list[Message]:
-        query = (
-            self.client.table("message")
-            .select("content, user")
-            .eq("chat_id", chat_id)
-            .order("created_at", desc=True)
-            .limit(limit)
+    def __init__(
+        self,
+        cache_max_chats: int = 256,
+        cache_max_bytes: int = 32 * 1024 * 1024,
+        flush_interval: float = 0.3,
+        flush_batch: int = 50,
+        max_pending: int = 10_000,
+        max_backoff: float = 60,
+        token_model: str = "gpt-4o-mini",
+        store_tokens: bool = False,
+        page_size: int = 20,
+    ) -> None:
+        self._client: AsyncClient | None = None
+        # Token counts are computed once per message (with token_model's
+        # tokenizer) and cached on the Message. With store_tokens they are also
+        # written to / read from the message table's "tokens" column.
+        self.token_model = token_model
+        self.store_tokens = store_tokens
+        # Token-budgeted reads fetch history in pages of this many rows.
+        self.page_size = page_size
+        # Active conversations are served from memory and only hit Supabase on
+        # their first read (or after eviction).
+        self.cache = ConversationCache(cache_max_chats, cache_max_bytes)
+        # Write-behind: add_messages only updates the cache and queues rows; they
+        # go to Supabase in one bulk insert per flush_batch rows or flush_interval.
+        # While inserts fail, retries back off up to max_backoff seconds and at
+        # most max_pending rows are kept.
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self._failures = 0
+        self._pending: list[dict] = []
+        self._flush_task: asyncio.Task | None = None
+        self._last_created_at = datetime.min.replace(tzinfo=timezone.utc)
+
+    async def get_messages(
+        self, chat_id: int, limit: int = 100, token_budget: int | None = None
+    ) -> list[Message]:
+        """Up to `limit` newest messages, oldest first.
+
+        With a token_budget, history is read newest-first in pages and reading
+        stops once the messages cover the budget, so callers that will trim to a
+        context window anyway don't pull (and pay for) the full `limit` rows."""
+        if limit <= self.cache.history_limit:
+            cached = self.cache.get(chat_id)
+            if cached is not None and (
+                self.cache.is_complete(chat_id) or _covers(cached, token_budget)
+            ):
+                return cached[-limit:]
+
+        if any(row["chat_id"] == chat_id for row in self._pending):
+            await self.flush()
+        messages, complete = await self._fetch_pages(
+            chat_id, max(limit, self.cache.history_limit), token_budget
         )
+        self.cache.set(chat_id, messages, complete=complete)
+        return messages[-limit:]
 
-        data = await asyncio.to_thread(query.execute)
-        data = data.data
+    async def _fetch_pages(
+        self, chat_id: int, limit: int, token_budget: int | None
+    ) -> tuple[list[Message], bool]:
+        """Newest pages first until `limit` rows, the start of the chat, or the
+        token budget is reached. Returns the messages oldest first and whether
+        the result is complete (not cut short by the budget)."""
+        page_size = limit if token_budget is None else self.page_size
+        messages: list[Message] = []
+        while len(messages) < limit:
+            size = min(page_size, limit - len(messages))
+            page = await self._fetch(chat_id, size, offset=len(messages))
+            messages = page + messages
+            if len(page) < size:
+                return messages, True
+            if _covers(messages, token_budget):
+                return messages, len(messages) >= limit
+        return messages, True
+
+    @property
+    def client(self) -> AsyncClient:
+        """PostgREST client, created on first use (and again after close())."""
+        if self._client is None or self._client.is_closed:
+            self._client = create_rest_client()
+        return self._client
+
+    async def _fetch(self, chat_id: int, limit: int, offset: int = 0) -> list[Message]:
+        response = await self.client.get(
+            "/message",
+            params={
+                "select": "content,user,created_at,tokens" if self.store_tokens else "content,user,created_at",
+                "chat_id": f"eq.{chat_id}",
+                "order": "created_at.desc",
+                "limit": limit,
+                "offset": offset,
+            },
+        )
+        response.raise_for_status()
+        data = response.json()
         data = data[::-1]
-        return [Message(**message) for message in data]
+        messages = [Message(**message) for message in data]
+        if any(m.tokens is None for m in messages):
+            await asyncio.to_thread(self._count_tokens, messages)
+        return messages
+
+    def _count_tokens(self, messages: list[Message]) -> list[Message]:
+        for m in messages:
+            if m.tokens is None:
+                m.tokens = count_tokens(m.content, self.token_model)
+        return messages
+
+    async def add_messages(self, chat_id: int, messages: list[Message]) -> list[Message]:
+        """Queue messages for the next bulk insert; returns without a DB round trip.
+
+        Returns the stored messages, with token counts and created_at filled in."""
+        new = self._count_tokens([Message(**message) for message in messages])
+        for m in new:
+            m.created_at = self._next_created_at()
+        self.cache.extend(chat_id, new)
+        self._pending.extend(
+            {
+                **m.model_dump(mode="json", exclude=None if self.store_tokens else {"tokens"}),
+                "chat_id": chat_id,
+            }
+            for m in new
+        )
+        self._bound_pending()
+        # Backing off after a failed insert: wait for the scheduled retry.
+        if len(self._pending) >= self.flush_batch and not self._failures:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return new
+
+    def _next_created_at(self) -> datetime:
+        # Rows in one bulk insert would all get the same server-side now(), which
+        # breaks the created_at ordering get_messages relies on; stamp them here,
+        # strictly increasing.
+        ts = max(datetime.now(timezone.utc), self._last_created_at + timedelta(microseconds=1))
+        self._last_created_at = ts
+        return ts
 
-    async def add_messages(self, chat_id: int, messages: list[Message]) -> None:
-        query = self.client.table("message").insert(
-            [{**message, "chat_id": chat_id} for message in messages]
+    async def _flush_later(self, delay: float | None = None):
+        await asyncio.sleep(self.flush_interval if delay is None else delay)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Insert everything queued so far in one request.
+
+        Rows the server rejects (4xx) are isolated by bisecting the batch, then
+        dropped and logged. On any other failure the unwritten rows are put back
+        and retried with exponential backoff."""
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        unwritten = await self._insert_valid(rows)
+        if not unwritten:
+            self._failures = 0
+            return
+        self._failures += 1
+        self._pending = unwritten + self._pending
+        self._bound_pending()
+        delay = min(self.flush_interval * 2 ** self._failures, self.max_backoff)
+        logger.warning(f"Retrying {len(self._pending)} unwritten messages in {delay:.1f}s")
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later(delay))
+
+    async def _insert_valid(self, rows: list[dict]) -> list[dict]:
+        """Insert `rows`, dropping the ones the server rejects. Returns the rows
+        left unwritten by a transient failure, in order."""
+        batches = [rows]  # a stack: the next batch to insert is last
+        written = 0
+        while batches:
+            batch = batches.pop()
+            try:
+                await self._insert(batch)
+                written += len(batch)
+            except Exception as e:
+                if not _rejected(e):
+                    logger.error(f"Failed to flush {len(batch)} messages, will retry: {e}")
+                    return batch + [row for b in reversed(batches) for row in b]
+                if len(batch) == 1:
+                    logger.error(f"Dropping a message the repository rejected: {e}; row: {batch[0]}")
+                else:
+                    half = len(batch) // 2
+                    batches += [batch[half:], batch[:half]]
+        if written:
+            logger.info(f"Flushed {written} messages to repository")
+        return []
+
+    def _bound_pending(self):
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            logger.error(f"{len(self._pending)} messages waiting to be written; dropping the {overflow} oldest")
+            del self._pending[:overflow]
+
+    async def close(self) -> None:
+        """Flush queued messages and close the connection pool (app shutdown)."""
+        if self._flush_task is not None:
+            if self._failures:
+                # A retry backing off is only sleeping (the task is cleared
+                # before it flushes); retry now instead of waiting it out.
+                self._flush_task.cancel()
+            # Let a scheduled flush finish rather than cancel it mid-insert.
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _insert(self, rows: list[dict]) -> None:
+        response = await self.client.post(
+            "/message", json=rows, headers={"Prefer": "return=minimal"}
         )
+        response.raise_for_status()
 
-        await asyncio.to_thread(query.execute)
+    async def get_summary(self, chat_id: int) -> dict | None:
+        """The chat's stored conversation summary row (memory mode), if any."""
+        response = await self.client.get(
+            "/chat_summary",
+            params={"select": "summary,until,tokens", "chat_id": f"eq.{chat_id}"},
+        )
+        response.raise_for_status()
+        rows = response.json()
+        return rows[0] if rows else None
 
-    async def ping(self) -> bool:
-        query = (
-            self.client.table("message")
-            .select("created_at")
-            .order("created_at", desc=True)
-            .limit(1)
+    async def save_summary(self, chat_id: int, row: dict) -> None:
+        response = await self.client.post(
+            "/chat_summary",
+            json={**row, "chat_id": chat_id},
+            headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
         )
+        response.raise_for_status()
 
-        data = await asyncio.to_thread(query.execute)
-        return data.data
+    async def ping(self) -> list[dict]:
+        response = await self.client.get(
+            "/message",
+            params={"select": "created_at", "order": "created_at.desc", "limit": 1},
+        )
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,163 @@
+"""Persistent cache of YouTube pipeline results.
+
+Re-requesting a video used to rerun the whole pipeline (paid translation, CPU
+diarization, Telegraph publishing). The result dicts returned by
+process_youtube_transcript / process_youtube_diarize are stored in SQLite as
+zlib-compressed JSON, keyed on (video_id, mode, num_speakers), with a TTL and
+an LRU bound on total payload size. A hit replies with the existing Telegraph
+URLs and summary without touching any API.
+
+sqlite3 is blocking, so the async get/put run the queries in a worker thread.
+get_many/put_many do the same for a batch of keys in one transaction (the
+translation memory reads and writes a transcript's paragraphs at once).
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from loguru import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+
+# Stay under SQLite's limit on query parameters
+_BATCH = 500
+
+
+class ResultCache:
+    def __init__(self, path: str | None, ttl: float, max_bytes: int):
+        """A None path disables the cache (every lookup misses, puts are dropped)."""
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    @staticmethod
+    def _key(key: tuple) -> str:
+        return json.dumps(list(key))
+
+    async def get(self, key: tuple) -> dict | None:
+        if not self.path:
+            return None
+        return await asyncio.to_thread(self.lookup, key)
+
+    async def put(self, key: tuple, value: dict):
+        if not self.path:
+            return
+        await asyncio.to_thread(self.store, key, value)
+
+    async def get_many(self, keys: list[tuple]) -> dict[tuple, dict]:
+        """The values found for `keys`; missing and expired keys are left out."""
+        if not self.path or not keys:
+            return {}
+        return await asyncio.to_thread(self.lookup_many, keys)
+
+    async def put_many(self, items: dict[tuple, dict]):
+        if not self.path or not items:
+            return
+        await asyncio.to_thread(self.store_many, items)
+
+    def lookup(self, key: tuple) -> dict | None:
+        """Blocking get, for code already running in a worker thread."""
+        if not self.path:
+            return None
+        try:
+            return self._get(self._key(key))
+        except (sqlite3.Error, ValueError, zlib.error) as e:
+            logger.warning(f"result cache: lookup failed for {key}: {e}")
+            return None
+
+    def store(self, key: tuple, value: dict):
+        """Blocking put, for code already running in a worker thread."""
+        if not self.path:
+            return
+        try:
+            self._put(self._key(key), value)
+        except (sqlite3.Error, TypeError) as e:
+            logger.warning(f"result cache: store failed for {key}: {e}")
+
+    def lookup_many(self, keys: list[tuple]) -> dict[tuple, dict]:
+        """Blocking get_many."""
+        if not self.path:
+            return {}
+        by_key = {self._key(k): k for k in keys}
+        try:
+            found = self._get_many(list(by_key))
+        except (sqlite3.Error, ValueError, zlib.error) as e:
+            logger.warning(f"result cache: lookup of {len(by_key)} keys failed: {e}")
+            return {}
+        return {by_key[k]: value for k, value in found.items()}
+
+    def store_many(self, items: dict[tuple, dict]):
+        """Blocking put_many."""
+        if not self.path:
+            return
+        try:
+            self._put_many({self._key(k): value for k, value in items.items()})
+        except (sqlite3.Error, TypeError) as e:
+            logger.warning(f"result cache: store of {len(items)} keys failed: {e}")
+
+    def _get(self, key: str) -> dict | None:
+        value = self._get_many([key]).get(key)
+        if value is not None:
+            logger.info(f"result cache: hit {key}")
+        return value
+
+    def _get_many(self, keys: list[str]) -> dict[str, dict]:
+        now = time.time()
+        rows = []
+        with self._connect() as conn:
+            for i in range(0, len(keys), _BATCH):
+                batch = keys[i:i + _BATCH]
+                rows += conn.execute(
+                    f"SELECT key, payload FROM results "
+                    f"WHERE key IN ({','.join('?' * len(batch))}) AND created_at > ?",
+                    (*batch, now - self.ttl),
+                ).fetchall()
+            conn.executemany(
+                "UPDATE results SET accessed_at = ? WHERE key = ?", [(now, key) for key, _ in rows]
+            )
+        return {key: json.loads(zlib.decompress(payload)) for key, payload in rows}
+
+    def _put(self, key: str, value: dict):
+        self._put_many({key: value})
+
+    def _put_many(self, items: dict[str, dict]):
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            payload = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+            rows.append((key, payload, len(payload), now, now))
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", rows)
+            conn.execute("DELETE FROM results WHERE created_at <= ?", (now - self.ttl,))
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed_at"):
+            evicted.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany("DELETE FROM results WHERE key = ?", evicted)
+        logger.info(f"result cache: evicted {len(evicted)} entries")
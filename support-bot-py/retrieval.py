@@ -0,0 +1,216 @@
+"""Embedding retrieval of relevant older chat turns ("retrieval mode").
+
+filter_context_size only keeps the newest turns that fit, so something said a
+week ago is gone however relevant it is. With retrieval enabled every stored
+turn is embedded once, and each new message pulls the top-k most similar older
+turns (outside the recent window) into the prompt.
+
+Each chat's index is a float32 matrix of unit-length embeddings searched by
+brute force (one matrix-vector product gives the cosine similarities), kept in
+an LRU of chats. On disk a chat is two append-only files under `path`:
+{chat_id}.f32 with the raw vectors and {chat_id}.jsonl with the turns, so
+indexing a turn costs one append rather than a rewrite.
+"""
+import asyncio
+import json
+import os
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+from loguru import logger
+from openai import AsyncOpenAI
+
+from repository import Message
+
+
+@dataclass
+class ChatIndex:
+    vectors: np.ndarray  # (n, dimensions) float32, rows of unit length
+    messages: list[Message] = field(default_factory=list)
+
+
+class ConversationIndex:
+    def __init__(
+        self,
+        openai_client: AsyncOpenAI,
+        model: str = "text-embedding-3-small",
+        dimensions: int = 256,
+        path: str | None = None,
+        top_k: int = 4,
+        min_score: float = 0.3,
+        max_turns: int = 2000,
+        max_chats: int = 64,
+    ):
+        """A None path keeps indexes in memory only (lost on restart)."""
+        self.openai = openai_client
+        self.model = model
+        self.dimensions = dimensions
+        self.path = path
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_turns = max_turns
+        self.max_chats = max_chats
+        self._chats: OrderedDict[int, ChatIndex] = OrderedDict()
+        self._locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._tasks: set[asyncio.Task] = set()
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        """Unit-length float32 embeddings, one row per text."""
+        response = await self.openai.embeddings.create(
+            model=self.model, input=texts, dimensions=self.dimensions
+        )
+        vectors = np.array([d.embedding for d in response.data], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    async def search(
+        self,
+        chat_id: int,
+        query: np.ndarray,
+        before: datetime | None = None,
+        token_budget: int | None = None,
+    ) -> list[Message]:
+        """Up to top_k turns most similar to `query`, oldest first.
+
+        Only turns created before `before` (the start of the recent window) are
+        candidates, and the best ones are taken while they fit `token_budget`."""
+        async with self._locks[chat_id]:
+            index = await self._load(chat_id)
+        n = len(index.messages)
+        if n == 0:
+            return []
+        if before is not None:
+            n = sum(1 for m in index.messages if m.created_at is not None and m.created_at < before)
+        if n == 0:
+            return []
+        scores = index.vectors[:n] @ query
+        k = min(self.top_k, n)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        picked, used = [], 0
+        for i in best:
+            if scores[i] < self.min_score:
+                break
+            m = index.messages[i]
+            if token_budget is not None and used + (m.tokens or 0) > token_budget:
+                continue
+            picked.append(i)
+            used += m.tokens or 0
+        return [index.messages[i] for i in sorted(picked)]
+
+    @staticmethod
+    def prompt(messages: list[Message]) -> dict:
+        turns = "\n\n".join(f"{m.user}: {m.content}" for m in messages)
+        return {
+            "role": "system",
+            "content": f"Earlier messages from this chat that may be relevant:\n{turns}",
+        }
+
+    def schedule_add(self, chat_id: int, messages: list[Message], vectors: dict[int, np.ndarray] | None = None):
+        """Index stored turns in the background. `vectors` maps positions in
+        `messages` to embeddings the caller already has (e.g. the query's)."""
+        task = asyncio.create_task(self.add(chat_id, messages, vectors or {}))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def add(self, chat_id: int, messages: list[Message], vectors: dict[int, np.ndarray]):
+        try:
+            missing = [i for i in range(len(messages)) if i not in vectors]
+            if missing:
+                embedded = await self.embed([messages[i].content for i in missing])
+                vectors = {**vectors, **dict(zip(missing, embedded))}
+            new = np.stack([vectors[i] for i in range(len(messages))]).astype(np.float32)
+            async with self._locks[chat_id]:
+                index = await self._load(chat_id)
+                # Embedding runs outside the lock, so a later turn can get here
+                # first; search() needs the turns in created_at order.
+                at = self._position(index, messages[0])
+                index.vectors = np.concatenate([index.vectors[:at], new, index.vectors[at:]])
+                index.messages[at:at] = messages
+                # Trim back to max_turns once it is overrun by a quarter, so the
+                # on-disk rewrite happens now and then rather than per turn. An
+                # insert before the end rewrites too, as the files only append.
+                compact = (
+                    len(index.messages) > self.max_turns + self.max_turns // 4
+                    or at + len(messages) < len(index.messages)
+                )
+                if compact:
+                    index.vectors = index.vectors[-self.max_turns:]
+                    index.messages = index.messages[-self.max_turns:]
+                if self.path:
+                    await asyncio.to_thread(self._write, chat_id, index, messages, new, compact)
+        except Exception as e:
+            logger.error(f"retrieval: failed to index {len(messages)} turns for chat {chat_id}: {e}")
+
+    @staticmethod
+    def _position(index: ChatIndex, first: Message) -> int:
+        """Where turns starting with `first` go to keep the index in created_at
+        order: after every turn created before it."""
+        at = len(index.messages)
+        if first.created_at is None:
+            return at
+        while at and (before := index.messages[at - 1].created_at) is not None and before > first.created_at:
+            at -= 1
+        return at
+
+    async def _load(self, chat_id: int) -> ChatIndex:
+        index = self._chats.get(chat_id)
+        if index is None:
+            index = await asyncio.to_thread(self._read, chat_id)
+            self._chats[chat_id] = index
+        self._chats.move_to_end(chat_id)
+        while len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+        return index
+
+    def _files(self, chat_id: int) -> tuple[str, str]:
+        base = os.path.join(self.path, str(chat_id))
+        return f"{base}.f32", f"{base}.jsonl"
+
+    def _read(self, chat_id: int) -> ChatIndex:
+        empty = ChatIndex(np.empty((0, self.dimensions), dtype=np.float32))
+        if not self.path:
+            return empty
+        vectors_path, messages_path = self._files(chat_id)
+        try:
+            vectors = np.fromfile(vectors_path, dtype=np.float32)
+            with open(messages_path, encoding="utf-8") as f:
+                messages = [Message(**json.loads(line)) for line in f if line.strip()]
+        except FileNotFoundError:
+            return empty
+        except (OSError, ValueError) as e:
+            logger.warning(f"retrieval: could not load index for chat {chat_id}: {e}")
+            return empty
+        if vectors.size % self.dimensions:
+            logger.warning(f"retrieval: index for chat {chat_id} has other dimensions, starting over")
+            return empty
+        vectors = vectors.reshape(-1, self.dimensions)
+        # An interrupted append can leave one file a row ahead of the other;
+        # rewrite both at the common length so later appends stay aligned.
+        n = min(len(vectors), len(messages))
+        index = ChatIndex(vectors[:n].copy(), messages[:n])
+        if len(vectors) != len(messages):
+            self._write(chat_id, index, [], vectors[:0], compact=True)
+        return index
+
+    def _write(self, chat_id: int, index: ChatIndex, messages: list[Message], vectors: np.ndarray, compact: bool):
+        vectors_path, messages_path = self._files(chat_id)
+        if compact:
+            # Rewrite the capped index, then swap it in.
+            messages, vectors, mode = index.messages, index.vectors, "wb"
+        else:
+            mode = "ab"
+        suffix = ".tmp" if compact else ""
+        with open(vectors_path + suffix, mode) as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(messages_path + suffix, mode) as f:
+            for m in messages:
+                f.write(m.model_dump_json().encode("utf-8") + b"\n")
+        if compact:
+            os.replace(vectors_path + suffix, vectors_path)
+            os.replace(messages_path + suffix, messages_path)
@@ -7,9 +7,56 @@ class Settings(BaseSettings):
     )
     telegram_token: str
     telegram_local_api_url: str | None = None
+    # Shared keep-alive Bot API client (opened/closed in the app lifespan)
+    telegram_http2: bool = True
+    telegram_max_connections: int = 20
+    telegram_max_keepalive_connections: int = 10
+    telegram_keepalive_expiry: float = 30.0  # seconds an idle connection is kept
+    telegram_timeout: float = 30.0  # default per-request timeout, seconds
+    telegram_connect_timeout: float = 10.0
+    # Outbound send pacing (token buckets) and 429 retry_after handling
+    telegram_global_rate: float = 30.0  # messages/second across all chats
+    telegram_chat_rate: float = 1.0  # messages/second per chat
+    telegram_chat_burst: int = 3  # messages a chat may receive back-to-back
+    telegram_group_rate_per_minute: float = 20.0  # groups and channels
+    telegram_max_retries: int = 5  # 429 retries before giving up on a message
     database_url: str
     database_key: str
+    database_max_connections: int = 10  # PostgREST keep-alive pool size
+    database_timeout: float = 10.0  # seconds
     timeout: int = 20000
+    # Webhook job dispatcher: concurrent workers per job class, and how many jobs
+    # per class may wait before new ones are turned away.
+    jobs_chat_workers: int = 4
+    jobs_transcript_workers: int = 2
+    jobs_diarize_workers: int = 1
+    jobs_media_workers: int = 1
+    # Requests joining a YouTube run already in flight only wait for its result
+    jobs_join_workers: int = 16
+    jobs_max_queued: int = 20
+    # Redelivered webhook updates are acknowledged without work. Point the path at
+    # a volume so the seen ids survive deploy restarts.
+    update_dedup_maxsize: int = 10000
+    update_dedup_ttl: int = 86400  # seconds
+    update_dedup_path: str | None = None
+    # On-disk cache of /yt and /yd results (SQLite); disabled when the path is unset
+    result_cache_path: str | None = None
+    result_cache_ttl: int = 30 * 86400  # seconds
+    result_cache_max_mb: int = 200
+    # On-disk cache of fetched YouTube captions shared by /sy, /yt and /yd (SQLite)
+    transcript_cache_path: str | None = None
+    transcript_cache_ttl: int = 7 * 86400  # seconds
+    transcript_cache_max_mb: int = 100
+    # Translated transcript paragraphs, reused by later translations (SQLite)
+    translation_memory_path: str | None = None
+    translation_memory_ttl: int = 90 * 86400  # seconds
+    translation_memory_max_mb: int = 100
+    # Telegraph publishing: shared keep-alive client; the account token is kept
+    # in this file so restarts reuse the account (in memory only when unset)
+    telegraph_token_path: str | None = None
+    telegraph_max_connections: int = 10
+    telegraph_timeout: float = 30.0  # seconds
+    telegraph_max_page_bytes: int = 64000  # serialized page content; Telegraph allows 64 KB
     summary_queue_url: str
     ya_api: str
     spam_list: str | None = None
@@ -19,12 +66,56 @@ class Settings(BaseSettings):
     model_summarizer: str = "gpt-4o-mini"
     model_spam: str = "gpt-4o-mini"
     model_transcript: str = "gpt-4o-mini"
+    transcript_translate_concurrency: int = 4  # chunk translations in flight per video
+    # LLM input chunk budgets in tokens (tiktoken count for the target model);
+    # translation output must also fit the 16K max_tokens of the reply
+    translate_chunk_tokens: int = 5000
+    summary_chunk_tokens: int = 8000
+    # Transcript summaries: chunk summaries run concurrently, and are merged in
+    # groups of at most this many tokens until one combine call fits
+    summary_concurrency: int = 4
+    summary_reduce_budget: int = 12000
     model_audio_translator: str = "gpt-4o-mini-audio-preview"
     model_transcription: str = "gpt-4o-mini-transcribe"
     model_diarize: str = "gpt-4o-transcribe-diarize"
     x_telegram_bot_header: str
     openai_api_key: str
     context_size: int = 4096
+    # In-process LRU of recent chat history in front of Supabase
+    history_cache_chats: int = 256
+    history_cache_mb: int = 32
+    # Write-behind persistence of chat turns: bulk insert per batch or interval
+    history_flush_interval: float = 0.3  # seconds
+    history_flush_batch: int = 50  # rows
+    # Unwritten rows kept while Supabase is down; the oldest are dropped beyond this
+    history_max_pending: int = 10_000
+    history_flush_max_backoff: float = 60  # seconds between retries at most
+    # Persist per-message token counts; needs an integer "tokens" column on the
+    # message table. Counts are cached in memory either way.
+    history_store_tokens: bool = False
+    history_page_size: int = 20  # rows per page when fetching history by token budget
+    # Memory mode: fold older turns into a per-chat summary stored in the
+    # chat_summary table (see memory.py) and prompt with summary + recent turns
+    memory_enabled: bool = False
+    memory_threshold: int = 3000  # tokens of unsummarized turns that trigger a fold
+    memory_keep_recent: int = 1000  # tokens of newest turns left out of the fold
+    memory_summary_max_tokens: int = 600
+    # Retrieval mode: embed stored turns and add the most relevant older ones
+    # (outside the recent window) to the prompt. Index files live under the path.
+    retrieval_enabled: bool = False
+    retrieval_index_path: str | None = None
+    model_embedding: str = "text-embedding-3-small"
+    retrieval_dimensions: int = 256
+    retrieval_top_k: int = 4
+    retrieval_min_score: float = 0.3  # cosine similarity
+    retrieval_budget: int = 1000  # tokens of the context_size given to retrieved turns
+    retrieval_max_turns: int = 2000  # per chat, oldest dropped first
+    retrieval_timeout: float = 5.0  # seconds to embed the query before answering without retrieval
+    # Stream chat replies: post a placeholder, then edit it as tokens arrive,
+    # at most once per interval or every N streamed tokens.
+    stream_replies: bool = True
+    stream_edit_interval: float = 1.0  # seconds
+    stream_edit_tokens: int = 60
     env: str = "dev"
     youtube_proxy_url: str | None = None
     news_job_enabled: bool = True
@@ -0,0 +1,43 @@
+"""Single-flight coalescing of identical in-progress async jobs.
+
+When a YouTube link is shared in a group several people often run /yt or /yd on
+it within minutes. Callers with the same key attach to the already running job
+and all receive its result (or its exception), so the work happens once.
+"""
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() unless a job with `key` is already running; either way await
+        and return that job's result."""
+        task = self._inflight.get(key)
+        if task is None:
+            # Own task, shielded below: a cancelled caller must not cancel the
+            # run the other callers are waiting on.
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.info(f"single-flight: joining in-progress job {key}")
+        return await asyncio.shield(task)
+
+    def join(self, key: Hashable) -> Awaitable[T]:
+        """The result of the running job with `key`, to await; never starts one.
+        Raises LookupError right away if none is running."""
+        task = self._inflight.get(key)
+        if task is None:
+            raise LookupError(key)
+        logger.info(f"single-flight: joining in-progress job {key}")
+        return asyncio.shield(task)
@@ -1,6 +1,24 @@
-from supabase import create_client
+from httpx import AsyncClient, Limits, Timeout
 
 from settings import Settings
 
 settings = Settings()
-client = create_client(settings.database_url, settings.database_key)
+
+
+def create_rest_client() -> AsyncClient:
+    """Pooled async client for Supabase's PostgREST API (<database_url>/rest/v1).
+
+    Queries are plain async HTTP on shared keep-alive connections, so they
+    don't take a default-executor thread each like the sync supabase client."""
+    return AsyncClient(
+        base_url=f"{settings.database_url.rstrip('/')}/rest/v1",
+        headers={
+            "apikey": settings.database_key,
+            "Authorization": f"Bearer {settings.database_key}",
+        },
+        limits=Limits(
+            max_connections=settings.database_max_connections,
+            max_keepalive_connections=settings.database_max_connections,
+        ),
+        timeout=Timeout(settings.database_timeout),
+    )
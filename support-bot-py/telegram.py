@@ -1,67 +1,212 @@
+import asyncio
+import importlib.util
 import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
-from httpx import AsyncClient
+from httpx import AsyncClient, Limits, Response, Timeout
 from loguru import logger
 
+from rate_limit import TokenBucket
+from settings import Settings
+
+# h2 comes with httpx[http2]; should it be missing the shared client falls back to HTTP/1.1.
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Per-chat buckets are dropped once idle; only bother scanning past this many.
+_CHAT_BUCKETS_PRUNE_AT = 1024
+
+
+def _is_group(chat_id: int | str) -> bool:
+    """Groups, supergroups and channels have negative ids (or an @username)."""
+    return str(chat_id).startswith(("-", "@"))
+
+
+def _retry_after(result: Response) -> float:
+    try:
+        return float(result.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return 1.0
+
 
 class TelegramBot:
-    def __init__(self, token: str, local_api_url: str | None = None):
+    def __init__(
+        self,
+        token: str,
+        local_api_url: str | None = None,
+        http2: bool = True,
+        limits: Limits | None = None,
+        timeout: Timeout | None = None,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: int = 3,
+        group_rate_per_minute: float = 20.0,
+        max_retries: int = 5,
+    ):
         self.token = token
         self.local_mode = bool(local_api_url)
         self.api_base_url = (local_api_url or "https://api.telegram.org").rstrip("/")
+        self.http2 = http2 and _HTTP2_AVAILABLE
+        self.limits = limits or Limits(max_connections=20, max_keepalive_connections=10)
+        self.timeout = timeout or Timeout(30.0, connect=10.0)
+        self._client: AsyncClient | None = None
+        # Outbound send pacing (Bot API limits: ~30 msg/s overall, ~1 msg/s per
+        # chat, 20 msg/min per group). Sends to different chats only share the
+        # global bucket, so they go out concurrently.
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate_per_minute = group_rate_per_minute
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self._chat_buckets: dict[str, list[TokenBucket]] = {}
 
     def _bot_base(self) -> str:
         return f"{self.api_base_url}/bot{self.token}"
 
-    async def send_message(self, chat_id: int, text: str, parse_mode: str = None):
-        async with AsyncClient(base_url=self._bot_base()) as client:
-            payload = {
-                "chat_id": chat_id,
-                "text": text
-            }
-            if parse_mode:
-                payload["parse_mode"] = parse_mode
-
-            result = await client.post(
-                "/sendMessage",
-                json=payload,
-                headers={"Content-Type": "application/json"},
+    @property
+    def client(self) -> AsyncClient:
+        """Shared keep-alive client reused by every Bot API call.
+
+        Normally opened by start() in the app lifespan; created lazily here too so
+        scripts and tests that never run the lifespan still work."""
+        if self._client is None or self._client.is_closed:
+            self._client = AsyncClient(
+                http2=self.http2, limits=self.limits, timeout=self.timeout
             )
-            logger.info(
-                f"Sent message to chat {chat_id} with status code {result.status_code}"
+        return self._client
+
+    def _buckets_for(self, chat_id: int | str) -> list[TokenBucket]:
+        key = str(chat_id)
+        buckets = self._chat_buckets.get(key)
+        if buckets is None:
+            if len(self._chat_buckets) >= _CHAT_BUCKETS_PRUNE_AT:
+                self._chat_buckets = {
+                    k: b for k, b in self._chat_buckets.items() if not all(x.idle() for x in b)
+                }
+            buckets = [TokenBucket(self.chat_rate, capacity=self.chat_burst)]
+            if _is_group(chat_id):
+                buckets.append(
+                    TokenBucket(self.group_rate_per_minute / 60.0, capacity=self.group_rate_per_minute)
+                )
+            self._chat_buckets[key] = buckets
+        return buckets
+
+    async def _throttle(self, chat_id: int | str):
+        # Wait out the chat's own limits first, then take a global slot, so a
+        # chat that is being held back doesn't sit on global capacity meanwhile.
+        for bucket in self._buckets_for(chat_id):
+            delay = bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        delay = self._global_bucket.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def _send(self, chat_id: int | str, method: str, **kwargs) -> Response:
+        """POST a send-type Bot API method within the rate limits, retrying after
+        429 Too Many Requests for as long as Telegram's retry_after asks."""
+        for attempt in range(self.max_retries + 1):
+            await self._throttle(chat_id)
+            result = await self.client.post(f"{self._bot_base()}/{method}", **kwargs)
+            if result.status_code != 429 or attempt == self.max_retries:
+                return result
+            retry_after = _retry_after(result)
+            logger.warning(
+                f"Telegram {method} to chat {chat_id} rate limited, retrying in "
+                f"{retry_after}s ({attempt + 1}/{self.max_retries})"
             )
+            for bucket in self._buckets_for(chat_id):
+                bucket.pause(retry_after)
+
+    async def start(self):
+        _ = self.client
+        logger.info(f"Telegram client ready (http2={self.http2}, limits={self.limits})")
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = None) -> int | None:
+        """Send a text message; returns its message_id, or None if Telegram refused it."""
+        payload = {
+            "chat_id": chat_id,
+            "text": text
+        }
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+
+        result = await self._send(
+            chat_id,
+            "sendMessage",
+            json=payload,
+            headers={"Content-Type": "application/json"},
+        )
+        logger.info(
+            f"Sent message to chat {chat_id} with status code {result.status_code}"
+        )
+
+        if result.status_code != 200:
+            logger.error(f"Telegram API error: {result.text}")
+            return None
+        return result.json().get("result", {}).get("message_id")
 
-            if result.status_code != 200:
-                logger.error(f"Telegram API error: {result.text}")
+    async def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, parse_mode: str = None
+    ) -> bool:
+        """Replace the text of a message the bot sent earlier. Edits count against
+        the same per-chat limits as sends, so they go through the scheduler too."""
+        payload = {"chat_id": chat_id, "message_id": message_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        result = await self._send(chat_id, "editMessageText", json=payload)
+        if result.status_code != 200:
+            # "message is not modified" is harmless; anything else is worth a look.
+            logger.warning(f"Telegram editMessageText error: {result.text}")
+            return False
+        return True
 
     async def get_file(self, file_id: str) -> dict:
-        async with AsyncClient(base_url=self._bot_base()) as client:
-            result = await client.post("/getFile", json={"file_id": file_id})
-            if result.status_code != 200:
-                logger.error(f"Telegram getFile error: {result.text}")
-                result.raise_for_status()
-            return result.json()["result"]
-
-    async def download_file(self, file_path: str) -> bytes:
+        result = await self.client.post(f"{self._bot_base()}/getFile", json={"file_id": file_id})
+        if result.status_code != 200:
+            logger.error(f"Telegram getFile error: {result.text}")
+            result.raise_for_status()
+        return result.json()["result"]
+
+    @asynccontextmanager
+    async def downloaded_file(self, file_path: str) -> AsyncIterator[str]:
+        """Yield a local filesystem path holding the file; it is removed on exit.
+
+        In local mode getFile already returned an absolute path on the shared
+        volume, so that path is handed out as-is. Otherwise the file is streamed
+        to a temp file in chunks, so memory stays flat whatever the upload size
+        and the event loop never blocks on disk I/O."""
         if self.local_mode:
-            # In local mode, getFile already returned an absolute filesystem path.
-            # Read and then unlink so the shared volume doesn't accumulate files.
+            # Unlink afterwards so the shared volume doesn't accumulate files.
             try:
-                with open(file_path, "rb") as f:
-                    return f.read()
+                yield file_path
             finally:
                 try:
                     os.unlink(file_path)
                 except OSError as e:
                     logger.warning(f"failed to unlink {file_path}: {e}")
+            return
 
         url = f"{self.api_base_url}/file/bot{self.token}/{file_path}"
-        async with AsyncClient() as client:
-            result = await client.get(url, timeout=60.0)
-            if result.status_code != 200:
-                logger.error(f"Telegram file download error: {result.status_code} {result.text[:200]}")
-                result.raise_for_status()
-            return result.content
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(file_path)[1])
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async with self.client.stream("GET", url, timeout=60.0) as result:
+                    if result.status_code != 200:
+                        await result.aread()
+                        logger.error(f"Telegram file download error: {result.status_code} {result.text[:200]}")
+                        result.raise_for_status()
+                    async for chunk in result.aiter_bytes(_DOWNLOAD_CHUNK_SIZE):
+                        await asyncio.to_thread(f.write, chunk)
+            yield tmp_path
+        finally:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
 
     async def send_audio(
         self,
@@ -74,19 +219,44 @@ class TelegramBot:
         """Send an audio file as a multipart upload. Telegram shows an inline audio
         player (works on Android, unlike Telegraph Read Aloud). Used to read
         translated transcripts aloud."""
-        async with AsyncClient(base_url=self._bot_base()) as client:
-            data = {"chat_id": str(chat_id)}
-            if caption:
-                data["caption"] = caption
-            if title:
-                data["title"] = title
-            files = {"audio": (filename, audio_bytes, "audio/mpeg")}
-            result = await client.post("/sendAudio", data=data, files=files, timeout=120.0)
-            logger.info(
-                f"Sent audio to chat {chat_id} with status code {result.status_code}"
-            )
-            if result.status_code != 200:
-                logger.error(f"Telegram sendAudio error: {result.text}")
+        data = {"chat_id": str(chat_id)}
+        if caption:
+            data["caption"] = caption
+        if title:
+            data["title"] = title
+        files = {"audio": (filename, audio_bytes, "audio/mpeg")}
+        result = await self._send(
+            chat_id, "sendAudio", data=data, files=files, timeout=120.0
+        )
+        logger.info(
+            f"Sent audio to chat {chat_id} with status code {result.status_code}"
+        )
+        if result.status_code != 200:
+            logger.error(f"Telegram sendAudio error: {result.text}")
 
     async def close(self):
-        await self.client.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_telegram_bot(settings: Settings) -> TelegramBot:
+    """A TelegramBot with the configured connection pool, timeouts and send
+    limits; every entry point builds its bot here so none falls back to the
+    defaults."""
+    return TelegramBot(
+        settings.telegram_token,
+        local_api_url=settings.telegram_local_api_url,
+        http2=settings.telegram_http2,
+        limits=Limits(
+            max_connections=settings.telegram_max_connections,
+            max_keepalive_connections=settings.telegram_max_keepalive_connections,
+            keepalive_expiry=settings.telegram_keepalive_expiry,
+        ),
+        timeout=Timeout(settings.telegram_timeout, connect=settings.telegram_connect_timeout),
+        global_rate=settings.telegram_global_rate,
+        chat_rate=settings.telegram_chat_rate,
+        chat_burst=settings.telegram_chat_burst,
+        group_rate_per_minute=settings.telegram_group_rate_per_minute,
+        max_retries=settings.telegram_max_retries,
+    )
@@ -0,0 +1,294 @@
+"""Telegraph (telegra.ph) API client used to publish transcripts and summaries.
+
+All pages go through one keep-alive AsyncClient, so publishing the parts of a
+long transcript concurrently reuses a few warm connections instead of a TLS
+handshake per page. The account access token is persisted to `token_path` (a
+JSON file, written atomically) so restarts keep publishing under the same
+Telegraph account instead of creating a new one each time.
+
+Telegraph rejects pages whose content is over 64 KB (CONTENT_TOO_BIG). Page
+bodies are serialized here with one fixed encoder (compact, ASCII-escaped), so
+paginate() can measure each page's content exactly as it will be sent and pack
+paragraphs into as few pages as fit, before anything is posted.
+"""
+import asyncio
+import importlib.util
+import json
+import os
+import re
+
+from httpx import AsyncClient, Limits, Timeout
+from loguru import logger
+
+from settings import Settings
+
+settings = Settings()
+
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+TITLE_LIMIT = 256
+# Telegraph's content limit is 64 KB; stay a little under it.
+MAX_PAGE_BYTES = 64000
+
+_BR = {'tag': 'br'}
+
+
+def _dumps(value) -> str:
+    """The one serializer for request bodies (ASCII-only, so len() is bytes)."""
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _size(value) -> int:
+    return len(_dumps(value))
+
+
+def convert_markdown(text: str) -> str:
+    """Convert basic markdown to plain text for Telegraph."""
+    # Remove markdown headers (### -> nothing, just the text)
+    text = re.sub(r'^###\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^##\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^#\s+', '', text, flags=re.MULTILINE)
+
+    # Convert **bold** to plain text (Telegraph will handle formatting differently)
+    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
+
+    # Convert *italic* to plain text
+    text = re.sub(r'\*([^*]+)\*', r'\1', text)
+
+    return text
+
+
+def paragraph_node(para: str) -> dict | None:
+    """A <p> node for one paragraph; single newlines become <br> (Telegraph
+    expects each line as a separate text node). None for a blank paragraph."""
+    lines = para.split('\n')
+    children = []
+    for i, line in enumerate(lines):
+        if line.strip():
+            children.append(line)
+            if i < len(lines) - 1:  # Add br except for last line
+                children.append({'tag': 'br'})
+    return {'tag': 'p', 'children': children} if children else None
+
+
+def content_nodes(text: str) -> list[dict]:
+    """Telegraph content for `text`: markdown stripped, one <p> per paragraph
+    (split on blank lines)."""
+    nodes = (paragraph_node(p) for p in convert_markdown(text).split('\n\n') if p.strip())
+    return [n for n in nodes if n is not None]
+
+
+def _split_line(line: str, max_bytes: int) -> list[str]:
+    """Cut a line into pieces whose JSON strings fit max_bytes, between words
+    where possible. Escaping is per character, so escaped lengths add up."""
+    pieces: list[str] = []
+    current, used = "", 2  # the quotes
+    for word in line.split(" "):
+        cost = _size(word) - 2 + (1 if current else 0)
+        if current and used + cost > max_bytes:
+            pieces.append(current)
+            current, used = "", 2
+            cost = _size(word) - 2
+        if used + cost > max_bytes:
+            # A single word too long for a page: cut it by characters (a
+            # character escapes to at most 12 bytes, as a surrogate pair).
+            step = max(1, (max_bytes - 2) // 12)
+            pieces.extend(word[i:i + step] for i in range(0, len(word), step))
+            continue
+        current = f"{current} {word}" if current else word
+        used += cost
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _split_paragraph(node: dict, max_bytes: int) -> list[dict]:
+    """Split a <p> node too big for a page into <p> nodes of at most max_bytes,
+    between lines (or between words for an overlong line)."""
+    lines = [c for c in node['children'] if isinstance(c, str)]
+    base = _size({'tag': 'p', 'children': []})
+    budget = max_bytes - base
+    units = []
+    for line in lines:
+        units.extend([line] if _size(line) <= budget else _split_line(line, budget))
+
+    nodes, children, used = [], [], base
+    for unit in units:
+        cost = _size(unit) + (1 + _size(_BR) + 1 if children else 0)
+        if children and used + cost > max_bytes:
+            nodes.append({'tag': 'p', 'children': children})
+            children, used = [], base
+            cost = _size(unit)
+        if children:
+            children.append(_BR)
+        children.append(unit)
+        used += cost
+    if children:
+        nodes.append({'tag': 'p', 'children': children})
+    return nodes
+
+
+def paginate(text: str, max_bytes: int = MAX_PAGE_BYTES, continued: str | None = None) -> list[list[dict]]:
+    """Pack the paragraphs of `text` greedily into as few pages as possible
+    whose serialized content is at most max_bytes, breaking only between
+    paragraphs (a paragraph bigger than a page is split between lines/words).
+    Pages after the first start with the `continued` paragraph(s)."""
+    head = content_nodes(continued) if continued else []
+    node_limit = max_bytes - _size(head) - (1 if head else 0)
+    nodes: list[dict] = []
+    for node in content_nodes(text):
+        nodes.extend([node] if _size(node) <= node_limit else _split_paragraph(node, node_limit))
+
+    pages: list[list[dict]] = []
+    current: list[dict] = []
+    used = 2  # the brackets
+    for node in nodes:
+        cost = _size(node) + (1 if current else 0)
+        if current and used + cost > max_bytes:
+            pages.append(current)
+            current, used = list(head), _size(head)
+            cost = _size(node) + (1 if current else 0)
+        current.append(node)
+        used += cost
+    if current:
+        pages.append(current)
+    return pages
+
+
+class TelegraphClient:
+    def __init__(
+        self,
+        token_path: str | None = None,
+        short_name: str = "YouTubeBot",
+        author_name: str = "Anonymous",
+        http2: bool = True,
+        limits: Limits | None = None,
+        timeout: Timeout | None = None,
+        max_page_bytes: int = MAX_PAGE_BYTES,
+    ):
+        self.token_path = token_path
+        self.max_page_bytes = max_page_bytes
+        self.short_name = short_name
+        self.author_name = author_name
+        self.http2 = http2 and _HTTP2_AVAILABLE
+        self.limits = limits or Limits(max_connections=10, max_keepalive_connections=10)
+        self.timeout = timeout or Timeout(30.0, connect=10.0)
+        self._client: AsyncClient | None = None
+        self._token: str | None = None
+        # Pages are published concurrently; only one of them may create the account.
+        self._token_lock = asyncio.Lock()
+
+    @property
+    def client(self) -> AsyncClient:
+        """Shared keep-alive client, created on first use (and again after close())."""
+        if self._client is None or self._client.is_closed:
+            self._client = AsyncClient(
+                base_url="https://api.telegra.ph",
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def access_token(self) -> str:
+        async with self._token_lock:
+            if self._token is None:
+                self._token = await asyncio.to_thread(self._load_token)
+            if self._token is None:
+                response = await self.client.post(
+                    "/createAccount",
+                    json={"short_name": self.short_name, "author_name": self.author_name},
+                )
+                self._token = response.json()["result"]["access_token"]
+                logger.info(f"Created Telegraph account with token: {self._token[:10]}...")
+                await asyncio.to_thread(self._save_token, self._token)
+            return self._token
+
+    def _load_token(self) -> str | None:
+        if not self.token_path:
+            return None
+        try:
+            with open(self.token_path) as f:
+                return json.load(f)["access_token"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load Telegraph token from {self.token_path}: {e}")
+            return None
+
+    def _save_token(self, token: str):
+        if not self.token_path:
+            return
+        tmp = f"{self.token_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.token_path) or ".", exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump({"access_token": token, "short_name": self.short_name}, f)
+            os.replace(tmp, self.token_path)
+        except OSError as e:
+            logger.warning(f"Could not save Telegraph token to {self.token_path}: {e}")
+
+    def _forget_token(self):
+        if not self.token_path:
+            return
+        try:
+            os.remove(self.token_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove Telegraph token {self.token_path}: {e}")
+
+    async def create_page(self, title: str, content: str) -> str | None:
+        """Create a page from plain/markdown text. Returns its URL or None on failure."""
+        return await self.create_page_nodes(title, content_nodes(content))
+
+    async def create_page_nodes(self, title: str, nodes: list[dict]) -> str | None:
+        """Create a page from Telegraph nodes (e.g. one page of paginate())."""
+        try:
+            for attempt in range(2):
+                token = await self.access_token()
+                body = {
+                    "access_token": token,
+                    "title": title[:TITLE_LIMIT],
+                    "content": nodes,
+                    "return_content": False,
+                }
+                response = await self.client.post(
+                    "/createPage",
+                    content=_dumps(body),
+                    headers={"Content-Type": "application/json"},
+                )
+                data = response.json()
+                if data.get("ok"):
+                    page_url = f"https://telegra.ph/{data['result']['path']}"
+                    logger.info(f"Created Telegraph page: {page_url}")
+                    return page_url
+                error = data.get("error", "unknown error")
+                if error == "ACCESS_TOKEN_INVALID" and attempt == 0:
+                    # Persisted token revoked; make a new account and retry once.
+                    async with self._token_lock:
+                        if self._token == token:
+                            self._token = None
+                            await asyncio.to_thread(self._forget_token)
+                    continue
+                logger.error(f"Telegraph API error: {error}")
+                return None
+        except Exception as e:
+            logger.error(f"Telegraph error: {e}")
+            return None
+
+
+telegraph = TelegraphClient(
+    token_path=settings.telegraph_token_path,
+    limits=Limits(
+        max_connections=settings.telegraph_max_connections,
+        max_keepalive_connections=settings.telegraph_max_connections,
+    ),
+    timeout=Timeout(settings.telegraph_timeout, connect=10.0),
+    max_page_bytes=settings.telegraph_max_page_bytes,
+)
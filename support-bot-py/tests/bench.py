@@ -0,0 +1,297 @@
+"""Micro-benchmarks for the bot's hot paths.
+
+Run from support-bot-py:
+
+    python -m tests.bench                       # print results as JSON
+    python -m tests.bench -o bench.json         # also write them to a file
+    python -m tests.bench -k chunk              # only benchmarks matching "chunk"
+    python -m tests.bench --compare bench.json  # exit 1 on a regression
+
+Every benchmark is timed in rounds sized to take ~0.1s each; the JSON reports
+per-call seconds (min/median/mean/stddev over the rounds). --compare matches
+benchmarks by name against an earlier run and flags any whose median got more
+than --threshold times slower. Inputs are generated from fixed seeds so runs
+are comparable. Not collected by pytest (no test_ prefix).
+"""
+import argparse
+import asyncio
+import base64
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+from loguru import logger
+
+# Sorts first in its block (plain imports precede from-imports): it sets up the
+# test env, which must happen before the app modules are imported.
+import tests.conftest
+from app import handle_message  # noqa: E402
+from chunking import chunk_text  # noqa: E402
+from gmail_service import GmailService  # noqa: E402
+from schemas import TelegramRequest  # noqa: E402
+from utils import filter_context_size, get_encoding  # noqa: E402
+from youtube_diarize import align_cues_to_speakers  # noqa: E402
+from youtube_transcript import _segment_into_paragraphs  # noqa: E402
+
+ROUND_SECONDS = 0.1
+
+_WORDS = (
+    "the a model data we so like just really think about going people know right "
+    "transcript speaker video channel question answer because actually maybe time"
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+# -- inputs --------------------------------------------------------------------
+
+
+def chat_history(n: int = 100, seed: int = 1) -> tuple[list[dict], list[int]]:
+    rng = random.Random(seed)
+    messages, counts = [], []
+    for i in range(n):
+        words = rng.randint(5, 200)
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": _sentence(rng, words)})
+        counts.append(int(words * 1.3))
+    return messages, counts
+
+
+def transcript_snippets(hours: float = 3, seed: int = 2) -> list[dict]:
+    """YouTube-style cues: ~3s each, occasional pauses."""
+    rng = random.Random(seed)
+    snippets, t = [], 0.0
+    while t < hours * 3600:
+        duration = rng.uniform(1.5, 4.5)
+        snippets.append({"text": _sentence(rng, rng.randint(4, 12)), "start": t, "duration": duration})
+        t += duration + (rng.uniform(2, 5) if rng.random() < 0.05 else rng.uniform(0, 0.3))
+    return snippets
+
+
+def cues_and_turns(n_cues: int = 4000, n_turns: int = 1500, speakers: int = 3, seed: int = 3):
+    rng = random.Random(seed)
+    cues, t = [], 0.0
+    for _ in range(n_cues):
+        d = rng.uniform(1.5, 4.0)
+        cues.append({"text": _sentence(rng, 8), "start": t, "end": t + d})
+        t += d
+    turns, s = [], 0.0
+    step = t / n_turns
+    for _ in range(n_turns):
+        d = step * rng.uniform(0.7, 1.3)
+        turns.append((s, s + d, f"SPEAKER_{rng.randrange(speakers):02d}"))
+        s += d + rng.uniform(0, 0.5)
+    return cues, turns
+
+
+def newsletter_payload(sections: int = 400, seed: int = 4) -> dict:
+    """multipart/alternative Gmail payload: short text stub + large HTML body."""
+    rng = random.Random(seed)
+    html = ["<html><head><style>p { margin: 0 }</style><script>var x = 1;</script></head><body>"]
+    for i in range(sections):
+        html.append(
+            f'<div class="section"><h2>{_sentence(rng, 6)}</h2>'
+            f"<p>{_sentence(rng, 60)}&nbsp;&amp; {_sentence(rng, 20)}<br/>"
+            f'<a href="https://example.com/articles/{i}?ref=newsletter">Read more</a> '
+            f'<a href="https://tracking.example.net/pixel/{i}">.</a></p></div>'
+        )
+    html.append("</body></html>")
+
+    def encode(text: str) -> str:
+        return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+    return {
+        "mimeType": "multipart/alternative",
+        "parts": [
+            {"mimeType": "text/plain", "body": {"data": encode("View this email in your browser.")}},
+            {"mimeType": "text/html", "body": {"data": encode("".join(html))}},
+        ],
+    }
+
+
+# -- benchmarks ----------------------------------------------------------------
+
+
+def bench_filter_context_size():
+    messages, counts = chat_history()
+    return lambda: filter_context_size(messages, 4096, "gpt-4o-mini", token_counts=counts)
+
+
+def bench_filter_context_size_encode():
+    get_encoding("gpt-4o-mini")  # raises (-> skipped) when the encoding can't be loaded
+    messages, _ = chat_history()
+    return lambda: filter_context_size(messages, 4096, "gpt-4o-mini")
+
+
+def bench_segment_into_paragraphs():
+    snippets = transcript_snippets()
+    return lambda: _segment_into_paragraphs(snippets)
+
+
+def bench_chunk_text():
+    get_encoding("gpt-4o-mini")  # raises (-> skipped) when the encoding can't be loaded
+    text = _segment_into_paragraphs(transcript_snippets())
+    return lambda: chunk_text(text, 5000, "gpt-4o-mini")
+
+
+def bench_align_cues_to_speakers():
+    cues, turns = cues_and_turns()
+    return lambda: align_cues_to_speakers(cues, turns)
+
+
+def bench_gmail_extract_body():
+    service = GmailService()
+    payload = newsletter_payload()
+    return lambda: service._extract_body(payload)
+
+
+def bench_gmail_extract_links():
+    service = GmailService()
+    body = service._extract_body(newsletter_payload())
+    return lambda: service._extract_links(body)
+
+
+def _telegram_request(text: str) -> TelegramRequest:
+    return TelegramRequest(**tests.conftest.make_payload(text))
+
+
+def bench_handle_message_command():
+    request = _telegram_request("/echo hello there")
+    return lambda: handle_message(request)
+
+
+def bench_handle_message_usage_reply():
+    request = _telegram_request("/summary")
+    return lambda: handle_message(request)
+
+
+BENCHMARKS = {
+    "filter_context_size[100 msgs, precounted]": bench_filter_context_size,
+    "filter_context_size[100 msgs, encode]": bench_filter_context_size_encode,
+    "handle_message[/echo]": bench_handle_message_command,
+    "handle_message[usage reply]": bench_handle_message_usage_reply,
+    "_segment_into_paragraphs[3h transcript]": bench_segment_into_paragraphs,
+    "chunk_text[3h transcript, 5000 tokens]": bench_chunk_text,
+    "align_cues_to_speakers[4000 cues, 1500 turns]": bench_align_cues_to_speakers,
+    "GmailService._extract_body[400-section newsletter]": bench_gmail_extract_body,
+    "GmailService._extract_links[400-section newsletter]": bench_gmail_extract_links,
+}
+
+
+# -- harness -------------------------------------------------------------------
+
+
+async def _time_calls(fn, iterations: int) -> float:
+    """Seconds for `iterations` calls; coroutine results are awaited."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+        if asyncio.iscoroutine(result):
+            await result
+    return time.perf_counter() - start
+
+
+async def measure(fn, rounds: int) -> dict:
+    await _time_calls(fn, 1)  # warm-up
+    iterations = 1
+    while (elapsed := await _time_calls(fn, iterations)) < ROUND_SECONDS / 2 and iterations < 1_000_000:
+        iterations *= 2
+    iterations = max(1, int(iterations * ROUND_SECONDS / max(elapsed, 1e-9)))
+    per_call = [await _time_calls(fn, iterations) / iterations for _ in range(rounds)]
+    return {
+        "unit": "s",
+        "min": min(per_call),
+        "median": statistics.median(per_call),
+        "mean": statistics.fmean(per_call),
+        "stddev": statistics.stdev(per_call) if rounds > 1 else 0.0,
+        "rounds": rounds,
+        "iterations": iterations,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(names: list[str], rounds: int) -> dict:
+    results = []
+    # Handlers reply through the bot; keep that off the network.
+    with patch("app.telegram_bot.send_message", new_callable=AsyncMock, return_value=1):
+        for name in names:
+            try:
+                fn = BENCHMARKS[name]()
+            except Exception as e:
+                results.append({"name": name, "skipped": f"{type(e).__name__}: {e}"})
+                continue
+            results.append({"name": name, **await measure(fn, rounds)})
+            print(f"{name}: {results[-1]['median'] * 1e6:.1f} us", file=sys.stderr)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Names (with slowdown factors) of benchmarks whose median regressed."""
+    before = {b["name"]: b for b in baseline["benchmarks"] if "median" in b}
+    regressions = []
+    for b in current["benchmarks"]:
+        old = before.get(b["name"])
+        if old is None or "median" not in b:
+            continue
+        ratio = b["median"] / old["median"]
+        b["baseline_median"] = old["median"]
+        b["ratio"] = ratio
+        if ratio > threshold:
+            regressions.append(f"{b['name']}: {ratio:.2f}x slower")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("-o", "--output", help="write the JSON results to this file")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed median slowdown")
+    args = parser.parse_args(argv)
+
+    # Keep the code paths' logging (it is part of their cost) but discard it.
+    logger.remove()
+    logger.add(lambda _: None, level="INFO")
+
+    names = [n for n in BENCHMARKS if not args.filter or args.filter in n]
+    report = asyncio.run(run(names, args.rounds))
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report["regressions"] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    for r in regressions:
+        print(f"REGRESSION {r}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
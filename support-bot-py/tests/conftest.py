@@ -1,4 +1,5 @@
 import asyncio
+import itertools
 import os
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -22,13 +23,21 @@ os.environ.setdefault("ENV", "dev")  # disables webhook token check
 os.environ.setdefault("NEWS_JOB_ENABLED", "false")  # don't start scheduler
 os.environ.setdefault("SUMMARY_QUEUE_URL", "https://test-queue.example.com")
 os.environ.setdefault("YA_API", "test-ya-api-key")
+# Tests send many messages to one chat; don't let send pacing slow them down
+os.environ.setdefault("TELEGRAM_CHAT_RATE", "1000")
+os.environ.setdefault("TELEGRAM_CHAT_BURST", "1000")
 
-from app import app  # noqa: E402
+from app import app, telegram_bot, telegraph  # noqa: E402
+
+
+# Each payload gets a fresh update_id, otherwise the webhook would drop it as a
+# redelivery of an earlier test's update.
+_update_ids = itertools.count(1)
 
 
 def make_payload(text: str, chat_id: int = 100) -> dict:
     return {
-        "update_id": 1,
+        "update_id": next(_update_ids),
         "message": {
             "message_id": 1,
             "from": {"id": 200, "is_bot": False, "username": "tester"},
@@ -52,19 +61,49 @@ async def client():
         transport=ASGITransport(app=app), base_url="http://test"
     ) as c:
         yield c
+    # ASGITransport doesn't run the lifespan; close the shared Telegram and
+    # Telegraph clients here so they aren't carried over into the next test's
+    # event loop.
+    await telegram_bot.close()
+    await telegraph.close()
+
+
+class CharEncoding:
+    """Stand-in tiktoken encoding, one token per character (the real encodings
+    are downloaded on first use)."""
+
+    def encode_ordinary(self, text: str) -> list[int]:
+        return [ord(c) for c in text]
+
+    def encode_ordinary_batch(self, texts: list[str]) -> list[list[int]]:
+        return [self.encode_ordinary(t) for t in texts]
+
+    def decode(self, tokens: list[int]) -> str:
+        return "".join(map(chr, tokens))
+
+
+@pytest.fixture
+def char_tokens():
+    """Chunking and the translation memory count characters instead of tiktoken tokens."""
+    with patch("chunking.get_encoding", return_value=CharEncoding()), \
+         patch("translation_memory.get_encoding", return_value=CharEncoding()):
+        yield
 
 
 @pytest.fixture
 def telegram_mock():
     """Intercept outbound calls to the Telegram Bot API via respx.
 
-    TelegramBot.send_message creates a fresh httpx.AsyncClient on every call,
-    so respx (which patches at the class level) catches it reliably.
+    TelegramBot reuses one shared httpx.AsyncClient; respx patches the transport
+    at the class level, so requests from that long-lived client are caught too.
     """
     with respx.mock(base_url="https://api.telegram.org", assert_all_called=False) as mock:
         mock.post("/bottesttoken/sendMessage").respond(
             200, json={"ok": True, "result": {"message_id": 42}}
         )
+        mock.post("/bottesttoken/editMessageText").respond(
+            200, json={"ok": True, "result": {"message_id": 42}}
+        )
         yield mock
 
 
@@ -74,7 +113,8 @@ def openai_mock():
 
     The OpenAI SDK creates its httpx.AsyncClient at module-import time with a
     custom transport, so respx cannot intercept it reliably at the HTTP layer.
-    Direct patching is more robust.
+    Direct patching is more robust. With stream=True the mock returns an async
+    iterator of delta chunks that spell out the same text.
     """
     mock_msg = MagicMock()
     mock_msg.content = "mocked response"
@@ -83,7 +123,17 @@ def openai_mock():
     mock_resp = MagicMock()
     mock_resp.choices = [mock_choice]
 
-    with patch("app.openai.chat.completions.create", new_callable=AsyncMock, return_value=mock_resp):
+    async def stream():
+        for piece in ("mocked", " ", "response"):
+            chunk = MagicMock()
+            chunk.choices = [MagicMock()]
+            chunk.choices[0].delta.content = piece
+            yield chunk
+
+    async def create(**kwargs):
+        return stream() if kwargs.get("stream") else mock_resp
+
+    with patch("app.openai.chat.completions.create", new_callable=AsyncMock, side_effect=create):
         yield mock_resp
 
 
@@ -91,9 +141,8 @@ def openai_mock():
 def supabase_mock():
     """Patch MessageRepository methods directly.
 
-    Supabase's sync client runs in asyncio.to_thread which makes it awkward to
-    intercept at the HTTP layer; patching the repository methods is simpler and
-    avoids real network calls.
+    Patching the repository methods keeps handler tests independent of the
+    PostgREST wire format (and of the history cache / write-behind buffer).
     """
     with patch("app.message_repository.get_messages", new_callable=AsyncMock, return_value=[]) as get_mock, \
          patch("app.message_repository.add_messages", new_callable=AsyncMock) as add_mock:
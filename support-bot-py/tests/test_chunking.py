@@ -0,0 +1,46 @@
+from chunking import Chunker, chunk_stream, chunk_text
+
+
+async def aiter(items):
+    for item in items:
+        yield item
+
+
+def test_chunks_fill_the_token_budget_on_paragraphs(char_tokens):
+    paragraphs = ["a" * 4, "b" * 3, "c" * 5, "", "d"]
+    text = "\n\n".join(paragraphs)
+    chunks = chunk_text(text, 10, "gpt-4o-mini")
+    assert chunks == ["aaaa\n\nbbb", "ccccc\n\n\n\nd"]
+    assert "\n\n".join(chunks) == text
+    assert chunk_text("", 10, "gpt-4o-mini") == []
+
+
+def test_speaker_lines_and_oversized_units(char_tokens):
+    text = "Speaker 1: hi\nSpeaker 2: " + "word " * 6 + "end. Next sentence here."
+    chunks = chunk_text(text, 16, "gpt-4o-mini", separator="\n")
+    assert all(len(c) <= 16 for c in chunks)
+    assert chunks[0] == "Speaker 1: hi"
+    assert " ".join(chunks[1:]).split() == text.split("\n")[1].split()
+    # A single "word" over budget is cut by tokens
+    assert chunk_text("x" * 25, 10, "m") == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_joiners_put_split_units_back_together(char_tokens):
+    text = "Speaker 1: hi\nSpeaker 2: " + "word " * 6 + "end. Next sentence here.\n" + "x" * 25
+    chunker = Chunker(16, "gpt-4o-mini", separator="\n")
+    chunks = chunker.feed(text) + chunker.finish()
+    assert len(chunker.joiners) == len(chunks) and chunker.joiners[-1] == ""
+    assert "".join(c + j for c, j in zip(chunks, chunker.joiners)) == text
+
+
+async def test_stream_yields_the_same_chunks_as_soon_as_complete(char_tokens):
+    parts = ["aaaa\n\nbbb", "ccccc", "", "dd"]
+    joined = "\n\n".join(parts)
+    streamed = [c async for c in chunk_stream(aiter(parts), 10, "m")]
+    assert streamed == chunk_text(joined, 10, "m")
+
+    chunker = Chunker(10, "m")
+    assert chunker.feed("aaaa\n\nbbb") == []
+    assert chunker.feed("ccccc") == ["aaaa\n\nbbb"]
+    # A full chunk is yielded at once, not when the next part arrives
+    assert chunker.feed("ddd") == ["ccccc\n\nddd"]
@@ -0,0 +1,37 @@
+import pytest
+
+from commands import CommandRouter, parse_command
+
+
+def test_parse_command():
+    assert parse_command("/yt@my_bot https://youtu.be/x 2") == ("/yt", "https://youtu.be/x 2")
+    assert parse_command("/summary\nline one\nline two") == ("/summary", "line one\nline two")
+    assert parse_command("/start") == ("/start", "")
+    assert parse_command("hello /start") is None
+
+
+async def test_aliases_share_route_and_metrics():
+    seen = []
+
+    async def handler(chat_id, args):
+        seen.append((chat_id, args))
+
+    async def unknown(chat_id, args):
+        seen.append(("unknown", args))
+
+    router = CommandRouter(unknown=unknown)
+    router.add("/summary_youtube", handler, aliases=("/sy",), job_class="transcript")
+    router.add("/summary", handler)
+    with pytest.raises(ValueError):
+        router.add("/sy", handler)
+
+    for text in ("/sy url1", "/summary_youtube url2", "/summary text", "/nope x"):
+        route, args = router.resolve(text)
+        await router.dispatch(1, route, args)
+
+    assert seen == [(1, "url1"), (1, "url2"), (1, "text"), ("unknown", "nope x")]
+    metrics = router.metrics()
+    assert set(metrics) == {"/summary_youtube", "/summary", "<unknown>"}
+    assert metrics["/summary_youtube"]["calls"] == 2
+    assert sum(metrics["/summary_youtube"]["latency_buckets"].values()) == 2
+    assert router.resolve("/sy url")[0].job_class_for("url") == "transcript"
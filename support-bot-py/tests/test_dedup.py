@@ -0,0 +1,30 @@
+from dedup import UpdateDeduplicator
+from tests.conftest import make_payload, wait_for_background_tasks
+
+
+async def test_redelivered_update_is_acknowledged_without_work(client, telegram_mock):
+    payload = make_payload("/echo once")
+    for _ in range(2):
+        r = await client.post("/webhook", json=payload)
+        assert r.json() == {"status": "ok"}
+    await wait_for_background_tasks()
+    assert telegram_mock.calls.call_count == 1
+
+
+def test_ttl_lru_and_persistence(tmp_path):
+    path = str(tmp_path / "seen.json")
+    d = UpdateDeduplicator(maxsize=2, path=path)
+    assert not d.seen("bot", 1)
+    assert d.seen("bot", 1)
+    assert not d.seen("ban_bot", 1)
+    assert not d.seen("bot", 2)  # evicts bot:1
+    assert not d.seen("bot", 1)
+    d.save()
+
+    restored = UpdateDeduplicator(maxsize=2, path=path)
+    assert restored.seen("bot", 1)
+    assert restored.seen("bot", 2)
+
+    expired = UpdateDeduplicator(ttl=0)
+    assert not expired.seen("bot", 1)
+    assert not expired.seen("bot", 1)
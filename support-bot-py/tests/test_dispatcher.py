@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from dispatcher import JobDispatcher, QueueFull
+
+
+async def test_same_chat_runs_in_order_one_at_a_time():
+    d = JobDispatcher(workers={"chat": 4}, max_queued=10)
+    log = []
+
+    def job(n):
+        async def run():
+            log.append(f"start {n}")
+            await asyncio.sleep(0.01)
+            log.append(f"end {n}")
+        return run
+
+    for n in range(3):
+        d.submit("chat", 1, job(n))
+    while d.stats()["chat"]["running"] or d.stats()["chat"]["queued"]:
+        await asyncio.sleep(0.005)
+    assert log == ["start 0", "end 0", "start 1", "end 1", "start 2", "end 2"]
+
+
+async def test_worker_limit_positions_and_backpressure():
+    d = JobDispatcher(workers={"diarize": 1}, max_queued=2)
+    release = asyncio.Event()
+
+    async def job():
+        await release.wait()
+
+    assert d.submit("diarize", 1, job) == 0
+    assert d.submit("diarize", 2, job) == 1
+    assert d.submit("diarize", 3, job) == 2
+    with pytest.raises(QueueFull):
+        d.submit("diarize", 4, job)
+    assert d.stats()["diarize"] == {"running": 1, "queued": 2, "workers": 1}
+
+    release.set()
+    while d.stats()["diarize"]["running"] or d.stats()["diarize"]["queued"]:
+        await asyncio.sleep(0.005)
+
+
+async def test_positions_follow_the_turn_order():
+    d = JobDispatcher(workers={"diarize": 1}, max_queued=10)
+    started = []
+
+    def job(name):
+        async def run():
+            started.append(name)
+            await asyncio.sleep(0)
+        return run
+
+    positions = {
+        name: d.submit("diarize", chat, job(name))
+        for name, chat in [("a1", 1), ("a2", 1), ("a3", 1), ("b1", 2), ("b2", 2), ("c1", 3)]
+    }
+    while d.stats()["diarize"]["running"] or d.stats()["diarize"]["queued"]:
+        await asyncio.sleep(0.005)
+    assert started == ["a1", "b1", "c1", "a2", "b2", "a3"]
+    # Places in that order among the jobs submitted so far: b1 goes ahead of
+    # chat 1's waiting a2 and a3, and c1 ahead of a2 too.
+    assert positions == {"a1": 0, "a2": 1, "a3": 2, "b1": 1, "b2": 3, "c1": 2}
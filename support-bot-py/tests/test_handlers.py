@@ -1,9 +1,32 @@
+import asyncio
 import json
-from unittest.mock import patch
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import pytest
+
+from app import _NO_ANSWER, reply_with_completion, settings
+from dispatcher import QueueFull
+from schemas import TelegramRequest
 from tests.conftest import make_payload, wait_for_background_tasks
 
 
+def delta_stream(pieces, error: Exception | None = None):
+    async def stream():
+        for piece in pieces:
+            chunk = MagicMock()
+            chunk.choices = [MagicMock()]
+            chunk.choices[0].delta.content = piece
+            yield chunk
+        if error:
+            raise error
+
+    async def create(**kwargs):
+        return stream()
+
+    return create
+
+
 async def test_health(client):
     r = await client.get("/health")
     assert r.status_code == 200
@@ -53,7 +76,7 @@ async def test_default_chat(client, telegram_mock, openai_mock, supabase_mock):
 async def test_yt_no_transcript(client, telegram_mock):
     """YouTube URL where transcript API raises → bot sends error message."""
     with patch(
-        "youtube_transcript.YouTubeTranscriptApi.list_transcripts",
+        "transcript_cache.YouTubeTranscriptApi.list_transcripts",
         side_effect=Exception("no transcript available"),
     ):
         await client.post(
@@ -63,3 +86,162 @@ async def test_yt_no_transcript(client, telegram_mock):
         await wait_for_background_tasks()
     sent = json.loads(telegram_mock.calls.last.request.content)
     assert "Error" in sent["text"]
+
+
+async def test_command_without_args_replies_usage(client, telegram_mock):
+    await client.post("/webhook", json=make_payload("/echo"))
+    await wait_for_background_tasks()
+    sent = json.loads(telegram_mock.calls.last.request.content)
+    assert sent["text"].startswith("Usage: /echo")
+
+
+async def test_prompt_streams_into_placeholder(client, telegram_mock, openai_mock):
+    await client.post("/webhook", json=make_payload("/prompt hi"))
+    await wait_for_background_tasks()
+    first = json.loads(telegram_mock.calls[0].request.content)
+    last = json.loads(telegram_mock.calls.last.request.content)
+    assert first["text"] == "…"
+    assert telegram_mock.calls.last.request.url.path.endswith("/editMessageText")
+    assert last == {"chat_id": 100, "message_id": 42, "text": "mocked response"}
+
+
+@pytest.mark.parametrize("pieces, error", [([], None), (["half an"], RuntimeError("stream cut"))])
+async def test_no_answer_replaces_the_placeholder(pieces, error):
+    with patch("app.openai.chat.completions.create", side_effect=delta_stream(pieces, error)), \
+         patch("app.telegram_bot.send_message", new_callable=AsyncMock, return_value=7) as send, \
+         patch("app.telegram_bot.edit_message_text", new_callable=AsyncMock, return_value=True) as edit:
+        if error:
+            with pytest.raises(RuntimeError):
+                await reply_with_completion(100, [])
+        else:
+            assert await reply_with_completion(100, []) == ""
+    send.assert_awaited_once_with(100, "…")
+    assert edit.await_args_list[-1].args == (100, 7, _NO_ANSWER)
+
+
+async def test_slow_edits_do_not_hold_up_the_stream():
+    async def slow_edit(chat_id, message_id, text):
+        await asyncio.sleep(0.2)  # a group's send bucket is empty
+        return True
+
+    pieces = [f"w{i} " for i in range(20)]
+    with patch("app.openai.chat.completions.create", side_effect=delta_stream(pieces)), \
+         patch("app.telegram_bot.send_message", new_callable=AsyncMock, return_value=7), \
+         patch("app.telegram_bot.edit_message_text", side_effect=slow_edit) as edit, \
+         patch.object(settings, "stream_edit_tokens", 1):
+        start = time.monotonic()
+        answer = await reply_with_completion(100, [])
+    assert answer == "".join(pieces)
+    # Queued-up edits collapse: one intermediate (cancelled) and the final one
+    assert time.monotonic() - start < 0.5
+    assert edit.await_count <= 3
+    assert edit.await_args_list[-1].args == (100, 7, answer)
+
+
+async def test_joiner_whose_run_ended_is_requeued_not_run_in_a_join_slot(telegram_mock):
+    from app import dispatcher, handle_youtube_transcript, youtube_jobs
+    from dispatcher import current_job_class
+
+    url = "/yt https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    token = current_job_class.set("join")  # classed as a joiner at submit time
+    with patch("app.process_youtube_transcript", new_callable=AsyncMock) as process, \
+         patch.object(dispatcher, "submit", return_value=0) as submit:
+        await handle_youtube_transcript(100, url)
+        process.assert_not_called()
+        assert submit.call_args.args[:2] == ("transcript", 100)
+
+        # While the run is still going, the joiner attaches to it
+        release = asyncio.Event()
+
+        async def run():
+            await release.wait()
+            return {"video_id": "dQw4w9WgXcQ", "original_language": "en", "summary_text": "s"}
+
+        flight = asyncio.create_task(youtube_jobs.do(("dQw4w9WgXcQ", "transcript", -1), run))
+        await asyncio.sleep(0)
+        joiner = asyncio.create_task(handle_youtube_transcript(100, url))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(flight, joiner)
+    current_job_class.reset(token)
+    process.assert_not_called()
+    assert submit.call_count == 1
+    assert "Summary" in json.loads(telegram_mock.calls.last.request.content)["text"]
+
+
+async def test_joiner_does_not_hold_up_the_chat(telegram_mock):
+    from app import dispatch_message, dispatcher, youtube_jobs
+    from dispatcher import JobDispatcher
+
+    release = asyncio.Event()
+
+    async def run():
+        await release.wait()
+        return {"video_id": "dQw4w9WgXcQ", "original_language": "en", "summary_text": "s"}
+
+    local = JobDispatcher(workers=dict.fromkeys(dispatcher.workers, 1), max_queued=10)
+    with patch("app.dispatcher", local), \
+         patch("app.youtube_results.get", new_callable=AsyncMock, return_value=None):
+        flight = asyncio.create_task(youtube_jobs.do(("dQw4w9WgXcQ", "transcript", -1), run))
+        await asyncio.sleep(0)
+        await dispatch_message(TelegramRequest(**make_payload("/yt https://www.youtube.com/watch?v=dQw4w9WgXcQ")))
+        await dispatch_message(TelegramRequest(**make_payload("/echo hi")))
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+        sent = [json.loads(c.request.content)["text"] for c in telegram_mock.calls]
+        assert "Received your message: hi" in sent  # answered while the run is still going
+        assert not flight.done()
+        release.set()
+        await flight
+        await wait_for_background_tasks()
+    assert "Summary" in json.loads(telegram_mock.calls.last.request.content)["text"]
+
+
+@pytest.mark.parametrize("text, cached, job_class", [
+    ("/yt https://www.youtube.com/watch?v=dQw4w9WgXcQ", None, "transcript"),
+    ("/yt https://www.youtube.com/watch?v=dQw4w9WgXcQ", {"text": "t"}, "chat"),
+    ("/yd https://www.youtube.com/watch?v=dQw4w9WgXcQ", {"text": "t"}, "chat"),
+    ("/yt https://www.youtube.com/watch?v=dQw4w9WgXcQ --refresh", {"text": "t"}, "transcript"),
+])
+async def test_cached_youtube_result_skips_the_heavy_lanes(text, cached, job_class):
+    from app import dispatch_message, dispatcher
+
+    with patch("app.youtube_results.get", new_callable=AsyncMock, return_value=cached), \
+         patch.object(dispatcher, "submit", return_value=0) as submit:
+        await dispatch_message(TelegramRequest(**make_payload(text)))
+    assert submit.call_args.args[0] == job_class
+
+
+@pytest.mark.parametrize("position, error", [(2, None), (0, QueueFull())])
+async def test_queue_notices_do_not_hold_up_the_webhook(position, error):
+    from app import dispatch_message, dispatcher
+
+    async def slow_send(chat_id, text):
+        await asyncio.sleep(0.3)  # paced or backing off after a 429
+
+    with patch.object(dispatcher, "submit", return_value=position, side_effect=error), \
+         patch("app.telegram_bot.send_message", side_effect=slow_send) as send:
+        start = time.monotonic()
+        await dispatch_message(TelegramRequest(**make_payload("/summary_url https://example.com")))
+        assert time.monotonic() - start < 0.1
+        await wait_for_background_tasks()
+    assert send.await_args.args[1].startswith("🚦" if error else "⏳ Queued, position 2")
+
+
+async def test_reply_goes_out_when_embedding_fails():
+    from app import conversation_index, handle_default, message_repository
+
+    msg = TelegramRequest(**make_payload("hello")).message
+    with patch.object(settings, "retrieval_enabled", True), \
+         patch("app.count_tokens", return_value=1), \
+         patch.object(message_repository, "get_messages", new_callable=AsyncMock, return_value=[]), \
+         patch.object(message_repository, "add_messages", new_callable=AsyncMock, return_value=[]), \
+         patch.object(conversation_index, "embed", side_effect=RuntimeError("embeddings down")), \
+         patch.object(conversation_index, "search", new_callable=AsyncMock) as search, \
+         patch("app.filter_context_size", side_effect=lambda messages, budget, *a, **kw: messages) as window, \
+         patch("app.reply_with_completion", new_callable=AsyncMock, return_value="hi!") as reply:
+        await handle_default(msg)
+    reply.assert_awaited_once_with(100, [{"role": "user", "content": "hello"}])
+    assert window.call_args.args[1] == settings.context_size  # no retrieval_budget set aside
+    search.assert_not_called()
+    await wait_for_background_tasks()
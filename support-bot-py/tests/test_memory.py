@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from memory import ChatSummary, ConversationMemory
+from repository import Message
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def turns(n, tokens=100):
+    return [
+        Message(content=f"t{i}", user="user", tokens=tokens, created_at=T0 + timedelta(seconds=i))
+        for i in range(n)
+    ]
+
+
+def make_memory(summary_text="folded"):
+    repository = MagicMock()
+    repository.get_summary = AsyncMock(return_value=None)
+    repository.save_summary = AsyncMock()
+    openai = MagicMock()
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = summary_text
+    openai.chat.completions.create = AsyncMock(return_value=response)
+    return ConversationMemory(repository, openai, "gpt-4o-mini", threshold=500, keep_recent=200), repository, openai
+
+
+async def test_fold_keeps_recent_turns_and_stores_summary():
+    memory, repository, openai = make_memory()
+    history = turns(8)
+    memory.schedule_fold(1, None, history[:5])  # 500 tokens: not over the threshold
+    assert not memory._folding
+
+    with patch("memory.count_tokens", return_value=12):
+        memory.schedule_fold(1, None, history)
+        memory.schedule_fold(1, None, history)  # one fold per chat at a time
+        await memory._folding[1]
+
+    openai.chat.completions.create.assert_awaited_once()
+    prompt = openai.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+    assert "t5" in prompt and "t6" not in prompt
+    row = repository.save_summary.call_args.args[1]
+    assert row["summary"] == "folded" and row["tokens"] == 12
+
+    summary = await memory.get(1)
+    assert summary.until == history[5].created_at
+    assert [m.content for m in memory.recent(summary, history)] == ["t6", "t7"]
+    repository.get_summary.assert_not_awaited()
+
+
+async def test_summary_is_loaded_once_per_chat():
+    memory, repository, _ = make_memory()
+    repository.get_summary.return_value = {"summary": "s", "until": "2025-01-01T00:00:03.5Z", "tokens": 3}
+    summary = await memory.get(2)
+    assert await memory.get(2) is summary
+    repository.get_summary.assert_awaited_once()
+    assert memory.prompt(summary)["role"] == "system"
+    assert [m.content for m in memory.recent(summary, turns(6))] == ["t4", "t5"]
+
+
+async def test_failed_fold_keeps_previous_summary():
+    memory, repository, _ = make_memory()
+    repository.save_summary.side_effect = RuntimeError("db down")
+    previous = ChatSummary(summary="old", until=T0, tokens=2)
+    memory._summaries[3] = previous
+    with patch("memory.count_tokens", return_value=5):
+        memory.schedule_fold(3, previous, turns(8))
+        await memory._folding[3]
+    assert await memory.get(3) is previous
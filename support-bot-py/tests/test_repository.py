@@ -0,0 +1,161 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import respx
+
+from repository import ConversationCache, Message, MessageRepository
+
+
+async def test_history_is_read_once_then_served_from_cache():
+    repo = MessageRepository()
+    repo._fetch = AsyncMock(return_value=[Message(content="hi", user="user", tokens=1)])
+    repo._insert = AsyncMock()
+
+    first = await repo.get_messages(7)
+    first.append(Message(content="caller-side append", user="user"))
+    await repo.add_messages(7, [{"content": "q", "user": "user", "tokens": 1}, {"content": "a", "user": "assistant", "tokens": 1}])
+    second = await repo.get_messages(7)
+
+    repo._fetch.assert_awaited_once()
+    assert [m.content for m in second] == ["hi", "q", "a"]
+    await repo.close()
+    repo._insert.assert_awaited_once()
+
+
+async def test_add_to_uncached_chat_does_not_fill_cache():
+    repo = MessageRepository()
+    repo._fetch = AsyncMock(return_value=[])
+    repo._insert = AsyncMock()
+    await repo.add_messages(8, [{"content": "q", "user": "user", "tokens": 1}])
+    assert repo.cache.get(8) is None
+    await repo.close()
+
+
+async def test_turns_are_flushed_in_bulk_with_ordered_timestamps():
+    repo = MessageRepository(flush_interval=0.01, flush_batch=5)
+    repo._insert = AsyncMock()
+    for chat_id in (1, 2):
+        await repo.add_messages(chat_id, [{"content": "q", "user": "user", "tokens": 1}, {"content": "a", "user": "assistant", "tokens": 1}])
+    repo._insert.assert_not_awaited()
+
+    await repo._flush_task
+    (rows,), _ = repo._insert.call_args
+    assert [r["chat_id"] for r in rows] == [1, 1, 2, 2]
+    stamps = [r["created_at"] for r in rows]
+    assert stamps == sorted(stamps) and len(set(stamps)) == 4
+
+    for _ in range(3):
+        await repo.add_messages(3, [{"content": "x", "user": "user", "tokens": 1}, {"content": "y", "user": "assistant", "tokens": 1}])
+    assert repo._insert.await_count == 2  # batch size reached, flushed without waiting
+
+
+async def test_failed_flush_is_retried():
+    repo = MessageRepository(flush_interval=0.01)
+    repo._insert = AsyncMock(side_effect=[RuntimeError("db down"), None])
+    await repo.add_messages(1, [{"content": "q", "user": "user", "tokens": 1}])
+    await repo._flush_task
+    await repo.close()
+    assert repo._insert.await_count == 2
+    assert repo._pending == []
+
+
+async def test_rejected_rows_are_isolated_and_dropped():
+    written = []
+
+    async def insert(rows):
+        if any(r["content"] == "bad" for r in rows):
+            request = httpx.Request("POST", "https://test.supabase.co/rest/v1/message")
+            raise httpx.HTTPStatusError("400", request=request, response=httpx.Response(400, request=request))
+        written.extend(r["content"] for r in rows)
+
+    repo = MessageRepository(flush_batch=100)
+    repo._insert = AsyncMock(side_effect=insert)
+    await repo.add_messages(1, [{"content": c, "user": "user", "tokens": 1} for c in "abcdefg"])
+    await repo.add_messages(1, [{"content": "bad", "user": "user", "tokens": 1}, {"content": "h", "user": "user", "tokens": 1}])
+    await repo.close()
+    assert written == list("abcdefgh")
+    assert repo._pending == [] and repo._failures == 0
+
+
+async def test_unwritten_rows_back_off_and_are_bounded():
+    repo = MessageRepository(flush_interval=0.01, flush_batch=2, max_pending=3)
+    repo._insert = AsyncMock(side_effect=httpx.ConnectError("db down"))
+    await repo.add_messages(1, [{"content": "a", "user": "user", "tokens": 1}, {"content": "b", "user": "user", "tokens": 1}])
+    assert repo._insert.await_count == 1 and repo._failures == 1
+    # Backing off: a full batch no longer flushes straight away
+    await repo.add_messages(1, [{"content": c, "user": "user", "tokens": 1} for c in "cd"])
+    assert repo._insert.await_count == 1
+    assert [r["content"] for r in repo._pending] == ["b", "c", "d"]  # oldest dropped
+    repo._flush_task.cancel()
+
+
+async def test_token_counts_are_computed_once_per_message():
+    repo = MessageRepository()
+    repo._insert = AsyncMock()
+    with patch("repository.count_tokens", return_value=3) as counter:
+        await repo.add_messages(9, [{"content": "q", "user": "user"}, {"content": "a", "user": "assistant", "tokens": 5}])
+        assert repo.cache.get(9) is None
+        repo._fetch = AsyncMock(return_value=[Message(content="q", user="user", tokens=3)])
+        await repo.get_messages(9)
+        await repo.add_messages(9, [{"content": "b", "user": "assistant"}])
+    assert counter.call_count == 2
+    assert [m.tokens for m in await repo.get_messages(9)] == [3, 3]
+    rows = repo._pending
+    assert all("tokens" not in row for row in rows)  # no tokens column unless store_tokens
+    await repo.close()
+
+
+def test_cache_bounds_by_chats_bytes_and_history():
+    cache = ConversationCache(max_chats=2, max_bytes=10, history_limit=2)
+    msg = lambda text: Message(content=text, user="user")  # noqa: E731
+    cache.set(1, [msg("a"), msg("b"), msg("c")])
+    assert [m.content for m in cache.get(1)] == ["b", "c"]
+    cache.set(2, [msg("d")])
+    cache.get(1)
+    cache.set(3, [msg("e")])  # over max_chats: least recently used (2) goes
+    assert cache.get(2) is None
+    cache.set(4, [msg("x" * 9)])  # over max_bytes
+    assert cache.size <= 10
+    assert cache.get(4) is not None
+
+
+async def test_postgrest_queries():
+    repo = MessageRepository()
+    with respx.mock(base_url="https://test.supabase.co/rest/v1") as mock:
+        get = mock.get("/message").respond(
+            200, json=[{"content": "a", "user": "assistant", "tokens": 1}, {"content": "q", "user": "user", "tokens": 1}]
+        )
+        post = mock.post("/message").respond(201)
+
+        messages = await repo.get_messages(5)
+        await repo.add_messages(5, [{"content": "next", "user": "user", "tokens": 1}])
+        await repo.close()
+
+    assert [m.content for m in messages] == ["q", "a"]
+    params = get.calls.last.request.url.params
+    assert params["chat_id"] == "eq.5" and params["order"] == "created_at.desc"
+    assert get.calls.last.request.headers["apikey"]
+    rows = json.loads(post.calls.last.request.content)
+    assert rows[0]["content"] == "next" and rows[0]["chat_id"] == 5
+
+
+async def test_token_budget_fetches_only_enough_pages():
+    history = [Message(content=f"m{i}", user="user", tokens=10) for i in range(50)]
+
+    async def fetch(chat_id, limit, offset=0):
+        newest_first = history[::-1][offset:offset + limit]
+        return newest_first[::-1]
+
+    repo = MessageRepository(page_size=5)
+    repo._fetch = AsyncMock(side_effect=fetch)
+    messages = await repo.get_messages(1, token_budget=120)
+    assert [m.content for m in messages] == [f"m{i}" for i in range(35, 50)]
+    assert repo._fetch.await_count == 3
+    assert not repo.cache.is_complete(1)
+
+    await repo.get_messages(1, token_budget=100)  # covered by the cached pages
+    assert repo._fetch.await_count == 3
+    assert len(await repo.get_messages(1)) == 50  # unbudgeted read needs everything
+    assert repo.cache.is_complete(1)
+    await repo.close()
@@ -0,0 +1,39 @@
+import os
+
+from result_cache import ResultCache
+
+
+async def test_roundtrip_ttl_and_size_bound(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    cache = ResultCache(path, ttl=3600, max_bytes=6_000)
+    key = ("dQw4w9WgXcQ", "diarize", 2)
+    result = {"video_id": "dQw4w9WgXcQ", "transcript_urls": ["https://telegra.ph/a"], "summary_text": "Привет"}
+
+    assert await cache.get(key) is None
+    await cache.put(key, result)
+    assert await cache.get(key) == result
+    assert await cache.get(("dQw4w9WgXcQ", "diarize", 3)) is None
+
+    # Incompressible payloads push the total over max_bytes: least recently used go first.
+    await cache.put(("old", "transcript", -1), {"blob": os.urandom(4000).hex()})
+    await cache.get(key)
+    await cache.put(("new", "transcript", -1), {"blob": os.urandom(4000).hex()})
+    assert await cache.get(("old", "transcript", -1)) is None
+    assert await cache.get(key) == result
+
+    expired = ResultCache(path, ttl=0, max_bytes=10_000)
+    assert await expired.get(key) is None
+
+
+async def test_disabled_without_path():
+    cache = ResultCache(None, ttl=3600, max_bytes=1)
+    await cache.put(("a", "transcript", -1), {"x": 1})
+    assert await cache.get(("a", "transcript", -1)) is None
+
+
+async def test_batch_get_and_put(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), ttl=3600, max_bytes=1_000_000)
+    await cache.put_many({("tm", str(i)): {"n": i} for i in range(1200)})  # more than one query's worth
+    keys = [("tm", str(i)) for i in range(0, 1300, 100)]
+    assert await cache.get_many(keys) == {("tm", str(i)): {"n": i} for i in range(0, 1200, 100)}
+    assert await cache.get(("tm", "7")) == {"n": 7}
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+
+from repository import Message
+from retrieval import ConversationIndex
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def make_index(path=None, **kwargs):
+    index = ConversationIndex(MagicMock(), dimensions=3, path=path, **kwargs)
+
+    async def embed(texts):
+        # One axis per topic, so similarity is easy to reason about
+        axes = {"cats": [1, 0, 0], "dogs": [0, 1, 0], "tax": [0, 0, 1]}
+        vectors = np.array([axes[t.split()[0]] for t in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index.embed = embed
+    return index
+
+
+def turn(i, text, tokens=10):
+    return Message(content=text, user="user", tokens=tokens, created_at=T0 + timedelta(seconds=i))
+
+
+async def test_search_returns_similar_older_turns(tmp_path):
+    index = make_index(path=str(tmp_path), top_k=2, min_score=0.5)
+    turns = [turn(0, "cats are great"), turn(1, "dogs bark"), turn(2, "tax forms"), turn(3, "cats again")]
+    await index.add(1, turns, {})
+    query = (await index.embed(["cats ?"]))[0]
+
+    found = await index.search(1, query)
+    assert [m.content for m in found] == ["cats are great", "cats again"]
+    # The recent window starts at turn 3, so only turn 0 is a candidate
+    found = await index.search(1, query, before=turns[3].created_at)
+    assert [m.content for m in found] == ["cats are great"]
+    assert await index.search(1, query, token_budget=5) == []
+
+    reloaded = make_index(path=str(tmp_path), top_k=2, min_score=0.5)
+    assert [m.content for m in await reloaded.search(1, query)] == ["cats are great", "cats again"]
+
+
+async def test_index_is_capped_and_compacted_on_disk(tmp_path):
+    index = make_index(path=str(tmp_path), max_turns=4)
+    for i in range(6):
+        await index.add(2, [turn(i, f"dogs {i}")], {})
+    reloaded = make_index(path=str(tmp_path))
+    contents = [m.content for m in (await reloaded._load(2)).messages]
+    assert contents == ["dogs 2", "dogs 3", "dogs 4", "dogs 5"]
+    assert (tmp_path / "2.f32").stat().st_size == 4 * 3 * 4
+
+
+async def test_turns_embedded_out_of_order_are_kept_in_order(tmp_path):
+    index = make_index(path=str(tmp_path))
+    embed = index.embed
+
+    async def slow_for_the_first_turn(texts):
+        if texts == ["cats 0"]:
+            await asyncio.sleep(0.05)
+        return await embed(texts)
+
+    index.embed = slow_for_the_first_turn
+    await asyncio.gather(
+        index.add(3, [turn(0, "cats 0")], {}),
+        index.add(3, [turn(1, "dogs 1"), turn(2, "dogs 2")], {}),
+    )
+    assert [m.content for m in (await index._load(3)).messages] == ["cats 0", "dogs 1", "dogs 2"]
+    reloaded = make_index(path=str(tmp_path))
+    query = (await reloaded.embed(["cats ?"]))[0]
+    assert [m.content for m in await reloaded.search(3, query, before=T0 + timedelta(seconds=1))] == ["cats 0"]
+
+
+async def test_embeddings_are_normalized():
+    index = ConversationIndex(MagicMock(), dimensions=2)
+    response = MagicMock()
+    response.data = [MagicMock(embedding=[3.0, 4.0])]
+    index.openai.embeddings.create = AsyncMock(return_value=response)
+    vectors = await index.embed(["x"])
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(vectors, [[0.6, 0.8]], rtol=1e-6)
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+async def test_concurrent_callers_share_one_run():
+    sf = SingleFlight()
+    runs = 0
+    release = asyncio.Event()
+
+    async def job():
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        return {"video_id": "abc"}
+
+    key = ("abc", "diarize", 2)
+    callers = [asyncio.create_task(sf.do(key, job)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert sf.in_flight(key)
+    release.set()
+    results = await asyncio.gather(*callers)
+
+    assert runs == 1
+    assert all(r is results[0] for r in results)
+    assert not sf.in_flight(key)
+
+
+async def test_errors_reach_every_caller_and_cancelled_caller_doesnt_cancel_run():
+    sf = SingleFlight()
+    release = asyncio.Event()
+
+    async def job():
+        await release.wait()
+        raise RuntimeError("boom")
+
+    first = asyncio.create_task(sf.do("k", job))
+    second = asyncio.create_task(sf.do("k", job))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    with pytest.raises(RuntimeError):
+        await second
+
+
+async def test_join_attaches_but_never_starts():
+    sf = SingleFlight()
+    with pytest.raises(LookupError):
+        sf.join("k")
+
+    release = asyncio.Event()
+
+    async def job():
+        await release.wait()
+        return 1
+
+    runner = asyncio.create_task(sf.do("k", job))
+    await asyncio.sleep(0)
+    joined = sf.join("k")
+    release.set()
+    assert await joined == 1 and await runner == 1
+    with pytest.raises(LookupError):
+        sf.join("k")
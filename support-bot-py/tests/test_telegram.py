@@ -0,0 +1,77 @@
+import os
+
+import httpx
+import respx
+
+from rate_limit import TokenBucket
+from settings import Settings
+from telegram import TelegramBot, create_telegram_bot
+
+
+async def test_client_is_shared_and_reopened_after_close():
+    bot = TelegramBot("testtoken")
+    with respx.mock(base_url="https://api.telegram.org", assert_all_called=False) as mock:
+        mock.post("/bottesttoken/sendMessage").respond(200, json={"ok": True})
+        first = bot.client
+        await bot.send_message(1, "a")
+        await bot.send_message(2, "b")
+        assert bot.client is first
+        assert mock.calls.call_count == 2
+
+        await bot.close()
+        assert first.is_closed
+        await bot.send_message(3, "c")
+        assert bot.client is not first
+    await bot.close()
+
+
+async def test_send_retries_after_429():
+    bot = TelegramBot("testtoken")
+    with respx.mock(base_url="https://api.telegram.org") as mock:
+        route = mock.post("/bottesttoken/sendMessage")
+        route.side_effect = [
+            httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 0.01}}),
+            httpx.Response(200, json={"ok": True}),
+        ]
+        await bot.send_message(-100123, "news")
+        assert route.call_count == 2
+    await bot.close()
+
+
+def test_token_bucket_paces_after_burst():
+    bucket = TokenBucket(rate=10.0, capacity=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert 0.05 < bucket.reserve() <= 0.1
+    bucket.pause(1.0)
+    assert bucket.reserve() > 0.9
+
+
+async def test_downloaded_file_streams_to_temp_path():
+    bot = TelegramBot("testtoken")
+    payload = b"x" * (3 * 1024 * 1024 + 17)
+    with respx.mock(base_url="https://api.telegram.org") as mock:
+        mock.get("/file/bottesttoken/videos/file_1.mp4").respond(200, content=payload)
+        async with bot.downloaded_file("videos/file_1.mp4") as path:
+            assert path.endswith(".mp4")
+            with open(path, "rb") as f:
+                assert f.read() == payload
+    assert not os.path.exists(path)
+    await bot.close()
+
+
+async def test_downloaded_file_local_mode_hands_out_path(tmp_path):
+    bot = TelegramBot("testtoken", local_api_url="http://telegram-bot-api:8081")
+    local = tmp_path / "voice.oga"
+    local.write_bytes(b"ogg")
+    async with bot.downloaded_file(str(local)) as path:
+        assert path == str(local)
+    assert not local.exists()
+
+
+def test_factory_applies_the_configured_send_limits():
+    settings = Settings(telegram_global_rate=7, telegram_chat_rate=0.5, telegram_chat_burst=2,
+                        telegram_group_rate_per_minute=10, telegram_max_retries=1)
+    bot = create_telegram_bot(settings)
+    assert bot._global_bucket.interval == 1 / 7
+    assert (bot.chat_rate, bot.chat_burst, bot.group_rate_per_minute, bot.max_retries) == (0.5, 2, 10, 1)
@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import respx
+
+from telegraph import TelegraphClient, content_nodes, paginate
+
+
+def telegraph_mock(mock):
+    accounts = mock.post("/createAccount").respond(
+        200, json={"ok": True, "result": {"access_token": "tok-1"}}
+    )
+    counter = iter(range(1000))
+
+    def create_page(request):
+        return respx.MockResponse(200, json={"ok": True, "result": {"path": f"p-{next(counter)}"}})
+
+    mock.post("/createPage").mock(side_effect=create_page)
+    return accounts
+
+
+async def test_concurrent_pages_share_one_account_and_keep_order(tmp_path):
+    token_path = tmp_path / "telegraph.json"
+    with respx.mock(base_url="https://api.telegra.ph") as mock:
+        accounts = telegraph_mock(mock)
+        client = TelegraphClient(token_path=str(token_path))
+        urls = await asyncio.gather(*(client.create_page(f"part {i}", "text") for i in range(5)))
+        await client.close()
+
+        assert accounts.call_count == 1
+        assert len(set(urls)) == 5 and all(u.startswith("https://telegra.ph/p-") for u in urls)
+        assert json.loads(token_path.read_text())["access_token"] == "tok-1"
+
+        # A restart reuses the persisted account
+        restarted = TelegraphClient(token_path=str(token_path))
+        assert await restarted.create_page("again", "text")
+        await restarted.close()
+        assert accounts.call_count == 1
+
+
+async def test_revoked_token_creates_a_new_account(tmp_path):
+    token_path = tmp_path / "telegraph.json"
+    token_path.write_text(json.dumps({"access_token": "stale"}))
+    with respx.mock(base_url="https://api.telegra.ph") as mock:
+        accounts = mock.post("/createAccount").respond(
+            200, json={"ok": True, "result": {"access_token": "fresh"}}
+        )
+        mock.post("/createPage").mock(
+            side_effect=lambda request: respx.MockResponse(
+                200,
+                json={"ok": True, "result": {"path": "p"}}
+                if json.loads(request.content)["access_token"] == "fresh"
+                else {"ok": False, "error": "ACCESS_TOKEN_INVALID"},
+            )
+        )
+        client = TelegraphClient(token_path=str(token_path))
+        assert await client.create_page("t", "text") == "https://telegra.ph/p"
+        await client.close()
+    assert accounts.call_count == 1
+    assert json.loads(token_path.read_text())["access_token"] == "fresh"
+
+
+def test_content_nodes():
+    assert content_nodes("## Title\n\n**bold** line\nnext\n\n \n\nlast") == [
+        {"tag": "p", "children": ["Title"]},
+        {"tag": "p", "children": ["bold line", {"tag": "br"}, "next"]},
+        {"tag": "p", "children": ["last"]},
+    ]
+
+
+def page_text(nodes):
+    return [c for n in nodes for c in n["children"] if isinstance(c, str)]
+
+
+def test_paginate_fills_pages_up_to_the_exact_limit():
+    paragraphs = [f"paragraph {i} " + "word " * (i % 7 * 10) for i in range(200)]
+    text = "\n\n".join(paragraphs)
+    pages = paginate(text, 2000, continued="(continued)")
+
+    sizes = [len(json.dumps(p, separators=(",", ":"))) for p in pages]
+    assert max(sizes) <= 2000
+    assert pages[1][0] == {"tag": "p", "children": ["(continued)"]}
+    body = [line for i, p in enumerate(pages) for line in page_text(p[1:] if i else p)]
+    assert body == paragraphs
+    # Greedy: the next page's first paragraph would not have fit on this one
+    for page, following in zip(pages, pages[1:]):
+        assert len(json.dumps(page + [following[1]], separators=(",", ":"))) > 2000
+
+
+def test_paginate_splits_an_oversized_paragraph():
+    text = "intro\n\n" + "\n".join("Speaker 1: " + "блабла " * 30 for _ in range(20))
+    pages = paginate(text, 1500)
+    assert len(pages) > 1
+    assert all(len(json.dumps(p, separators=(",", ":"))) <= 1500 for p in pages)
+    words = " ".join(line for p in pages for line in page_text(p)).split()
+    assert words == text.split()
+
+
+async def test_page_body_is_sent_as_measured(tmp_path):
+    nodes = paginate("Привет, мир\n\nsecond")[0]
+    with respx.mock(base_url="https://api.telegra.ph") as mock:
+        telegraph_mock(mock)
+        client = TelegraphClient()
+        await client.create_page_nodes("t", nodes)
+        await client.close()
+        sent = mock.calls.last.request.content.decode()
+    assert json.dumps(nodes, separators=(",", ":")) in sent
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import transcript_cache
+from result_cache import ResultCache
+from transcript_cache import fetch_transcript, find_transcript
+from youtube import get_transcript_summary
+from youtube_diarize import _youtube_cues
+
+
+def fake_transcript(code: str, generated: bool, fetches: list):
+    def fetch():
+        fetches.append((code, generated))
+        return [SimpleNamespace(text=f"{code} hello", start=0.0, duration=1.5)]
+
+    return SimpleNamespace(
+        language_code=code, language=code.upper(), is_generated=generated, fetch=fetch
+    )
+
+
+@pytest.fixture
+def youtube(tmp_path):
+    """A video with generated English and human Russian captions, and the
+    shared cache on disk; yields the listing and fetch calls made."""
+    calls = {"list": 0, "fetch": []}
+
+    def list_transcripts(video_id, proxies=None):
+        calls["list"] += 1
+        return [fake_transcript("ru", False, calls["fetch"]), fake_transcript("en", True, calls["fetch"])]
+
+    cache = ResultCache(str(tmp_path / "transcripts.sqlite3"), ttl=3600, max_bytes=1_000_000)
+    with patch.object(transcript_cache, "transcript_cache", cache), \
+         patch("transcript_cache.YouTubeTranscriptApi.list_transcripts", side_effect=list_transcripts):
+        yield calls
+
+
+def test_commands_share_listing_and_cues(youtube):
+    # /yd prefers the human transcript, /sy asks for ru then en: same captions
+    assert _youtube_cues("vid") == ([{"text": "ru hello", "start": 0.0, "end": 1.5}], "ru")
+    with patch("youtube.make_summary_single_call", side_effect=lambda text: f"S({text})"):
+        assert get_transcript_summary("https://youtu.be/dQw4w9WgXcQ") == "S(ru hello)"
+        assert get_transcript_summary("https://youtu.be/dQw4w9WgXcQ") == "S(ru hello)"
+    assert _youtube_cues("vid") is not None
+    assert youtube == {"list": 2, "fetch": [("ru", False), ("ru", False)]}  # once per video
+
+    # Another language of a listed video: one more listing + fetch, then cached
+    def english(listing):
+        return find_transcript(listing, ["en"])
+
+    entry, cues = fetch_transcript("vid", english)
+    assert (entry["language_code"], entry["is_generated"]) == ("en", True)
+    assert fetch_transcript("vid", english) == (entry, cues)
+    assert youtube["list"] == 3 and youtube["fetch"][-1] == ("en", True)
+
+
+def test_nothing_chosen_and_failures_are_not_cached(youtube):
+    assert fetch_transcript("vid", lambda listing: find_transcript(listing, ["de"])) is None
+    with patch("transcript_cache.YouTubeTranscriptApi.list_transcripts", side_effect=RuntimeError("429")):
+        with pytest.raises(RuntimeError):
+            fetch_transcript("other", lambda listing: None)
+    assert fetch_transcript("other", lambda listing: listing[0])[1][0]["text"] == "ru hello"
@@ -0,0 +1,50 @@
+import pytest
+
+from translation_memory import Piece, TranslationMemory
+
+
+def chunk_each(text: str) -> list[str]:
+    return [text]
+
+
+@pytest.fixture
+def memory(tmp_path, char_tokens):
+    return TranslationMemory(str(tmp_path / "translations.sqlite3"), ttl=3600, max_bytes=1_000_000)
+
+
+async def test_remembered_paragraphs_skip_the_model(memory):
+    await memory.learn("uno\n\ndos", "one\n\ntwo\n", "\n\n", "m")
+    await memory.learn("tres\n\ncuatro", "three and four", "\n\n", "m")  # merged: not remembered
+
+    pieces = await memory.plan("uno\n\ntres\n\n\n\ncuatro\n\n  dos ", "\n\n", "m", chunk_each)
+    assert pieces == [
+        Piece("one", remembered=True),
+        Piece("tres\n\n\n\ncuatro"),
+        Piece("two", remembered=True),  # whitespace is normalized in the key
+    ]
+    # Keyed per model (and target language)
+    assert await memory.plan("uno", "\n\n", "other", chunk_each) == [Piece("uno")]
+    assert await memory.plan("uno", "\n\n", "m", chunk_each, target="de") == [Piece("uno")]
+    assert memory.stats() == {"lookups": 6, "hits": 2, "hit_rate": 2 / 6, "tokens_saved": 6 + 6}
+
+
+async def test_disabled_without_path(char_tokens):
+    memory = TranslationMemory(None, ttl=3600, max_bytes=1)
+    await memory.learn("uno", "one", "\n", "m")
+    assert await memory.plan("uno\ndos", "\n", "m", chunk_each) == [Piece("uno\ndos")]
+    assert memory.stats()["lookups"] == 0
+
+
+async def test_shifted_paragraphs_are_not_remembered(memory):
+    # The first two paragraphs merged and the third split in two: the counts
+    # match, the pairs don't
+    source = "\n\n".join(["a" * 40, "b" * 5, "c" * 60])
+    await memory.learn(source, "\n\n".join(["A" * 45, "C" * 30, "C" * 30]), "\n\n", "m")
+    assert not any(p.remembered for p in await memory.plan(source, "\n\n", "m", chunk_each))
+
+    # Speaker lines must keep their labels
+    lines = "Speaker 1: hola\nSpeaker 2: que tal"
+    await memory.learn(lines, "Speaker 1: hello, how\nSpeaker 1: are you", "\n", "m")
+    assert not any(p.remembered for p in await memory.plan(lines, "\n", "m", chunk_each))
+    await memory.learn(lines, "Speaker 1: hello\nSpeaker 2: how are you", "\n", "m")
+    assert all(p.remembered for p in await memory.plan(lines, "\n", "m", chunk_each))
@@ -0,0 +1,14 @@
+from utils import filter_context_size
+
+
+def _msgs(n):
+    return [{"role": "user", "content": str(i)} for i in range(n)]
+
+
+def test_filter_context_size_with_cached_counts():
+    messages = _msgs(4)
+    assert filter_context_size(messages, 10, "gpt-4o-mini", token_counts=[4, 4, 3, 3]) == messages[1:]
+    assert filter_context_size(messages, 100, "gpt-4o-mini", token_counts=[4, 4, 3, 3]) == messages
+    # The newest message is always kept, even when it alone exceeds the budget.
+    assert filter_context_size(messages, 2, "gpt-4o-mini", token_counts=[1, 1, 1, 50]) == messages[-1:]
+    assert filter_context_size([], 10, "gpt-4o-mini", token_counts=[]) == []
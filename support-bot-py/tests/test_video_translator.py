@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from settings import Settings
+from translation_memory import TranslationMemory
+from video_translator import _translate_fallback
+
+
+def fake_openai(text: str, language: str = "es") -> MagicMock:
+    client = MagicMock()
+    transcription = SimpleNamespace(text=text, language=language)
+    client.audio.transcriptions.create = AsyncMock(return_value=transcription)
+
+    async def translate(model, messages, max_tokens):
+        source = messages[0]["content"].split("\n\n", 1)[1]
+        reply = "I can't assist with that." if "secreto" in source else source.upper()
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+    client.chat.completions.create = AsyncMock(side_effect=translate)
+    return client
+
+
+async def test_fallback_translates_in_chunks(char_tokens):
+    settings = Settings(translate_chunk_tokens=12)
+    client = fake_openai("hola amigo\nque tal\nun secreto\nadios")
+
+    original, translated, lang = await _translate_fallback(b"mp3", client, settings)
+    assert (original, lang) == ("hola amigo\nque tal\nun secreto\nadios", "es")
+    # A refused chunk keeps its original text
+    assert translated == "HOLA AMIGO\nQUE TAL\nun secreto\nADIOS"
+    calls = client.chat.completions.create.await_args_list
+    sent = [c.kwargs["messages"][0]["content"].split("\n\n", 1)[1] for c in calls]
+    assert sent == ["hola amigo", "que tal", "un secreto", "adios"]
+
+
+async def test_fallback_reuses_remembered_lines(tmp_path, char_tokens):
+    settings = Settings(translate_chunk_tokens=12)
+    memory = TranslationMemory(str(tmp_path / "translations.sqlite3"), ttl=3600, max_bytes=1_000_000)
+    client = fake_openai("hola amigo\nque tal\nun secreto\nadios")
+
+    with patch("video_translator.translation_memory", memory):
+        _, first, _ = await _translate_fallback(b"mp3", client, settings)
+        client.chat.completions.create.reset_mock()
+        _, again, _ = await _translate_fallback(b"mp3", client, settings)
+    assert again == first
+    # Only the refused line goes back to the model
+    assert client.chat.completions.create.await_count == 1
+
+
+async def test_fallback_skips_translation_for_english():
+    client = fake_openai("hello there", language="en")
+    assert await _translate_fallback(b"mp3", client, Settings()) == ("hello there", "hello there", "en")
+    client.chat.completions.create.assert_not_called()
+
+
+async def test_fallback_keeps_a_split_line_on_one_line(char_tokens):
+    settings = Settings(translate_chunk_tokens=12)
+    client = fake_openai("hola amigo. que tal? muy bien\nadios")
+    _, translated, _ = await _translate_fallback(b"mp3", client, settings)
+    assert translated == "HOLA AMIGO. QUE TAL? MUY BIEN\nADIOS"
+    assert client.chat.completions.create.await_count == 4
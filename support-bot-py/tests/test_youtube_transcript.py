@@ -0,0 +1,171 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from settings import Settings
+from tests.conftest import CharEncoding
+from translation_memory import Piece, TranslationMemory
+from youtube_transcript import (
+    _reduce_groups,
+    _summarize,
+    _summarize_stream,
+    _translate_chunk,
+    _translate_chunks,
+    _translate_chunks_stream,
+)
+
+
+def fake_openai(delays: dict[str, float], replies: dict[str, str | None] | None = None):
+    """Completions client that echoes chunks upper-cased after a per-chunk delay,
+    recording the peak number of concurrent requests."""
+    state = {"active": 0, "peak": 0}
+
+    async def create(model, messages, max_tokens):
+        chunk = messages[0]["content"].split("\n\n", 1)[1]
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(delays.get(chunk, 0))
+            if chunk == "boom":
+                raise RuntimeError("api down")
+            response = MagicMock()
+            response.choices[0].message.content = (replies or {}).get(chunk, chunk.upper())
+            return response
+        finally:
+            state["active"] -= 1
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    return client, state
+
+
+async def test_chunks_are_translated_concurrently_in_order():
+    chunks = ["one", "two", "three", "four", "five"]
+    client, state = fake_openai({"one": 0.05, "two": 0.01, "three": 0.03})
+    settings = Settings(transcript_translate_concurrency=2)
+
+    result = await _translate_chunks(client, chunks, settings)
+
+    assert result == ["ONE", "TWO", "THREE", "FOUR", "FIVE"]
+    assert state["peak"] == 2
+
+
+async def test_refused_chunk_keeps_original_text():
+    client, _ = fake_openai({}, replies={"two": "I can't assist with that."})
+    result = await _translate_chunks(client, ["one", "two"], Settings())
+    assert result == ["ONE", "two"]
+
+
+async def test_failed_chunk_propagates():
+    client, _ = fake_openai({"one": 1})
+    with pytest.raises(RuntimeError):
+        await _translate_chunks(client, ["one", "boom"], Settings())
+
+
+def summarizer_openai(refuse: set[str] = frozenset()):
+    """Completions client for _summarize: chunk summaries are "S(<chunk>)",
+    combines are "C[<inputs>]" ("F[...]" for the final top-5 combine)."""
+    calls = []
+
+    async def create(model, messages, max_tokens):
+        system, user = messages[0]["content"], messages[1]["content"]
+        body = user.split("\n\n", 1)[1]
+        calls.append(body)
+        await asyncio.sleep(0)
+        if "top 5" in system:
+            reply = "F[" + "|".join(body.split("\n\n")) + "]"
+        elif "Merge" in system:
+            reply = "C[" + "|".join(body.split("\n\n")) + "]"
+        else:
+            reply = "I can't assist with that." if body in refuse else f"S({body})"
+        response = MagicMock()
+        response.choices[0].message.content = reply
+        return response
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    return client, calls
+
+
+def test_reduce_groups_fit_budget_and_shrink():
+    with patch("youtube_transcript.count_tokens", side_effect=lambda text, model: len(text)), \
+         patch("youtube_transcript.get_encoding", return_value=CharEncoding()):
+        assert _reduce_groups(["a", "bb", "c", "dd", "e"], 4, "m") == [["a", "bb", "c"], ["dd", "e"]]
+        # A trailing summary that doesn't fit the last group stands alone
+        assert _reduce_groups(["aa", "bb", "cc", "dd", "e"], 4, "m") == [["aa", "bb"], ["cc", "dd"], ["e"]]
+        # Summaries over half the budget are trimmed, so no group overflows it
+        assert _reduce_groups(["xxxxx", "yyyyy", "zzzzz"], 4, "m") == [["xx", "yy"], ["zz"]]
+
+
+async def test_summarize_reduces_as_a_tree(char_tokens):
+    client, _ = summarizer_openai(refuse={"b" * 10})
+    text = "\n\n".join(ch * 10 for ch in "abcd")
+    settings = Settings(summary_chunk_tokens=10, summary_reduce_budget=2)
+    with patch("youtube_transcript.AsyncOpenAI", return_value=client), \
+         patch("youtube_transcript.count_tokens", return_value=1):
+        summary = await _summarize(text, settings)
+    excerpt = "[Transcript excerpt]: " + "b" * 10 + "..."
+    s = lambda ch: f"S({ch * 10})"  # noqa: E731
+    assert summary == f"F[C[{s('a')}|{excerpt}]|C[{s('c')}|{s('d')}]]"
+
+
+async def test_summarize_single_chunk_and_empty_text(char_tokens):
+    client, calls = summarizer_openai()
+    with patch("youtube_transcript.AsyncOpenAI", return_value=client):
+        assert await _summarize("short", Settings()) == "S(short)"
+        assert await _summarize("", Settings()) == "Summary could not be generated for this transcript."
+    assert calls == ["short"]
+
+
+async def test_summaries_start_while_later_chunks_translate(char_tokens):
+    events = []
+    translator, _ = fake_openai({"two": 0.05})
+    summarizer, _ = summarizer_openai()
+    inner = summarizer.chat.completions.create
+
+    async def summarize(**kwargs):
+        events.append("summary")
+        return await inner(**kwargs)
+
+    summarizer.chat.completions.create = summarize
+    settings = Settings(transcript_translate_concurrency=1, summary_chunk_tokens=3)
+
+    async def translated():
+        async for chunk in _translate_chunks_stream(translator, [Piece("one"), Piece("two")], settings):
+            events.append(f"translated {chunk}")
+            yield chunk
+
+    with patch("youtube_transcript.AsyncOpenAI", return_value=summarizer), \
+         patch("youtube_transcript.count_tokens", return_value=1):
+        summary = await _summarize_stream(translated(), settings)
+
+    assert events.index("summary") < events.index("translated TWO")
+    assert summary == "F[S(ONE)|S(TWO)]"
+
+
+async def test_rerun_translates_only_new_paragraphs(tmp_path, char_tokens):
+    memory = TranslationMemory(str(tmp_path / "translations.sqlite3"), ttl=3600, max_bytes=1_000_000)
+    client, _ = fake_openai({})
+    settings = Settings()
+    sent = []
+    create = client.chat.completions.create
+
+    async def record(**kwargs):
+        sent.append(kwargs["messages"][0]["content"].split("\n\n", 1)[1])
+        return await create(**kwargs)
+
+    client.chat.completions.create = record
+
+    async def translate(text: str) -> str:
+        pieces = await memory.plan(text, "\n\n", settings.model_transcript, lambda text: [text])
+        return "\n\n".join([c async for c in _translate_chunks_stream(client, pieces, settings)])
+
+    with patch("youtube_transcript.translation_memory", memory), \
+         patch("youtube_transcript._translate_chunk", wraps=_translate_chunk) as translate_chunk:
+        assert await translate("uno\n\ndos") == "UNO\n\nDOS"
+        assert await translate("uno\n\ndos\n\ntres") == "UNO\n\nDOS\n\nTRES"
+    assert sent == ["uno\n\ndos", "tres"]
+    # Logged as chunk 1/1 both times: remembered pieces aren't numbered
+    assert [c.args[2:4] for c in translate_chunk.await_args_list] == [(0, 1), (0, 1)]
+    assert memory.stats()["hits"] == 2
@@ -0,0 +1,97 @@
+"""YouTube caption fetching shared by /sy, /yt and /yd, cached on disk.
+
+Each command used to list and fetch captions through the proxy itself, so
+switching commands on the same video repeated the slow (and often rate-limited)
+YouTube calls. Here the list of a video's transcripts and the cues of each
+fetched transcript are kept in a ResultCache (SQLite, zlib-compressed JSON,
+with a TTL). Every command picks its transcript from the cached list with its
+own language preference, and only what is missing is requested from YouTube.
+
+Failures (no captions, rate limits) are never cached. The functions block, so
+async callers run them with asyncio.to_thread.
+"""
+from typing import Callable
+
+from loguru import logger
+from youtube_transcript_api import YouTubeTranscriptApi
+
+from result_cache import ResultCache
+from settings import Settings
+
+settings = Settings()
+
+transcript_cache = ResultCache(
+    settings.transcript_cache_path,
+    ttl=settings.transcript_cache_ttl,
+    max_bytes=settings.transcript_cache_max_mb * 1024 * 1024,
+)
+
+
+def _proxies() -> dict | None:
+    return {"https": settings.youtube_proxy_url} if settings.youtube_proxy_url else None
+
+
+def find_transcript(listing: list[dict], languages: list[str]) -> dict | None:
+    """The first transcript in one of `languages` (in order), a human one
+    before an auto-generated one, like TranscriptList.find_transcript."""
+    for code in languages:
+        for generated in (False, True):
+            for entry in listing:
+                if entry["language_code"] == code and entry["is_generated"] == generated:
+                    return entry
+    return None
+
+
+def _list(video_id: str) -> list:
+    """The video's Transcript objects (human ones first), from YouTube."""
+    return list(YouTubeTranscriptApi.list_transcripts(video_id, proxies=_proxies()))
+
+
+def fetch_transcript(
+    video_id: str, choose: Callable[[list[dict]], dict | None]
+) -> tuple[dict, list[dict]] | None:
+    """The transcript `choose` picks from the video's listing
+    ([{"language_code", "language", "is_generated"}], human ones first), with
+    its cues as [{"text", "start", "duration"}]. None when it picks nothing.
+
+    Raises what YouTubeTranscriptApi raises when the video can't be listed."""
+    found = None  # Transcript objects, when the listing is fetched now
+    cached = transcript_cache.lookup(("transcripts", video_id))
+    if cached is not None:
+        listing = cached["transcripts"]
+    else:
+        found = _list(video_id)
+        listing = [
+            {"language_code": t.language_code, "language": t.language, "is_generated": t.is_generated}
+            for t in found
+        ]
+        transcript_cache.store(("transcripts", video_id), {"transcripts": listing})
+
+    entry = choose(listing)
+    if entry is None:
+        return None
+    key = ("cues", video_id, entry["language_code"], entry["is_generated"])
+    cached = transcript_cache.lookup(key)
+    if cached is not None:
+        # Stored as [start, duration, text] rows to keep the payload small
+        return entry, [{"text": t, "start": s, "duration": d} for s, d, t in cached["cues"]]
+
+    if found is None:
+        found = _list(video_id)
+    transcript = next(
+        (t for t in found
+         if t.language_code == entry["language_code"] and t.is_generated == entry["is_generated"]),
+        None,
+    )
+    if transcript is None:
+        logger.warning(f"{entry['language_code']} transcript for {video_id} is gone")
+        return None
+    logger.info(f"Fetching {entry['language_code']} transcript for {video_id}")
+    cues = []
+    for snippet in transcript.fetch():
+        if isinstance(snippet, dict):
+            cues.append({"text": snippet["text"], "start": snippet["start"], "duration": snippet["duration"]})
+        else:
+            cues.append({"text": snippet.text, "start": snippet.start, "duration": snippet.duration})
+    transcript_cache.store(key, {"cues": [[c["start"], c["duration"], c["text"]] for c in cues]})
+    return entry, cues
@@ -0,0 +1,177 @@
+"""Paragraph-level translation memory.
+
+Transcripts used to be translated from scratch on every run, even when most of
+their paragraphs had been translated before (a re-run after the result cache
+expired, the same captions through /yt and then /yd). Every translated
+paragraph is now remembered in a ResultCache (SQLite, with a TTL and an LRU
+size bound) under a hash of (normalized source paragraph, target language,
+model). The translators plan() a text first:
+remembered paragraphs come back already translated, and only the runs of
+misses are chunked and sent to the model.
+
+To be remembered, a chunk's translation is split back into paragraphs, which
+only works when the model kept the paragraph breaks; when the counts differ
+the translation is used but not remembered. Matching counts can still hide a
+shift (one paragraph merged, another split), so every pair must also look
+like a translation of its source: the same "Speaker N:" label, and a length
+in line with the rest of the chunk.
+
+Each plan logs its hit rate and the tokens saved (source plus translation
+tokens of the remembered paragraphs); stats() totals them for /api/metrics.
+"""
+import asyncio
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+from loguru import logger
+
+from result_cache import ResultCache
+from settings import Settings
+from utils import get_encoding
+
+settings = Settings()
+
+_SPEAKER_LABEL = re.compile(r"\s*(Speaker \d+):")
+
+# A pair is suspect when its translation is this many times longer or shorter
+# than the chunk's translations are on average, give or take a few tokens
+# (short paragraphs vary a lot).
+_MAX_LENGTH_RATIO = 2.5
+_LENGTH_SLACK = 8
+
+
+@dataclass
+class Piece:
+    """Part of a text to translate. `text` is source for the model, or the
+    translation itself when `remembered`."""
+    text: str
+    remembered: bool = False
+
+
+class TranslationMemory:
+    def __init__(self, path: str | None, ttl: float, max_bytes: int):
+        """A None path disables the memory (every paragraph is a miss)."""
+        self.path = path
+        self.cache = ResultCache(path, ttl=ttl, max_bytes=max_bytes)
+        self.lookups = 0
+        self.hits = 0
+        self.tokens_saved = 0
+
+    @staticmethod
+    def key(text: str, target: str, model: str) -> tuple:
+        normalized = " ".join(text.split())
+        digest = hashlib.sha256(f"{model}\0{target}\0{normalized}".encode("utf-8")).hexdigest()
+        return ("translation", digest)
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
+
+    async def plan(
+        self,
+        text: str,
+        separator: str,
+        model: str,
+        chunk: Callable[[str], list[str]],
+        target: str = "en",
+    ) -> list[Piece]:
+        """`text` as pieces in order: runs of remembered paragraphs (split on
+        `separator`) already translated, and the runs in between cut into
+        chunks by `chunk` for the model."""
+        units = text.split(separator)
+        keys = [self.key(u, target, model) if u.strip() else None for u in units]
+        found = await self.cache.get_many([k for k in keys if k])
+
+        runs: list[tuple[bool, list[str]]] = []
+        hits = saved = 0
+        for unit, key in zip(units, keys):
+            if key is None and runs:
+                runs[-1][1].append(unit)  # blank paragraphs stay where they are
+                continue
+            remembered = key in found
+            if remembered:
+                unit = found[key]["translation"]
+                hits += 1
+                saved += found[key]["tokens"]
+            if runs and runs[-1][0] == remembered:
+                runs[-1][1].append(unit)
+            else:
+                runs.append((remembered, [unit]))
+
+        lookups = sum(1 for k in keys if k)
+        if lookups and self.path:
+            self.lookups += lookups
+            self.hits += hits
+            self.tokens_saved += saved
+            logger.info(
+                f"translation memory: {hits}/{lookups} paragraphs remembered "
+                f"({hits / lookups:.0%}), ~{saved} tokens saved"
+            )
+
+        pieces = []
+        for remembered, texts in runs:
+            joined = separator.join(texts)
+            if remembered:
+                pieces.append(Piece(joined, remembered=True))
+            else:
+                pieces.extend(Piece(c) for c in chunk(joined))
+        return pieces
+
+    async def learn(self, source: str, translation: str, separator: str, model: str, target: str = "en"):
+        """Remember the paragraphs of a translated chunk, if the translation
+        has as many paragraphs as the source and they pair up plausibly."""
+        if not self.path:
+            return
+        sources = [u for u in source.split(separator) if u.strip()]
+        translations = [u.strip() for u in translation.split(separator) if u.strip()]
+        if len(sources) != len(translations):
+            logger.debug(
+                f"translation memory: {len(sources)} paragraphs came back as {len(translations)}, not remembered"
+            )
+            return
+        try:
+            await asyncio.to_thread(self._store, sources, translations, target, model)
+        except Exception as e:
+            logger.warning(f"translation memory: store failed: {e}")
+
+    def _store(self, sources: list[str], translations: list[str], target: str, model: str):
+        # Blocking (tokenizing and SQLite); runs in a worker thread
+        counts = [len(t) for t in get_encoding(model).encode_ordinary_batch(sources + translations)]
+        n = len(sources)
+        if not _paired(sources, translations, counts[:n], counts[n:]):
+            logger.info(f"translation memory: {n} paragraphs don't pair up with their translation, not remembered")
+            return
+        self.cache.store_many({
+            self.key(s, target, model): {"translation": t, "tokens": counts[i] + counts[n + i]}
+            for i, (s, t) in enumerate(zip(sources, translations))
+        })
+
+
+def _label(text: str) -> str | None:
+    match = _SPEAKER_LABEL.match(text)
+    return match.group(1) if match else None
+
+
+def _paired(sources: list[str], translations: list[str], source_tokens: list[int], tokens: list[int]) -> bool:
+    """Whether each translation plausibly translates the source beside it."""
+    if any(_label(s) != _label(t) for s, t in zip(sources, translations)):
+        return False
+    ratio = sum(tokens) / max(1, sum(source_tokens))
+    return all(
+        t <= _MAX_LENGTH_RATIO * ratio * s + _LENGTH_SLACK
+        and ratio * s <= _MAX_LENGTH_RATIO * t + _LENGTH_SLACK
+        for s, t in zip(source_tokens, tokens)
+    )
+
+
+translation_memory = TranslationMemory(
+    settings.translation_memory_path,
+    ttl=settings.translation_memory_ttl,
+    max_bytes=settings.translation_memory_max_mb * 1024 * 1024,
+)
@@ -1,3 +1,6 @@
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
 from typing import Annotated, TypedDict
 
 import tiktoken
@@ -19,20 +22,35 @@ class Message(TypedDict):
     role: str
 
 
-def filter_context_size(
-    messages: list[Message], context_size: int, model: str
-) -> list[Message]:
-    tokenizer = tiktoken.encoding_for_model(model)
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Process-wide tokenizer per model (building one is far from free).
+    Models tiktoken doesn't know (e.g. non-OpenAI ones) get o200k_base."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
 
-    messages_length = [len(tokenizer.encode(m["content"])) for m in messages]
+def count_tokens(text: str, model: str) -> int:
+    return len(get_encoding(model).encode(text))
 
-    total_length = 0
-    for i, length in enumerate(messages_length[::-1]):
-        total_length += length
-        if total_length > context_size:
-            break
-    logger.info(f"Total length: {total_length}")
 
-    if i == 0:
-        return messages[-1:]
-    return messages[-i:]
+def filter_context_size(
+    messages: list[Message],
+    context_size: int,
+    model: str,
+    token_counts: list[int] | None = None,
+) -> list[Message]:
+    """Newest messages whose token total fits context_size (always at least the
+    newest one). Pass precomputed `token_counts` (one per message) to skip
+    re-encoding the history; the window is then found by bisecting suffix sums."""
+    if token_counts is None:
+        token_counts = [count_tokens(m["content"], model) for m in messages]
+
+    # totals[k] = tokens in the k + 1 newest messages
+    totals = list(accumulate(reversed(token_counts)))
+    keep = bisect_right(totals, context_size)
+    logger.info(f"Total length: {totals[max(keep, 1) - 1] if totals else 0}")
+
+    return messages[-max(keep, 1):]
@@ -2,14 +2,15 @@ import asyncio
 import base64
 import os
 import shutil
-import tempfile
 from dataclasses import dataclass
 
 import openai as openai_exc
 from loguru import logger
 from openai import AsyncOpenAI
 
+from chunking import Chunker
 from settings import Settings
+from translation_memory import translation_memory
 
 _E2E_PROMPT = """\
 Give me the English version of what is spoken in this audio. If the speakers are already using English, just write their words. If they are using any other language, express the meaning in English.
@@ -111,50 +112,45 @@ def _ext(filename: str) -> str:
     return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
 
 
-async def _to_mp3(file_bytes: bytes, filename: str) -> bytes:
-    """Transcode any audio/video to 16kHz mono mp3 via ffmpeg.
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def _to_mp3(in_path: str, filename: str) -> bytes:
+    """Transcode any audio/video file on disk to 16kHz mono mp3 via ffmpeg.
 
     gpt-4o-mini-audio-preview only accepts wav/mp3, and whisper-class endpoints
     have been observed to 500 on some Telegram mp4 files. Normalizing to mp3
-    unblocks both paths.
+    unblocks both paths. ffmpeg reads the source straight from `in_path`, so the
+    (possibly large) original is never held in memory.
     """
     if _ext(filename) == "mp3":
-        return file_bytes
+        return await asyncio.to_thread(_read_file, in_path)
     if not shutil.which("ffmpeg"):
         raise RuntimeError("ffmpeg not available on PATH — install ffmpeg to translate media")
 
-    ext = _ext(filename) or "bin"
-    with tempfile.NamedTemporaryFile(suffix=f".{ext}", delete=False) as inf:
-        inf.write(file_bytes)
-        in_path = inf.name
-
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            "ffmpeg",
-            "-y",
-            "-i", in_path,
-            "-vn",
-            "-acodec", "libmp3lame",
-            "-ab", "64k",
-            "-ar", "16000",
-            "-ac", "1",
-            "-f", "mp3",
-            "pipe:1",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        out, err = await proc.communicate()
-        if proc.returncode != 0:
-            snippet = err.decode("utf-8", errors="replace")[-500:]
-            raise RuntimeError(f"ffmpeg failed (rc={proc.returncode}): {snippet}")
-        if not out:
-            raise RuntimeError("ffmpeg produced empty output")
-        return out
-    finally:
-        try:
-            os.unlink(in_path)
-        except OSError:
-            pass
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-y",
+        "-i", in_path,
+        "-vn",
+        "-acodec", "libmp3lame",
+        "-ab", "64k",
+        "-ar", "16000",
+        "-ac", "1",
+        "-f", "mp3",
+        "pipe:1",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await proc.communicate()
+    if proc.returncode != 0:
+        snippet = err.decode("utf-8", errors="replace")[-500:]
+        raise RuntimeError(f"ffmpeg failed (rc={proc.returncode}): {snippet}")
+    if not out:
+        raise RuntimeError("ffmpeg produced empty output")
+    return out
 
 
 def _is_refusal(text: str | None) -> bool:
@@ -255,11 +251,33 @@ async def _translate_fallback(
     if source_lang.lower() in ("en", "english"):
         return original_text, original_text, source_lang
 
-    chunk_size = 15000
-    chunks = [original_text[i:i + chunk_size] for i in range(0, len(original_text), chunk_size)]
-    translated_chunks: list[str] = []
-    for i, chunk in enumerate(chunks):
-        logger.info(f"fallback translate chunk {i + 1}/{len(chunks)} ({len(chunk)} chars)")
+    # Transcription output is mostly one long line; the chunker breaks it between
+    # lines, then sentences, then words, never mid-word. Translations are put back
+    # together with what separated their sources: a line break, or the space a
+    # long line was split on. Lines translated before come from the translation
+    # memory.
+    joiners: list[str] = []  # what follows each chunk for the model, in order
+
+    def chunk(text: str) -> list[str]:
+        chunker = Chunker(settings.translate_chunk_tokens, settings.model_transcript, separator="\n")
+        chunks = chunker.feed(text) + chunker.finish()
+        joiners.extend(chunker.joiners[:-1] + ["\n"])
+        return chunks
+
+    pieces = await translation_memory.plan(original_text, "\n", settings.model_transcript, chunk)
+    afters = iter(joiners)
+    total = sum(1 for p in pieces if not p.remembered)
+    translated_parts: list[str] = []
+    before = ""  # what separates the next piece from the previous one
+    i = 0
+    for piece in pieces:
+        if piece.remembered:
+            translated_parts += [before, piece.text]
+            before = "\n"
+            continue
+        chunk, after = piece.text, next(afters)
+        i += 1
+        logger.info(f"fallback translate chunk {i}/{total} ({len(chunk)} chars)")
         resp = await openai_client.chat.completions.create(
             model=settings.model_transcript,
             messages=[{
@@ -271,14 +289,17 @@ async def _translate_fallback(
             }],
             max_tokens=16000,
         )
-        chunk_text = resp.choices[0].message.content or ""
-        if _is_refusal(chunk_text):
-            logger.warning(f"fallback chunk {i + 1} refused, using original")
-            translated_chunks.append(chunk)
+        translated = resp.choices[0].message.content or ""
+        if _is_refusal(translated):
+            logger.warning(f"fallback chunk {i} refused, using original")
+            translated_parts += [before, chunk]
         else:
-            translated_chunks.append(chunk_text.strip())
+            translated_parts += [before, translated.strip()]
+            if before in ("", "\n") and after == "\n":  # whole lines only
+                await translation_memory.learn(chunk, translated, "\n", settings.model_transcript)
+        before = after
 
-    return original_text, "\n".join(translated_chunks), source_lang
+    return original_text, "".join(translated_parts), source_lang
 
 
 _RECOVERABLE_ERRORS = (
@@ -290,13 +311,16 @@ _RECOVERABLE_ERRORS = (
 
 
 async def translate_media(
-    file_bytes: bytes,
+    file_path: str,
     filename: str,
     openai_client: AsyncOpenAI,
     settings: Settings,
 ) -> TranslateResult:
-    mp3_bytes = await _to_mp3(file_bytes, filename)
-    logger.info(f"audio normalized: {len(file_bytes)} bytes ({filename}) -> {len(mp3_bytes)} bytes (mp3)")
+    """Translate the media file at `file_path` (named `filename` by the sender)."""
+    mp3_bytes = await _to_mp3(file_path, filename)
+    logger.info(
+        f"audio normalized: {os.path.getsize(file_path)} bytes ({filename}) -> {len(mp3_bytes)} bytes (mp3)"
+    )
 
     # Primary: diarize-aware pipeline (real speaker labels, same-lang transcription + translation).
     try:
@@ -338,12 +362,10 @@ if __name__ == "__main__":
 
     async def _main():
         audio_path = sys.argv[1] if len(sys.argv) > 1 else "samples/test.mp3"
-        with open(audio_path, "rb") as f:
-            file_bytes = f.read()
         settings = Settings()
         client = AsyncOpenAI(api_key=settings.openai_api_key)
         result = await translate_media(
-            file_bytes,
+            audio_path,
             filename=audio_path.rsplit("/", 1)[-1],
             openai_client=client,
             settings=settings,
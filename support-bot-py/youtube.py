@@ -1,10 +1,10 @@
 import re
 
 from loguru import logger
-from youtube_transcript_api import YouTubeTranscriptApi
 
 from settings import Settings
 from summarizer import make_summary_single_call
+from transcript_cache import fetch_transcript, find_transcript
 
 settings = Settings()
 
@@ -25,14 +25,10 @@ def get_transcript_summary(req: str):
     logger.info(f"Getting transcript summary for {req}")
     video_id = get_youtube_id(req)
     logger.info(f"Video ID: {video_id}")
-    if settings.youtube_proxy_url:
-        proxies = {"https": settings.youtube_proxy_url}
-    else:
-        proxies = None
-    trans = YouTubeTranscriptApi.get_transcript(
-        video_id, languages=["ru", "en"],
-        proxies=proxies,
-    )
+    found = fetch_transcript(video_id, lambda listing: find_transcript(listing, ["ru", "en"]))
+    if found is None:
+        raise ValueError(f"No ru/en transcript for {video_id}")
+    _, trans = found
 
     full_text = " ".join(t["text"] for t in trans)
     summary_text = make_summary_single_call(full_text)
@@ -21,9 +21,11 @@ import tempfile
 import httpx
 from loguru import logger
 from openai import AsyncOpenAI
-from youtube_transcript_api import NoTranscriptFound, YouTubeTranscriptApi
 
+from chunking import chunk_text
 from settings import Settings
+from transcript_cache import fetch_transcript
+from translation_memory import translation_memory
 from tts_client import voice_for_speaker
 from video_translator import _DIARIZE_TRANSLATE_PROMPT, _is_refusal
 from youtube import get_youtube_id
@@ -81,31 +83,29 @@ async def _download_audio(url: str, proxy: str | None) -> tuple[bytes, str]:
             return f.read(), files[0].rsplit(".", 1)[-1].lower()
 
 
-def _youtube_cues(video_id: str, proxies: dict | None) -> tuple[list[dict], str] | None:
+def _youtube_cues(video_id: str) -> tuple[list[dict], str] | None:
     """Original-language YouTube captions as [{text,start,end}] + language code.
     Prefers a human transcript, else the original auto-generated one."""
+    def choose(listing: list[dict]) -> dict | None:
+        return next((t for t in listing if not t["is_generated"]), None) or next(iter(listing), None)
+
     try:
-        tl = YouTubeTranscriptApi.list_transcripts(video_id, proxies=proxies)
+        found = fetch_transcript(video_id, choose)
     except Exception as e:
         logger.info(f"no transcript list for {video_id}: {e}")
         return None
-
-    chosen = next((t for t in tl if not t.is_generated), None) or next(iter(tl), None)
-    if chosen is None:
+    if found is None:
         return None
-    data = chosen.fetch()
-
-    def attr(item, name):
-        return item[name] if isinstance(item, dict) else getattr(item, name)
+    chosen, data = found
 
     cues = []
     for item in data:
-        text = (attr(item, "text") or "").strip()
+        text = (item["text"] or "").strip()
         if not text:
             continue
-        start = float(attr(item, "start"))
-        cues.append({"text": text, "start": start, "end": start + float(attr(item, "duration"))})
-    return (cues, chosen.language_code) if cues else None
+        start = float(item["start"])
+        cues.append({"text": text, "start": start, "end": start + float(item["duration"])})
+    return (cues, chosen["language_code"]) if cues else None
 
 
 async def _groq_word_cues(mp3_bytes: bytes, settings: Settings) -> tuple[list[dict], str]:
@@ -204,22 +204,26 @@ def align_cues_to_speakers(cues: list[dict], turns: list[tuple[float, float, str
 
 async def _translate_preserving_labels(text: str, settings: Settings) -> str:
     """Translate a diarized transcript to English, chunked on speaker-line
-    boundaries, keeping every 'Speaker N:' label intact."""
+    boundaries, keeping every 'Speaker N:' label intact. Lines translated
+    before come from the translation memory."""
     client = AsyncOpenAI(api_key=settings.openai_api_key)
-    lines = text.split("\n")
-    chunks, cur = [], ""
-    for ln in lines:
-        if cur and len(cur) + len(ln) + 1 > 12000:
-            chunks.append(cur)
-            cur = ln
-        else:
-            cur = f"{cur}\n{ln}" if cur else ln
-    if cur:
-        chunks.append(cur)
+    pieces = await translation_memory.plan(
+        text,
+        "\n",
+        settings.model_transcript,
+        lambda t: chunk_text(t, settings.translate_chunk_tokens, settings.model_transcript, separator="\n"),
+    )
+    total = sum(1 for p in pieces if not p.remembered)
 
     out = []
-    for i, chunk in enumerate(chunks):
-        logger.info(f"diarize-translate chunk {i + 1}/{len(chunks)} ({len(chunk)} chars)")
+    i = 0
+    for piece in pieces:
+        if piece.remembered:
+            out.append(piece.text)
+            continue
+        chunk = piece.text
+        i += 1
+        logger.info(f"diarize-translate chunk {i}/{total} ({len(chunk)} chars)")
         resp = await client.chat.completions.create(
             model=settings.model_transcript,
             messages=[
@@ -229,7 +233,11 @@ async def _translate_preserving_labels(text: str, settings: Settings) -> str:
             max_tokens=16000,
         )
         t = (resp.choices[0].message.content or "").strip()
-        out.append(chunk if _is_refusal(t) or not t else t)
+        if _is_refusal(t) or not t:
+            out.append(chunk)
+        else:
+            out.append(t)
+            await translation_memory.learn(chunk, t, "\n", settings.model_transcript)
     return "\n".join(out)
 
 
@@ -269,12 +277,11 @@ async def process_youtube_diarize(url: str, num_speakers: int = -1) -> dict:
     logger.info(f"diarize: processing {video_id} (num_speakers={num_speakers})")
 
     proxy = settings.youtube_proxy_url
-    proxies = {"https": proxy} if proxy else None
 
     # Captions first (free, no audio). If present, ml-service downloads the audio
     # itself for diarization so the bot never handles it. Only the no-caption
     # fallback downloads audio here (reused for both Groq ASR and diarization).
-    cues_lang = await asyncio.to_thread(_youtube_cues, video_id, proxies)
+    cues_lang = await asyncio.to_thread(_youtube_cues, video_id)
     if cues_lang:
         cues, lang = cues_lang
         source = "captions"
@@ -313,16 +320,24 @@ async def process_youtube_diarize(url: str, num_speakers: int = -1) -> dict:
         tts_segments = _diar_tts_segments(translated)
 
     header = f"SPEAKER-DIARIZED TRANSCRIPT ({num_speakers} speakers, source: {source})\n\n"
-    transcript_urls = await _create_telegraph_pages(
-        f"Diarized Transcript: {video_id}", header + translated
+    # The transcript pages don't depend on the summary: publish them while it runs.
+    transcript_task = asyncio.create_task(
+        _create_telegraph_pages(f"Diarized Transcript: {video_id}", header + translated)
     )
 
     # Summarize the speaker-labeled transcript (same summarizer as the plain
     # transcript path); the Speaker N: labels stay in the input so the summary
     # can attribute points to speakers. Mirrors process_youtube_transcript's
     # summary_text / summary_url so the diarized reply isn't missing a summary.
-    summary_text = await _summarize(translated, settings)
-    summary_urls = await _create_telegraph_pages(f"Diarized Summary: {video_id}", summary_text)
+    try:
+        summary_text = await _summarize(translated, settings)
+    except BaseException:
+        transcript_task.cancel()
+        raise
+    transcript_urls, summary_urls = await asyncio.gather(
+        transcript_task,
+        _create_telegraph_pages(f"Diarized Summary: {video_id}", summary_text),
+    )
 
     return {
         "video_id": video_id,
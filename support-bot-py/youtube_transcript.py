@@ -1,128 +1,48 @@
 import asyncio
+import itertools
+from typing import AsyncIterator
 
-import httpx
 from loguru import logger
 from openai import AsyncOpenAI
-from youtube_transcript_api import NoTranscriptFound, YouTubeTranscriptApi
+from youtube_transcript_api import NoTranscriptFound
 
+from chunking import chunk_stream, chunk_text
 from settings import Settings
+from telegraph import paginate, telegraph
+from transcript_cache import fetch_transcript, find_transcript
+from translation_memory import Piece, translation_memory
 from tts_client import VOICE_POOL
+from utils import count_tokens, get_encoding
 from youtube import get_youtube_id
 
-# Module-level cache for Telegraph access token
-_telegraph_token = None
-
-
-def _convert_markdown_to_telegraph(text: str) -> str:
-    """Convert basic markdown to plain text for Telegraph."""
-    import re
-
-    # Remove markdown headers (### -> nothing, just the text)
-    text = re.sub(r'^###\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^##\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^#\s+', '', text, flags=re.MULTILINE)
-
-    # Convert **bold** to plain text (Telegraph will handle formatting differently)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-
-    # Convert *italic* to plain text
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)
-
-    return text
-
 
 async def _create_telegraph_page(title: str, content: str) -> str | None:
     """Create Telegraph page using API. Returns URL or None on failure."""
-    global _telegraph_token
+    return await telegraph.create_page(title, content)
 
-    try:
-        async with httpx.AsyncClient() as client:
-            # Create account if needed
-            if not _telegraph_token:
-                response = await client.post(
-                    'https://api.telegra.ph/createAccount',
-                    json={'short_name': 'YouTubeBot', 'author_name': 'Anonymous'}
-                )
-                data = response.json()
-                _telegraph_token = data['result']['access_token']
-                logger.info(f"Created Telegraph account with token: {_telegraph_token[:10]}...")
-
-            # Clean markdown from content
-            clean_content = _convert_markdown_to_telegraph(content)
-
-            # Convert content to Telegraph format (array of paragraph nodes)
-            # Split by double newlines for paragraphs
-            paragraphs = clean_content.split('\n\n')
-
-            # Create Telegraph nodes (each paragraph is a separate node)
-            telegraph_nodes = []
-            for para in paragraphs:
-                if para.strip():
-                    # Replace single newlines with <br> tags within paragraphs
-                    # Telegraph expects each line as a separate text node
-                    lines = para.split('\n')
-                    children = []
-                    for i, line in enumerate(lines):
-                        if line.strip():
-                            children.append(line)
-                            if i < len(lines) - 1:  # Add br except for last line
-                                children.append({'tag': 'br'})
-
-                    if children:
-                        telegraph_nodes.append({'tag': 'p', 'children': children})
-
-            # Create page
-            response = await client.post(
-                'https://api.telegra.ph/createPage',
-                json={
-                    'access_token': _telegraph_token,
-                    'title': title[:256],  # Telegraph limit
-                    'content': telegraph_nodes,
-                    'return_content': False
-                }
-            )
-            data = response.json()
-            if not data.get('ok'):
-                logger.error(f"Telegraph API error: {data.get('error', 'unknown error')}")
-                return None
-            page_url = f"https://telegra.ph/{data['result']['path']}"
-            logger.info(f"Created Telegraph page: {page_url}")
-            return page_url
-    except Exception as e:
-        logger.error(f"Telegraph error: {e}")
-        return None
 
+async def _publish_pages(titles: list[str], pages: list[list[dict]]) -> list[str]:
+    """Publish pages concurrently; URLs in page order (failed pages are logged
+    by the client and left out)."""
+    urls = await asyncio.gather(
+        *(telegraph.create_page_nodes(title, nodes) for title, nodes in zip(titles, pages))
+    )
+    return [url for url in urls if url]
 
-async def _create_telegraph_pages(
-    title: str, content: str, min_chunk: int = 5000
-) -> list[str]:
+
+async def _create_telegraph_pages(title: str, content: str) -> list[str]:
     """Create Telegraph page(s) for `content`.
 
-    Telegraph rejects pages whose serialized JSON exceeds ~64 KB (CONTENT_TOO_BIG),
-    and the serialized size is hard to predict from the character count alone
-    (paragraph/<br> nodes add overhead). If a page is rejected we split the
-    content in half on a newline boundary and retry each half recursively, so a
-    too-large part is never silently dropped. Returns the page URLs in order.
+    The content is packed into as few pages as fit Telegraph's size limit
+    (measured on the serialized nodes, see telegraph.paginate), so every page
+    is accepted on the first attempt. Returns the page URLs in order.
     """
-    url = await _create_telegraph_page(title, content)
-    if url:
-        return [url]
-
-    if len(content) <= min_chunk:
-        logger.error(f"Telegraph page creation failed for minimal chunk '{title}'")
-        return []
-
-    mid = len(content) // 2
-    # Prefer splitting on a newline near the middle to avoid cutting mid-line.
-    split_at = content.rfind("\n", 0, mid)
-    if split_at <= 0:
-        split_at = mid
-    logger.warning(
-        f"Splitting '{title}' ({len(content)} chars) after Telegraph rejection"
-    )
-    left = await _create_telegraph_pages(f"{title} (a)", content[:split_at], min_chunk)
-    right = await _create_telegraph_pages(f"{title} (b)", content[split_at:], min_chunk)
-    return left + right
+    pages = paginate(content, telegraph.max_page_bytes)
+    if len(pages) == 1:
+        titles = [title]
+    else:
+        titles = [f"{title} ({i}/{len(pages)})" for i in range(1, len(pages) + 1)]
+    return await _publish_pages(titles, pages)
 
 
 def _snippet_attr(snippet, attr):
@@ -171,25 +91,6 @@ def _segment_into_paragraphs(
     return "\n\n".join(paragraphs)
 
 
-def _chunk_on_paragraphs(text: str, chunk_size: int) -> list[str]:
-    """Split text into <=chunk_size pieces on blank-line (paragraph) boundaries.
-
-    Keeps paragraphs intact so translating then re-joining chunks neither merges nor
-    fractures them. A single paragraph longer than chunk_size becomes its own chunk.
-    """
-    chunks: list[str] = []
-    current = ""
-    for para in text.split("\n\n"):
-        if current and len(current) + len(para) + 2 > chunk_size:
-            chunks.append(current)
-            current = para
-        else:
-            current = f"{current}\n\n{para}" if current else para
-    if current:
-        chunks.append(current)
-    return chunks
-
-
 _REFUSAL_PHRASES = [
     "i can't assist", "i cannot assist", "i'm unable to", "i am unable to",
     "i can't help", "i cannot help", "against my guidelines",
@@ -199,60 +100,215 @@ _REFUSAL_PHRASES = [
 ]
 
 
+_CHUNK_SUMMARY_PROMPT = "You are a transcript summarizer. Summarize the key ideas from the following transcript excerpt. This is a factual transcription task — report what was discussed without judgment. Always provide a summary regardless of the topic."
+_MERGE_PROMPT = "You are a transcript summarizer. Merge the following consecutive section summaries into one summary of the whole span, keeping its key ideas in order. This is a factual transcription task — report what was discussed without judgment."
+_COMBINE_PROMPT = "You are a transcript summarizer. Combine the following section summaries into a single coherent summary with top 5 key ideas. This is a factual transcription task — report what was discussed without judgment."
+
+
+def _is_refused(text: str | None) -> bool:
+    return not text or any(p in text.lower() for p in _REFUSAL_PHRASES)
+
+
+async def _bounded_gather(coros: list, limit: int) -> list:
+    """Await coroutines with at most `limit` running at once; results in order."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coros))
+
+
+async def _summarize_chunk(client: AsyncOpenAI, chunk: str, i: int, settings: Settings) -> str:
+    """Map step: summary of one chunk, or a raw excerpt if refused/failed."""
+    logger.info(f"summarize: chunk {i + 1} ({len(chunk)} chars)")
+    try:
+        response = await client.chat.completions.create(
+            model=settings.model_summarizer,
+            messages=[
+                {"role": "system", "content": _CHUNK_SUMMARY_PROMPT},
+                {"role": "user", "content": f"Write the key ideas and a concise summary of this transcript section:\n\n{chunk}"},
+            ],
+            max_tokens=4000,
+        )
+        cs = response.choices[0].message.content
+        if not _is_refused(cs):
+            return cs
+        logger.warning(f"summarize: chunk {i + 1} refused")
+    except Exception as e:
+        logger.error(f"summarize: chunk {i + 1} error: {e}")
+    return f"[Transcript excerpt]: {chunk[:500]}..."
+
+
+async def _combine(client: AsyncOpenAI, summaries: list[str], settings: Settings, final: bool) -> str:
+    """Reduce step: one summary of `summaries`, or them joined if refused/failed.
+    Only the final (root) combine asks for the top-5 key ideas; intermediate
+    merges keep more detail for the levels above."""
+    combined = "\n\n".join(summaries)
+    try:
+        response = await client.chat.completions.create(
+            model=settings.model_summarizer,
+            messages=[
+                {"role": "system", "content": _COMBINE_PROMPT if final else _MERGE_PROMPT},
+                {"role": "user", "content": f"Combine these section summaries into one {'final ' if final else ''}summary:\n\n{combined}"},
+            ],
+            max_tokens=4000,
+        )
+        result = response.choices[0].message.content
+        if not _is_refused(result):
+            return result
+        logger.warning(f"summarize: combine of {len(summaries)} summaries refused, using them joined")
+    except Exception as e:
+        logger.error(f"summarize: combine error: {e}")
+    return combined
+
+
+def _reduce_groups(summaries: list[str], budget: int, model: str) -> list[list[str]]:
+    """Consecutive groups of summaries whose tokens fit `budget`. A summary over
+    half the budget is cut to half of it first, so any two fit together and
+    every group but a trailing one takes at least two: each reduce level
+    shrinks the list."""
+    half = max(1, budget // 2)
+    groups: list[list[str]] = []
+    current: list[str] = []
+    used = last_used = 0
+    for summary in summaries:
+        tokens = count_tokens(summary, model)
+        if tokens > half:
+            logger.warning(f"summarize: a {tokens}-token summary is over half the reduce budget, trimming it")
+            encoding = get_encoding(model)
+            summary = encoding.decode(encoding.encode_ordinary(summary)[:half])
+            tokens = half
+        if len(current) >= 2 and used + tokens > budget:
+            groups.append(current)
+            current, used, last_used = [], 0, used
+        current.append(summary)
+        used += tokens
+    if len(current) == 1 and groups and last_used + used <= budget:
+        groups[-1].append(current[0])
+    elif current:
+        groups.append(current)
+    return groups
+
+
+async def _iterate(items: list[str]) -> AsyncIterator[str]:
+    for item in items:
+        yield item
+
+
 async def _summarize(text: str, settings: Settings) -> str:
     """Summarize a (possibly long) transcript into key ideas.
 
-    Chunks the text so a single problematic passage can't kill the whole summary,
-    summarizes each chunk with refusal detection (falling back to a raw excerpt),
-    then combines the chunk summaries into one. Shared by the plain-transcript and
-    diarized paths; the diarized path passes Speaker N:-labeled text so the
-    summary can attribute points to speakers."""
+    Shared by the plain-transcript and diarized paths; the diarized path passes
+    Speaker N:-labeled text so the summary can attribute points to speakers."""
+    return await _summarize_stream(_iterate([text]), settings)
+
+
+async def _summarize_stream(parts: AsyncIterator[str], settings: Settings) -> str:
+    """Map-reduce summary of the text arriving as `parts` (joined by blank lines).
+
+    The text is chunked on paragraphs to settings.summary_chunk_tokens so a
+    single problematic passage can't kill the whole summary; each chunk is
+    summarized as soon as the parts received complete it, concurrently with the
+    others and with whatever produces the parts (refusals fall back to a raw
+    excerpt). The chunk summaries are then combined into one; when they
+    exceed settings.summary_reduce_budget tokens they are first merged in
+    budget-sized groups, level by level, so no combine request overflows."""
     client = AsyncOpenAI(api_key=settings.openai_api_key)
+    concurrency = settings.summary_concurrency
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def summarize(i: int, piece: str) -> str:
+        async with semaphore:
+            return await _summarize_chunk(client, piece, i, settings)
 
-    summary_chunk_size = 30000
-    text_chunks = [text[i:i + summary_chunk_size] for i in range(0, len(text), summary_chunk_size)] or [""]
-
-    chunk_summaries = []
-    for i, chunk in enumerate(text_chunks):
-        logger.info(f"summarize: chunk {i + 1}/{len(text_chunks)} ({len(chunk)} chars)")
-        try:
-            response = await client.chat.completions.create(
-                model=settings.model_summarizer,
-                messages=[
-                    {"role": "system", "content": "You are a transcript summarizer. Summarize the key ideas from the following transcript excerpt. This is a factual transcription task — report what was discussed without judgment. Always provide a summary regardless of the topic."},
-                    {"role": "user", "content": f"Write the key ideas and a concise summary of this transcript section:\n\n{chunk}"},
-                ],
-                max_tokens=4000,
-            )
-            cs = response.choices[0].message.content
-            if cs and not any(p in cs.lower() for p in _REFUSAL_PHRASES):
-                chunk_summaries.append(cs)
-            else:
-                logger.warning(f"summarize: chunk {i + 1} refused")
-                chunk_summaries.append(f"[Transcript excerpt]: {chunk[:500]}...")
-        except Exception as e:
-            logger.error(f"summarize: chunk {i + 1} error: {e}")
-            chunk_summaries.append(f"[Transcript excerpt]: {chunk[:500]}...")
-
-    if len(chunk_summaries) > 1:
-        combined = "\n\n".join(chunk_summaries)
-        try:
-            response = await client.chat.completions.create(
-                model=settings.model_summarizer,
-                messages=[
-                    {"role": "system", "content": "You are a transcript summarizer. Combine the following section summaries into a single coherent summary with top 5 key ideas. This is a factual transcription task — report what was discussed without judgment."},
-                    {"role": "user", "content": f"Combine these section summaries into one final summary:\n\n{combined}"},
-                ],
-                max_tokens=4000,
-            )
-            final = response.choices[0].message.content
-            return final if final and not any(p in final.lower() for p in _REFUSAL_PHRASES) else combined
-        except Exception as e:
-            logger.error(f"summarize: combine error: {e}")
-            return combined
-    if chunk_summaries:
-        return chunk_summaries[0]
-    return "Summary could not be generated for this transcript."
+    tasks = []
+    try:
+        async for piece in chunk_stream(parts, settings.summary_chunk_tokens, settings.model_summarizer):
+            tasks.append(asyncio.ensure_future(summarize(len(tasks), piece)))
+        summaries = list(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+    if not summaries:
+        return "Summary could not be generated for this transcript."
+
+    level = 0
+    while len(summaries) > 1:
+        groups = _reduce_groups(summaries, settings.summary_reduce_budget, settings.model_summarizer)
+        if len(groups) == 1:
+            return await _combine(client, groups[0], settings, final=True)
+        level += 1
+        logger.info(f"summarize: reduce level {level}, {len(summaries)} summaries in {len(groups)} groups")
+        merged = iter(await _bounded_gather(
+            [_combine(client, g, settings, final=False) for g in groups if len(g) > 1], concurrency
+        ))
+        # A trailing summary left on its own goes up to the next level as is
+        summaries = [next(merged) if len(g) > 1 else g[0] for g in groups]
+    return summaries[0]
+
+
+async def _translate_chunk(
+    client: AsyncOpenAI, chunk: str, i: int, total: int, settings: Settings
+) -> str:
+    """Translate one paragraph-aligned chunk to English; a refusal falls back to
+    the original chunk text."""
+    logger.info(f"Translating chunk {i + 1}/{total} ({len(chunk)} chars)...")
+    translation_response = await client.chat.completions.create(
+        model=settings.model_transcript,
+        messages=[{
+            "role": "user",
+            "content": f"Translate the following YouTube transcript chunk to English. Preserve meaning accurately and keep the blank lines that separate paragraphs:\n\n{chunk}"
+        }],
+        max_tokens=16000
+    )
+    translated = translation_response.choices[0].message.content
+    if not _is_refused(translated):
+        logger.info(f"Chunk {i + 1} translated: {len(translated)} chars")
+        return translated
+    logger.warning(f"Chunk {i + 1} appears to be a refusal: {translated[:200] if translated else 'None'}")
+    # Fall back to original chunk text
+    return chunk
+
+
+async def _translate_chunks_stream(
+    client: AsyncOpenAI, pieces: list[Piece], settings: Settings
+) -> AsyncIterator[str]:
+    """Translate chunks concurrently (at most settings.transcript_translate_concurrency
+    requests in flight) and yield the translations in input order, each as soon
+    as it and all before it are done. Remembered pieces are yielded as they are;
+    new translations are added to the translation memory. If one chunk fails
+    the others are cancelled and the error propagates."""
+    semaphore = asyncio.Semaphore(max(1, settings.transcript_translate_concurrency))
+    total = sum(1 for p in pieces if not p.remembered)
+
+    async def translate(piece: Piece, i: int | None) -> str:
+        if piece.remembered:
+            return piece.text
+        async with semaphore:
+            translated = await _translate_chunk(client, piece.text, i, total, settings)
+        if translated != piece.text:
+            await translation_memory.learn(piece.text, translated, "\n\n", settings.model_transcript)
+        return translated
+
+    # Only the chunks sent to the model are numbered (for the logs)
+    misses = itertools.count()
+    tasks = [
+        asyncio.ensure_future(translate(piece, None if piece.remembered else next(misses)))
+        for piece in pieces
+    ]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _translate_chunks(client: AsyncOpenAI, chunks: list[str], settings: Settings) -> list[str]:
+    pieces = [Piece(chunk) for chunk in chunks]
+    return [chunk async for chunk in _translate_chunks_stream(client, pieces, settings)]
 
 
 def _narrator_segments(text: str, voice: str | None = None) -> list[dict]:
@@ -262,6 +318,10 @@ def _narrator_segments(text: str, voice: str | None = None) -> list[dict]:
     return [{"voice": v, "text": p.strip()} for p in text.split("\n\n") if p.strip()]
 
 
+def _choose_transcript(listing: list[dict]) -> dict | None:
+    return find_transcript(listing, ["en", "ru"]) or next(iter(listing), None)
+
+
 async def process_youtube_transcript(url: str) -> dict:
     """
     Process YouTube video and create transcript + summary with Telegraph pages.
@@ -284,35 +344,14 @@ async def process_youtube_transcript(url: str) -> dict:
     video_id = get_youtube_id(url)
     logger.info(f"Processing YouTube video: {video_id}")
 
-    # Get transcript with language fallback
-    if settings.youtube_proxy_url:
-        proxies = {"https": settings.youtube_proxy_url}
-    else:
-        proxies = None
-
-    transcript_list = YouTubeTranscriptApi.list_transcripts(video_id, proxies=proxies)
+    # Get transcript with language fallback: English -> Russian -> first available
+    found = await asyncio.to_thread(fetch_transcript, video_id, _choose_transcript)
     transcript_data = None
     original_lang = None
-
-    # Try English -> Russian -> first available
-    try:
-        transcript = transcript_list.find_transcript(['en'])
-        transcript_data = transcript.fetch()
-        original_lang = 'en'
-        logger.info("Found English transcript")
-    except:
-        try:
-            transcript = transcript_list.find_transcript(['ru'])
-            transcript_data = transcript.fetch()
-            original_lang = 'ru'
-            logger.info("Found Russian transcript")
-        except:
-            # Get first available
-            for t in transcript_list:
-                transcript_data = t.fetch()
-                original_lang = t.language_code
-                logger.info(f"Using fallback transcript in language: {original_lang}")
-                break
+    if found is not None:
+        entry, transcript_data = found
+        original_lang = entry["language_code"]
+        logger.info(f"Using {original_lang} transcript ({len(transcript_data)} cues)")
 
     if not transcript_data:
         raise NoTranscriptFound(video_id)
@@ -339,176 +378,67 @@ async def process_youtube_transcript(url: str) -> dict:
     if original_lang == 'en':
         logger.info("Transcript is already in English, skipping translation")
         translated_text = full_text
+        logger.info(f"Generating summary from {len(translated_text)} chars...")
+        summary_text = await _summarize(translated_text, settings)
     else:
         logger.info(f"Translating transcript from '{original_lang}' to English ({len(full_text)} chars)...")
 
         # Chunk the transcript to avoid exceeding model output limits.
-        # gpt-4o-mini can output ~16K tokens, so keep input chunks manageable.
-        # Split on paragraph boundaries so paragraphs stay intact across chunks.
-        chunk_size = 15000  # characters per chunk
-        chunks = _chunk_on_paragraphs(full_text, chunk_size)
-        logger.info(f"Split transcript into {len(chunks)} chunks for translation")
+        # gpt-4o-mini can output ~16K tokens, so keep input chunks to
+        # translate_chunk_tokens. Split on paragraph boundaries so paragraphs
+        # stay intact across chunks.
+        # Paragraphs translated before come from the translation memory; only
+        # the rest is chunked and sent.
+        pieces = await translation_memory.plan(
+            full_text,
+            "\n\n",
+            settings.model_transcript,
+            lambda text: chunk_text(text, settings.translate_chunk_tokens, settings.model_transcript),
+        )
+        logger.info(
+            f"Split transcript into {sum(not p.remembered for p in pieces)} chunks for translation"
+        )
 
+        # Pipelined: translated chunks (in order) feed the summarizer's map stage
+        # directly, so summarizing overlaps with translating the rest.
         translated_chunks = []
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Translating chunk {i + 1}/{len(chunks)} ({len(chunk)} chars)...")
-            translation_response = await openai_client.chat.completions.create(
-                model=settings.model_transcript,
-                messages=[{
-                    "role": "user",
-                    "content": f"Translate the following YouTube transcript chunk to English. Preserve meaning accurately and keep the blank lines that separate paragraphs:\n\n{chunk}"
-                }],
-                max_tokens=16000
-            )
-            chunk_text = translation_response.choices[0].message.content
-            # Check for refusal
-            if chunk_text and not any(phrase in chunk_text.lower() for phrase in [
-                "i can't assist", "i cannot assist", "i'm unable to", "i am unable to",
-                "i can't help", "i cannot help", "against my guidelines"
-            ]):
-                translated_chunks.append(chunk_text)
-                logger.info(f"Chunk {i + 1} translated: {len(chunk_text)} chars")
-            else:
-                logger.warning(f"Chunk {i + 1} appears to be a refusal: {chunk_text[:200] if chunk_text else 'None'}")
-                # Fall back to original chunk text
+
+        async def translated():
+            async for chunk in _translate_chunks_stream(openai_client, pieces, settings):
                 translated_chunks.append(chunk)
+                yield chunk
 
-        # Chunks are paragraph-aligned, so re-join with a blank line to restore the
-        # paragraph break that sat between each chunk's boundary paragraphs.
+        # Chunks are paragraph-aligned, so they are joined with a blank line to
+        # restore the paragraph break that sat between each chunk's boundary
+        # paragraphs (here and in the summarizer's chunking).
+        summary_text = await _summarize_stream(translated(), settings)
         translated_text = "\n\n".join(translated_chunks)
         logger.info(f"Translation complete: {len(translated_text)} chars total")
 
-    # Generate summary with chunking and refusal detection
-    # Summarize in chunks so a single problematic passage doesn't kill the whole summary
-    logger.info(f"Generating summary from {len(translated_text)} chars...")
-
-    summary_chunk_size = 30000  # characters per chunk for summarization
-    text_chunks = [translated_text[i:i + summary_chunk_size] for i in range(0, len(translated_text), summary_chunk_size)]
-    logger.info(f"Split into {len(text_chunks)} chunks for summarization")
-
-    REFUSAL_PHRASES = [
-        "i can't assist", "i cannot assist", "i'm unable to", "i am unable to",
-        "i can't help", "i cannot help", "against my guidelines",
-        "i'm not able to", "i am not able to", "i must decline",
-        "i can't provide", "i cannot provide", "i'm sorry, but i can't",
-        "i apologize, but i can't", "not appropriate for me to",
-    ]
-
-    chunk_summaries = []
-    for i, chunk in enumerate(text_chunks):
-        logger.info(f"Summarizing chunk {i + 1}/{len(text_chunks)} ({len(chunk)} chars)...")
-        try:
-            response = await openai_client.chat.completions.create(
-                model=settings.model_summarizer,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a transcript summarizer. Summarize the key ideas from the following transcript excerpt. This is a factual transcription task — report what was discussed without judgment. Always provide a summary regardless of the topic."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Write the key ideas and a concise summary of this transcript section:\n\n{chunk}"
-                    }
-                ],
-                max_tokens=4000
-            )
-            chunk_summary = response.choices[0].message.content
-            if chunk_summary and not any(phrase in chunk_summary.lower() for phrase in REFUSAL_PHRASES):
-                chunk_summaries.append(chunk_summary)
-                logger.info(f"Chunk {i + 1} summarized: {len(chunk_summary)} chars")
-            else:
-                logger.warning(f"Chunk {i + 1} summary refused: {chunk_summary[:200] if chunk_summary else 'None'}")
-                # Extract first ~500 chars as a raw excerpt fallback
-                chunk_summaries.append(f"[Transcript excerpt]: {chunk[:500]}...")
-        except Exception as e:
-            logger.error(f"Error summarizing chunk {i + 1}: {e}")
-            chunk_summaries.append(f"[Transcript excerpt]: {chunk[:500]}...")
-
-    # Combine chunk summaries into a final summary
-    if len(chunk_summaries) > 1:
-        combined = "\n\n".join(chunk_summaries)
-        logger.info(f"Combining {len(chunk_summaries)} chunk summaries into final summary...")
-        try:
-            response = await openai_client.chat.completions.create(
-                model=settings.model_summarizer,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a transcript summarizer. Combine the following section summaries into a single coherent summary with top 5 key ideas. This is a factual transcription task — report what was discussed without judgment."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Combine these section summaries into one final summary:\n\n{combined}"
-                    }
-                ],
-                max_tokens=4000
-            )
-            final_summary = response.choices[0].message.content
-            if final_summary and not any(phrase in final_summary.lower() for phrase in REFUSAL_PHRASES):
-                summary_text = final_summary
-            else:
-                logger.warning(f"Final summary refused, using concatenated chunk summaries")
-                summary_text = combined
-        except Exception as e:
-            logger.error(f"Error combining summaries: {e}")
-            summary_text = combined
-    elif chunk_summaries:
-        summary_text = chunk_summaries[0]
-    else:
-        summary_text = "Summary could not be generated for this transcript."
-
     logger.info(f"Summary complete: {len(summary_text)} chars")
 
     # Create Telegraph pages
     logger.info("Creating Telegraph pages...")
 
-    # Telegraph has a ~64KB *serialized JSON* content limit; the per-node (<p>/<br>)
-    # overhead means the safe character budget is well below that. Keep it conservative
-    # so the first attempt usually fits; _create_telegraph_pages re-splits on rejection.
-    max_telegraph_chars = 30000
-
-    # First page: summary + beginning of transcript
+    # First page: summary + beginning of transcript; the transcript continues on
+    # as few pages as Telegraph's size limit allows, packed on paragraph boundaries.
     header = f"SUMMARY\n\n{summary_text}\n\n{'=' * 50}\n\nFULL TRANSCRIPT\n\n"
-    available_first_page = max_telegraph_chars - len(header)
-
-    transcript_urls = []
-
-    if len(translated_text) <= available_first_page:
-        # Single page is enough
-        content = header + translated_text
-        transcript_urls.extend(
-            await _create_telegraph_pages(f"YouTube Transcript: {video_id}", content)
-        )
+    pages = paginate(
+        header + translated_text, telegraph.max_page_bytes, continued="FULL TRANSCRIPT (continued)"
+    )
+    if len(pages) == 1:
+        titles = [f"YouTube Transcript: {video_id}"]
     else:
-        # Split into multiple parts
-        # Part 1: summary + start of transcript
-        part1_text = translated_text[:available_first_page]
-        transcript_urls.extend(
-            await _create_telegraph_pages(
-                f"Transcript Part 1: {video_id}", header + part1_text
-            )
-        )
+        titles = [f"Transcript Part {i}: {video_id}" for i in range(1, len(pages) + 1)]
 
-        # Remaining parts: transcript continuation
-        remaining = translated_text[available_first_page:]
-        part_num = 2
-        while remaining:
-            chunk = remaining[:max_telegraph_chars]
-            remaining = remaining[max_telegraph_chars:]
-            part_header = f"FULL TRANSCRIPT (continued)\n\n"
-            transcript_urls.extend(
-                await _create_telegraph_pages(
-                    f"Transcript Part {part_num}: {video_id}", part_header + chunk
-                )
-            )
-            part_num += 1
-
-        logger.info(f"Created {len(transcript_urls)} transcript pages for {len(translated_text)} chars")
-
-    summary_url = await _create_telegraph_page(
-        f"YouTube Summary: {video_id}",
-        summary_text
+    # Every page's text is final now; publish them all (and the summary page)
+    # at once, keeping the part order in transcript_urls.
+    transcript_urls, summary_url = await asyncio.gather(
+        _publish_pages(titles, pages),
+        _create_telegraph_page(f"YouTube Summary: {video_id}", summary_text),
     )
+    if len(pages) > 1:
+        logger.info(f"Created {len(transcript_urls)} transcript pages for {len(translated_text)} chars")
 
     # Read-aloud audio (single narrator) only when we actually translated to
     # English. English or Russian sources are skipped (user listens to the